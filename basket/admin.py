@@ -175,9 +175,9 @@ class BasketAdminSite(admin.AdminSite):
                     # Process the emails.
                     for email in emails:
                         if use_braze_backend:
-                            contact = braze.get(email=email)
+                            contact = braze.get(email=email, use_cache=False)
                         else:
-                            contact = ctms.get(email=email)
+                            contact = ctms.get(email=email, use_cache=False)
                         if contact:
                             email_id = contact["email_id"]
                             try:
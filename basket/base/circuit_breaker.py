@@ -0,0 +1,126 @@
+"""
+Circuit breakers for backends, with state shared by all processes.
+
+The state lives in the default cache (Redis in deployed environments):
+
+- per-window counters of calls, failed calls and slow calls,
+- the time until which the circuit is open, and
+- a short-lived key held by the one call probing a backend after it was open.
+
+While the circuit is open, `guard()` raises `CircuitOpenError` without calling
+the backend. When the open period ends, one call is let through as a probe. If
+it succeeds the circuit closes, otherwise it opens again.
+"""
+
+from contextlib import contextmanager
+from time import monotonic, time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+
+from basket import metrics
+from basket.base.exceptions import CircuitOpenError, DeadlineExceeded
+
+# How long a probe may take before another call can probe instead.
+PROBE_TIMEOUT = 60
+
+
+class CircuitBreaker:
+    def __init__(self, name, failures=()):
+        """
+        @param name: the backend name, shared by every process talking to it
+        @param failures: exception classes that count as failed calls
+        """
+        self.name = name
+        self.failures = failures
+
+    def _key(self, suffix):
+        return f"circuit:{self.name}:{suffix}"
+
+    def _incr(self, key):
+        cache.add(key, 0, timeout=settings.CIRCUIT_BREAKER_WINDOW * 2)
+        return cache.incr(key)
+
+    def _open(self):
+        open_until = time() + settings.CIRCUIT_BREAKER_OPEN_SECONDS
+        cache.set(self._key("open_until"), open_until, timeout=None)
+        cache.delete(self._key("probe"))
+        metrics.incr("base.circuit_breaker", tags=[f"backend:{self.name}", "state:open"])
+
+    def _close(self):
+        cache.delete_many([self._key("open_until"), self._key("probe")])
+        metrics.incr("base.circuit_breaker", tags=[f"backend:{self.name}", "state:closed"])
+
+    def _check(self):
+        """
+        Raise CircuitOpenError if calls should fail fast.
+
+        @return: True if this call is the probe of a half-open circuit
+        """
+        open_until = cache.get(self._key("open_until"))
+        if open_until is None:
+            return False
+        if time() < open_until:
+            metrics.incr("base.circuit_breaker.rejected", tags=[f"backend:{self.name}"])
+            raise CircuitOpenError(self.name, open_until - time())
+        if cache.add(self._key("probe"), True, timeout=PROBE_TIMEOUT):
+            metrics.incr("base.circuit_breaker", tags=[f"backend:{self.name}", "state:half_open"])
+            return True
+        # Another call is already probing the backend.
+        metrics.incr("base.circuit_breaker.rejected", tags=[f"backend:{self.name}"])
+        raise CircuitOpenError(self.name, settings.CIRCUIT_BREAKER_OPEN_SECONDS)
+
+    def _record(self, probe, failed, slow):
+        if probe:
+            if failed or slow:
+                self._open()
+            else:
+                self._close()
+            return
+
+        window = int(time() // settings.CIRCUIT_BREAKER_WINDOW)
+        calls = self._incr(self._key(f"{window}:calls"))
+        if not (failed or slow):
+            return
+
+        failed_calls = self._incr(self._key(f"{window}:failed")) if failed else 0
+        slow_calls = self._incr(self._key(f"{window}:slow")) if slow else 0
+        if calls < settings.CIRCUIT_BREAKER_MIN_CALLS:
+            return
+        if failed_calls / calls >= settings.CIRCUIT_BREAKER_ERROR_RATE or slow_calls / calls >= settings.CIRCUIT_BREAKER_SLOW_RATE:
+            self._open()
+
+    @contextmanager
+    def guard(self):
+        """
+        Run a call to the backend through the circuit breaker.
+
+        Exceptions listed in `failures` count as failed calls. The block can
+        also report a failure without raising by setting `call.failed`::
+
+            with breaker.guard() as call:
+                response = session.get(url)
+                call.failed = response.status_code >= 500
+
+        @raises CircuitOpenError: if the circuit is open
+        """
+        if not settings.CIRCUIT_BREAKER_ENABLED:
+            yield SimpleNamespace(failed=False)
+            return
+
+        probe = self._check()
+        call = SimpleNamespace(failed=False)
+        start = monotonic()
+        try:
+            yield call
+        except DeadlineExceeded:
+            # The call was cut short by our own budget, which says nothing about the backend.
+            if probe:
+                cache.delete(self._key("probe"))
+            raise
+        except self.failures:
+            call.failed = True
+            self._record(probe, True, False)
+            raise
+        self._record(probe, call.failed, monotonic() - start >= settings.CIRCUIT_BREAKER_SLOW_CALL)
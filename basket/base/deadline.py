@@ -0,0 +1,138 @@
+"""
+Time budgets for web requests and jobs.
+
+Every web request and every `rq_task` run gets a deadline. Outbound HTTP calls
+made through a `DeadlineHTTPAdapter` take the connect and read timeouts of each
+attempt, retries included, from the time left, and raise `DeadlineExceeded`
+once it is used up, so one hung backend can't hold a web thread or a worker
+indefinitely.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+
+from django.conf import settings
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, Timeout
+
+from basket import metrics
+from basket.base.exceptions import DeadlineExceeded
+
+_deadline = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Run the block with a budget of `seconds`.
+
+    A nested deadline can only shorten the one it runs in, never extend it.
+    """
+    current = _deadline.get()
+    new = monotonic() + seconds
+    if current is not None:
+        new = min(current, new)
+    token = _deadline.set(new)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_remaining():
+    """Return the seconds left in the current deadline, or None if there isn't one."""
+    current = _deadline.get()
+    if current is None:
+        return None
+    return current - monotonic()
+
+
+def attempt_timeout(connect, read):
+    """
+    Return the (connect, read) timeout for one attempt of an outbound call.
+
+    @param connect: the connect timeout to use when there is time to spare
+    @param read: the read timeout to use when there is time to spare
+    @raises DeadlineExceeded: if the current deadline has passed
+    """
+    remaining = time_remaining()
+    if remaining is None:
+        return connect, read
+    if remaining <= 0:
+        metrics.incr("base.deadline.exceeded")
+        raise DeadlineExceeded(f"Deadline exceeded by {-remaining:.3f}s")
+    return min(connect, remaining), min(read, remaining)
+
+
+def stop_before_deadline(wait):
+    """
+    Return a tenacity stop condition for retries that wait `wait` seconds between attempts.
+
+    It stops once the current deadline would pass before the next attempt.
+    """
+
+    def stop(retry_state):
+        remaining = time_remaining()
+        return remaining is not None and remaining <= wait
+
+    return stop
+
+
+class DeadlineTimeout(Timeout):
+    """urllib3 Timeout that takes the timeouts of each attempt, retries included, from the time left."""
+
+    def clone(self):
+        # urllib3 clones the timeout at the start of every attempt.
+        connect, read = attempt_timeout(self._connect, self._read)
+        return Timeout(connect=connect, read=read)
+
+
+class DeadlineRetry(Retry):
+    """urllib3 Retry that stops retrying when the current deadline would pass before the next attempt."""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        remaining = time_remaining()
+        if remaining is not None:
+            wait = new_retry.get_backoff_time()
+            if response is not None and new_retry.respect_retry_after_header:
+                wait = max(wait, new_retry.get_retry_after(response) or 0)
+            if wait >= remaining:
+                if response is not None:
+                    response.drain_conn()
+                metrics.incr("base.deadline.exceeded")
+                raise DeadlineExceeded(f"Deadline exceeded after {len(new_retry.history)} attempts") from error
+        return new_retry
+
+
+class DeadlineHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that bounds every attempt by the default timeouts and the current deadline.
+
+    Pass a `DeadlineRetry` as `max_retries` so retries stop once the deadline is used up.
+    """
+
+    def __init__(self, connect_timeout=None, read_timeout=None, **kwargs):
+        self.connect_timeout = connect_timeout or settings.HTTP_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or settings.HTTP_READ_TIMEOUT
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        connect, read = self.connect_timeout, self.read_timeout
+        # A timeout passed by the caller can only shorten the defaults.
+        if isinstance(timeout, tuple):
+            connect = min(connect, timeout[0] or connect)
+            read = min(read, timeout[1] or read)
+        elif timeout:
+            connect, read = min(connect, timeout), min(read, timeout)
+        connect, read = attempt_timeout(connect, read)
+        try:
+            return super().send(request, timeout=DeadlineTimeout(connect=connect, read=read), **kwargs)
+        except requests.ConnectionError as exc:
+            # requests wraps what urllib3 raises, DeadlineExceeded from retries included.
+            if exc.args and isinstance(exc.args[0], DeadlineExceeded):
+                raise exc.args[0] from exc.args[0].__cause__
+            raise
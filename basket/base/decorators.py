@@ -1,59 +1,173 @@
 import functools
+from contextlib import nullcontext
+from types import SimpleNamespace
+from uuid import uuid4
 
 from django.conf import settings
 
+from rq import get_current_job
+
 from basket import metrics
-from basket.base.rq import get_enqueue_kwargs, get_queue
+from basket.base.deadline import deadline
+from basket.base.exceptions import CircuitOpenError, RateLimitExceeded
+from basket.base.maintenance import capture_task
+from basket.base.rq import (
+    QUEUE_DEFAULT,
+    TASK_QUEUE_CLASSES,
+    add_to_enqueue_batch,
+    coalesce_call,
+    get_enqueue_kwargs,
+    get_partition,
+    get_partition_queue_name,
+    get_queue,
+    get_queue_name,
+    job_timings,
+    release_coalesce_claim,
+    reschedule_job,
+    take_coalesced_calls,
+    transient_error,
+    worker_job,
+)
+from basket.base.signals import task_started
+
 
+def latest_call(calls):
+    """Merge coalesced calls by keeping the latest one."""
+    return calls[-1]
 
-def rq_task(func):
+
+def rq_task(func=None, *, queue_class=QUEUE_DEFAULT, coalesce=None, merge=latest_call, partition_by=None):
     """
     Decorator to standardize RQ tasks.
 
+    Use as `@rq_task`, or as `@rq_task(queue_class=QUEUE_INTERACTIVE)` to send
+    the task's jobs to the queue of another queue class.
+
+    `coalesce` is called with the task's arguments and returns a key (or None).
+    While a job is waiting in the queue for a key, later calls with the same key
+    are added to it instead of being enqueued as jobs of their own, for up to
+    RQ_COALESCE_TTL seconds past its `enqueue_in` delay. When the job
+    runs, `merge` gets the (args, kwargs) of all its calls, oldest first, and
+    returns the ones to run the task with. By default the latest call wins.
+
+    `partition_by` is called with the task's arguments and returns a partition
+    key (or None). With RQ_PARTITIONS set, the jobs for a key go to one of the
+    ordered partition queues instead of the queue class, and run one at a time,
+    in order, on that partition's worker (see `PartitionWorker`). A rescheduled
+    job goes to the back of its partition, so a task whose calls must not apply
+    out of order still has to check, e.g. by the time of the event.
+
     Similar to RQ's job decorator, but:
-    - uses our default queue and connection
+    - uses the queue of the task's queue class and our connection
     - adds retry logic with exponential backoff
     - adds success/failure/retry callbacks
-    - adds statsd metrics for job success/failure/retry
+    - adds statsd metrics for job success/failure/retry, and each run's attempt
+      number, queue wait and execution time
     - adds Sentry error reporting for failed jobs
+    - sends the `task_started` signal before the task body runs
+    - joins the current `enqueue_batch()`, if any, so several jobs go to Redis at once
+    - gives each run a budget of TASK_DEADLINE seconds for outbound calls
+    - reschedules the job, without using up a retry, if a backend's circuit breaker is open
+      or its shared rate limit is used up
+    - reschedules the job on transient backend errors (429, 5xx, connection
+      errors) after Retry-After or the retry back-off, instead of sleeping
 
     """
+    if func is None:
+        return functools.partial(rq_task, queue_class=queue_class, coalesce=coalesce, merge=merge, partition_by=partition_by)
+
     task_name = f"{func.__module__}.{func.__qualname__}"
+    TASK_QUEUE_CLASSES[task_name] = queue_class
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        task_started.send(sender=wrapper, task_name=task_name)
+        # Jobs run by a worker are rescheduled on backend errors rather than
+        # retrying in process, so the worker can move on to the next job.
+        job = get_current_job() if settings.RQ_IS_ASYNC else None
+        if job is not None and job.meta.get("coalesce_key") is not None:
+            calls = take_coalesced_calls(job, task_name)
+            if calls:
+                args, kwargs = merge([(args, kwargs), *calls])
+                # Runs after a retry or reschedule use the merged call too.
+                job.args, job.kwargs = args, kwargs
+                metrics.incr("base.tasks.coalesced", value=len(calls), tags=[f"task:{task_name}"])
+        timings = job_timings(job, task_name) if job is not None else nullcontext(SimpleNamespace())
+        with timings as run:
+            try:
+                with worker_job(job is not None), deadline(settings.TASK_DEADLINE):
+                    return func(*args, **kwargs)
+            except CircuitOpenError as exc:
+                if job is None:
+                    raise
+                reschedule_job(job, exc.retry_after)
+                run.status = "rescheduled"
+                metrics.incr("base.tasks.rescheduled", tags=[f"task:{task_name}", "reason:circuit_open", f"backend:{exc.name}"])
+            except RateLimitExceeded as exc:
+                if job is None:
+                    raise
+                reschedule_job(job, exc.retry_after)
+                run.status = "rescheduled"
+                metrics.incr("base.tasks.rescheduled", tags=[f"task:{task_name}", "reason:rate_limited", f"limit:{exc.name}"])
+            except Exception as exc:
+                transient, retry_after = transient_error(exc)
+                if job is None or not transient or not job.retries_left:
+                    raise
+                # Use up a retry, so a backend that keeps failing still fails the job in the end.
+                reschedule_job(job, retry_after or job.get_retry_interval(), retries_left=job.retries_left - 1)
+                run.status = "rescheduled"
+                metrics.incr("base.tasks.rescheduled", tags=[f"task:{task_name}", "reason:transient"])
 
     @functools.wraps(func)
     def delay(*args, **kwargs):
         # If in maintenance mode, `delay(...)` will not run the task, but will
         # instead queue it for later.
         if settings.MAINTENANCE_MODE:
-            from basket.news.models import QueuedTask
-
-            QueuedTask.objects.create(
-                name=task_name,
-                args=args,
-                kwargs=kwargs,
-            )
-            metrics.incr(f"{task_name}.queued")
+            capture_task(task_name, args, kwargs)
 
         else:
-            queue = get_queue()
             enqueue_kwargs = get_enqueue_kwargs(func)
             enqueue_in = kwargs.pop("enqueue_in", None)
 
-            if enqueue_in:
-                return queue.enqueue_in(
-                    enqueue_in,
-                    func,
-                    args=args,
-                    kwargs=kwargs,
-                    **enqueue_kwargs,
-                )
-            else:
-                return queue.enqueue_call(
-                    func,
-                    args=args,
-                    kwargs=kwargs,
-                    **enqueue_kwargs,
-                )
-
-    func.delay = delay
-    return func
+            queue_name = get_queue_name(queue_class)
+            partition_key = partition_by(*args, **kwargs) if partition_by is not None and settings.RQ_PARTITIONS else None
+            if partition_key is not None:
+                queue_name = get_partition_queue_name(get_partition(partition_key))
+            queue = get_queue(queue_name)
+
+            key = coalesce(*args, **kwargs) if coalesce is not None and settings.RQ_IS_ASYNC else None
+            if key is not None:
+                job_id = uuid4().hex
+                enqueue_kwargs["job_id"] = job_id
+                enqueue_kwargs["meta"]["coalesce_key"] = key
+
+            # The calls in an `enqueue_batch()` are coalesced together when it's enqueued.
+            if add_to_enqueue_batch(queue, wrapper, args, kwargs, enqueue_in, **enqueue_kwargs):
+                return None
+            if key is not None and coalesce_call(task_name, key, job_id, args, kwargs, enqueue_in):
+                return None
+
+            try:
+                if enqueue_in:
+                    return queue.enqueue_in(
+                        enqueue_in,
+                        wrapper,
+                        args=args,
+                        kwargs=kwargs,
+                        **enqueue_kwargs,
+                    )
+                else:
+                    return queue.enqueue_call(
+                        wrapper,
+                        args=args,
+                        kwargs=kwargs,
+                        **enqueue_kwargs,
+                    )
+            except Exception:
+                # Don't hold up later calls for a job that was never enqueued.
+                if key is not None:
+                    release_coalesce_claim(task_name, key, job_id)
+                raise
+
+    wrapper.delay = delay
+    return wrapper
@@ -1,3 +1,6 @@
+import requests
+
+
 class BasketError(Exception):
     """
     Tasks can raise this when an error happens that we should not retry.
@@ -13,3 +16,51 @@ class RetryTask(Exception):
     """An exception to raise within a task if you just want to retry."""
 
     pass
+
+
+class RescheduleTask(Exception):
+    """
+    An exception to raise within a task to run it again later, after
+    `retry_after` seconds or the retry back-off if that's None.
+    """
+
+    def __init__(self, retry_after=None):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    The time budget of the current web request or job ran out before an
+    outbound call could be made.
+    """
+
+    pass
+
+
+class CircuitOpenError(Exception):
+    """Calls to a backend fail fast because its circuit breaker is open."""
+
+    def __init__(self, name, retry_after):
+        self.name = name
+        self.retry_after = retry_after
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.name!r}, {self.retry_after!r})"
+
+    def __str__(self):
+        return f"Circuit breaker for {self.name} is open, retry after {self.retry_after:.0f}s"
+
+
+class RateLimitExceeded(Exception):
+    """A call to a backend isn't made because it would go over the shared rate limit."""
+
+    def __init__(self, name, retry_after):
+        self.name = name
+        self.retry_after = retry_after
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.name!r}, {self.retry_after!r})"
+
+    def __str__(self):
+        return f"Rate limit for {self.name} exceeded, retry after {self.retry_after:.1f}s"
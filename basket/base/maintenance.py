@@ -0,0 +1,61 @@
+"""
+Capture of the tasks queued while in maintenance mode.
+
+While MAINTENANCE_MODE is on, `delay()` doesn't enqueue tasks but captures
+them with the MAINTENANCE_QUEUE_BACKEND, and `process_maintenance_queue`
+enqueues them, in the order they were captured, once it's off:
+
+- "database" saves each task as a `QueuedTask`.
+- "redis" appends each task to a Redis stream. That's a single round trip that
+  doesn't touch the database, which may be degraded or read-only during
+  maintenance, and the stream entry IDs keep the tasks in order.
+"""
+
+import json
+
+from django.conf import settings
+
+from basket import metrics
+from basket.base.rq import add_to_enqueue_batch, get_enqueue_kwargs, get_redis_connection, get_task_queue
+
+STREAM_KEY = "basket:maintenance_queue:stream"
+
+
+def capture_task(task_name, args, kwargs):
+    """Capture a call to the task, to be enqueued after maintenance."""
+    if settings.MAINTENANCE_QUEUE_BACKEND == "redis":
+        get_redis_connection().xadd(
+            STREAM_KEY,
+            {"name": task_name, "args": json.dumps(args), "kwargs": json.dumps(kwargs)},
+        )
+    else:
+        from basket.news.models import QueuedTask
+
+        QueuedTask.objects.create(name=task_name, args=args, kwargs=kwargs)
+
+    metrics.incr(f"{task_name}.queued")
+
+
+def enqueue_task(task_name, args, kwargs):
+    """Enqueue a captured task, or add it to the current `enqueue_batch()`."""
+    queue = get_task_queue(task_name)
+    enqueue_kwargs = get_enqueue_kwargs(task_name)
+    if not add_to_enqueue_batch(queue, task_name, args, kwargs, **enqueue_kwargs):
+        queue.enqueue(task_name, args=args, kwargs=kwargs, **enqueue_kwargs)
+
+
+def read_stream(count):
+    """
+    Return the oldest `count` tasks in the stream.
+
+    @return: a list of (entry_id, task_name, args, kwargs)
+    """
+    return [
+        (entry_id, fields[b"name"].decode(), json.loads(fields[b"args"]), json.loads(fields[b"kwargs"]))
+        for entry_id, fields in get_redis_connection().xrange(STREAM_KEY, count=count)
+    ]
+
+
+def stream_length():
+    """Return the number of tasks in the stream."""
+    return get_redis_connection().xlen(STREAM_KEY)
@@ -0,0 +1,46 @@
+from time import sleep
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from basket import metrics
+from basket.base.rq import QUEUE_CLASSES, get_partition_queue_name, get_queue, get_queue_name, job_age
+
+
+def export_metrics(queue, tags):
+    metrics.gauge("rq.queue.depth", queue.count, tags=tags)
+    # Jobs are pushed to the end of the queue and popped from the front, so the first one is the oldest.
+    oldest_age = 0
+    for job_id in queue.get_job_ids(0, 1):
+        job = queue.fetch_job(job_id)
+        if job is not None:
+            oldest_age = job_age(job) or 0
+    metrics.gauge("rq.queue.oldest_job_age", oldest_age, tags=tags)
+
+
+def export_queue_metrics():
+    """Send the depth of each queue, and the age of its oldest job, tagged by queue class or partition."""
+    for queue_class in QUEUE_CLASSES:
+        export_metrics(get_queue(get_queue_name(queue_class)), [f"queue_class:{queue_class}"])
+    for partition in range(settings.RQ_PARTITIONS):
+        export_metrics(get_queue(get_partition_queue_name(partition)), ["queue_class:partition", f"partition:{partition}"])
+
+
+class Command(BaseCommand):
+    help = "Send queue depth and oldest job age for each queue, once or every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=None,
+            help="Seconds between exports. Default: None (export once and exit)",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            export_queue_metrics()
+            if not interval:
+                break
+            sleep(interval)
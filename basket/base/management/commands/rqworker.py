@@ -1,8 +1,22 @@
+import os
+import socket
 import sys
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
-from basket.base.rq import get_worker
+from basket.base.rq import get_partition_worker, get_worker, run_worker_pool
+
+
+def parse_partitions(value):
+    """Parse "all", or a list of partition numbers and ranges like "0-3,8"."""
+    if value == "all":
+        return list(range(settings.RQ_PARTITIONS))
+    partitions = []
+    for item in value.split(","):
+        start, _, end = item.partition("-")
+        partitions.extend(range(int(start), int(end or start) + 1))
+    return partitions
 
 
 class Command(BaseCommand):
@@ -30,6 +44,27 @@ class Command(BaseCommand):
             type=int,
             help="Maximum number of jobs to execute before quitting. Default: None (infinite)",
         )
+        parser.add_argument(
+            "-w",
+            "--workers",
+            dest="workers",
+            default=settings.RQ_WORKERS,
+            type=int,
+            help=(
+                "Number of jobs to run at once, each in a worker forked from this process. "
+                "With --max-jobs, each worker is replaced after that many jobs. Default: RQ_WORKERS setting"
+            ),
+        )
+        parser.add_argument(
+            "-p",
+            "--partitions",
+            dest="partitions",
+            default=None,
+            help=(
+                'Run the jobs of these ordered partitions, e.g. "all" or "0-3,8", instead of the queue classes. '
+                "With --workers, the partitions are shared out between the workers. Default: None"
+            ),
+        )
 
     def handle(self, *args, **options):
         kwargs = {
@@ -38,8 +73,35 @@ class Command(BaseCommand):
             "max_jobs": options.get("max_jobs", None),
         }
         try:
-            worker = get_worker()
-            worker.work(**kwargs)
+            if options["partitions"] is not None:
+                self.run_partitions(options["partitions"], options["workers"], **kwargs)
+            elif options["workers"] > 1:
+                run_worker_pool(options["workers"], **kwargs)
+            else:
+                worker = get_worker()
+                worker.work(**kwargs)
         except ConnectionError as e:
             self.stderr.write(str(e))
             sys.exit(1)
+
+    def run_partitions(self, value, num_workers, **kwargs):
+        if not settings.RQ_PARTITIONS:
+            raise CommandError("RQ_PARTITIONS is not set")
+        try:
+            partitions = parse_partitions(value)
+        except ValueError:
+            raise CommandError(f"Invalid partitions: {value}") from None
+        if not partitions or not all(0 <= partition < settings.RQ_PARTITIONS for partition in partitions):
+            raise CommandError(f"Partitions must be between 0 and {settings.RQ_PARTITIONS - 1}")
+
+        num_workers = min(num_workers, len(partitions))
+        if num_workers > 1:
+            # Each worker keeps its partitions' leases across restarts, as long as this process runs.
+            owner = f"{socket.gethostname()}:{os.getpid()}"
+            run_worker_pool(
+                num_workers,
+                worker_factory=lambda index: get_partition_worker(partitions[index::num_workers], owner=f"{owner}:{index}"),
+                **kwargs,
+            )
+        else:
+            get_partition_worker(partitions).work(**kwargs)
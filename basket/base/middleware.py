@@ -6,6 +6,7 @@ from django.http import Http404
 from django.utils.deprecation import MiddlewareMixin
 
 from basket import metrics
+from basket.base.deadline import deadline
 
 
 class HostnameMiddleware(MiddlewareMixin):
@@ -16,6 +17,17 @@ class HostnameMiddleware(MiddlewareMixin):
         return response
 
 
+class DeadlineMiddleware:
+    """Give each request a budget of REQUEST_DEADLINE seconds for outbound calls."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with deadline(settings.REQUEST_DEADLINE):
+            return self.get_response(request)
+
+
 class MetricsViewTimingMiddleware(MiddlewareMixin):
     """Send request timing to statsd"""
 
@@ -0,0 +1,109 @@
+"""
+Rate limits for backends, with state shared by all processes.
+
+Each limit is a token bucket kept with the generic cell rate algorithm (GCRA):
+Redis holds the "theoretical arrival time" (TAT) of the next call, which moves
+one emission interval (`period / limit`) ahead for every call. A call is allowed
+if that doesn't put the TAT more than `period` ahead of now, so up to `limit`
+calls can burst and the rate then settles at `limit` per `period`. A Lua script
+checks and moves the TAT in one step, so every web and worker process draws on
+the same budget.
+
+When the backend reports its own budget (e.g. X-RateLimit-Remaining and
+X-RateLimit-Reset headers), `observe()` moves the TAT forward to match, so a
+budget used up elsewhere is respected too.
+"""
+
+from time import sleep, time
+
+from django.conf import settings
+
+from basket import metrics
+from basket.base.exceptions import RateLimitExceeded
+from basket.base.rq import get_redis_connection
+
+# Returns "0" and moves the TAT if a call is allowed, or else the seconds to wait.
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local period = tonumber(ARGV[3])
+local tat = math.max(tonumber(redis.call("GET", KEYS[1]) or 0), now)
+local wait = tat + interval - period - now
+if wait > 0 then
+    return tostring(wait)
+end
+redis.call("SET", KEYS[1], tostring(tat + interval), "PX", math.ceil((tat + interval - now) * 1000))
+return "0"
+"""
+
+# Moves the TAT forward to ARGV[2], if it's behind that.
+OBSERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tat = tonumber(ARGV[2])
+if tat > tonumber(redis.call("GET", KEYS[1]) or 0) then
+    redis.call("SET", KEYS[1], tostring(tat), "PX", math.ceil((tat - now) * 1000) + 1)
+end
+return 0
+"""
+
+
+class RateLimiter:
+    def __init__(self, name, limit, period):
+        """
+        @param name: the limit name, shared by every process calling the backend
+        @param limit: calls allowed per period
+        @param period: period in seconds
+        """
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.interval = period / limit
+        self.key = f"ratelimit:{name}"
+
+    def try_acquire(self):
+        """
+        Take one call from the budget, if there is one.
+
+        @return: 0 if the call is allowed, or else the seconds until it would be
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return 0
+
+        wait = float(get_redis_connection().eval(ACQUIRE_SCRIPT, 1, self.key, time(), self.interval, self.period))
+        if wait:
+            metrics.incr("base.rate_limiter.limited", tags=[f"limit:{self.name}"])
+        return wait
+
+    def acquire(self, max_wait=0):
+        """
+        Wait until a call is allowed, and take it from the budget.
+
+        @param max_wait: the longest to wait, in seconds
+        @raises RateLimitExceeded: if the call isn't allowed within `max_wait`
+        """
+        waited = 0
+        while wait := self.try_acquire():
+            if waited + wait > max_wait:
+                raise RateLimitExceeded(self.name, wait)
+            sleep(wait)
+            waited += wait
+
+    def observe(self, remaining, reset=None):
+        """
+        Lower the budget to what the backend reports.
+
+        @param remaining: calls the backend will still allow
+        @param reset: the Unix time when the backend's budget resets, or None
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        now = time()
+        # With `remaining` calls left in the bucket, the TAT is that many intervals short of a full period ahead.
+        tat = now + self.period - remaining * self.interval
+        if remaining <= 0 and reset is not None:
+            # Nothing left until the reset: allow the next call then.
+            tat = max(tat, reset + self.period - self.interval)
+        if tat > now:
+            get_redis_connection().eval(OBSERVE_SCRIPT, 1, self.key, now, tat)
+            metrics.incr("base.rate_limiter.observed", tags=[f"limit:{self.name}"])
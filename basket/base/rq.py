@@ -1,11 +1,25 @@
+import hashlib
+import json
+import os
 import random
 import re
+import signal
+import socket
 import traceback
-from time import time
-
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import UTC, timedelta
+from email.utils import parsedate_to_datetime
+from time import monotonic, sleep, time
+from types import SimpleNamespace
+
+from django import db
 from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
 
 import redis
+import requests
 import sentry_sdk
 from rq import Callback, Retry, SimpleWorker
 from rq.job import JobStatus
@@ -13,7 +27,8 @@ from rq.queue import Queue
 from rq.serializers import JSONSerializer
 
 from basket import metrics
-from basket.base.exceptions import RetryTask
+from basket.base.deadline import DeadlineRetry
+from basket.base.exceptions import RescheduleTask, RetryTask
 
 # don't propagate and don't retry if these are the error messages
 IGNORE_ERROR_MSGS = [
@@ -32,6 +47,85 @@ IGNORE_ERROR_MSGS_RE = [re.compile(r"campaignId \d+ not found")]
 # Our cached Redis connection.
 _REDIS_CONN = None
 
+# Queue classes. Workers listen to all of them, checking higher-weighted ones
+# first more often (see RQ_QUEUE_WEIGHTS).
+QUEUE_INTERACTIVE = "interactive"  # jobs a user is waiting on, e.g. confirmation emails
+QUEUE_DEFAULT = "default"
+QUEUE_BULK = "bulk"  # high-volume jobs nobody is waiting on, e.g. FxA events
+QUEUE_CLASSES = (QUEUE_INTERACTIVE, QUEUE_DEFAULT, QUEUE_BULK)
+
+# Queue class of each `rq_task`, by task name.
+TASK_QUEUE_CLASSES = {}
+
+# Claims a coalescing key for a new job, returning 1, or else adds the call to
+# the calls of the job holding it, returning 0. Each job's calls are kept in
+# their own list, KEYS[2] followed by the job ID, so they still reach the job
+# if its claim expires before it runs.
+COALESCE_SCRIPT = """
+local holder = redis.call("GET", KEYS[1])
+if not holder then
+    redis.call("SET", KEYS[1], ARGV[1], "EX", ARGV[3])
+    return 1
+end
+local calls = KEYS[2] .. holder
+redis.call("RPUSH", calls, ARGV[2])
+redis.call("EXPIRE", calls, ARGV[4])
+return 0
+"""
+
+# Returns the calls added to the job ARGV[1], and releases its claim if it still holds it.
+TAKE_COALESCED_SCRIPT = """
+local calls = redis.call("LRANGE", KEYS[2], 0, -1)
+redis.call("DEL", KEYS[2])
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    redis.call("DEL", KEYS[1])
+end
+return calls
+"""
+
+# Calls added to a job are kept for this long after the last one, in seconds,
+# even once the job's claim has expired.
+COALESCED_CALLS_TTL = 7 * 24 * 60 * 60
+
+# Takes or renews the lease on a partition for ARGV[1], unless another worker holds it.
+CLAIM_PARTITION_SCRIPT = """
+local owner = redis.call("GET", KEYS[1])
+if owner and owner ~= ARGV[1] then
+    return 0
+end
+redis.call("SET", KEYS[1], ARGV[1], "EX", ARGV[2])
+return 1
+"""
+
+# Releases a partition lease or a coalescing claim, if ARGV[1] holds it.
+RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+# Jobs collected by the current `enqueue_batch()`, or None outside of one.
+_enqueue_batch = ContextVar("enqueue_batch", default=None)
+
+# True while an `rq_task` runs in a worker, where retries are left to the queue.
+_in_worker_job = ContextVar("in_worker_job", default=False)
+
+
+@contextmanager
+def worker_job(in_worker):
+    """Run the block as part of a job that a worker can reschedule, if `in_worker`."""
+    token = _in_worker_job.set(in_worker)
+    try:
+        yield
+    finally:
+        _in_worker_job.reset(token)
+
+
+def in_worker_job():
+    """Return True if the current code runs in a job that a worker can reschedule."""
+    return _in_worker_job.get()
+
 
 def get_redis_connection(url=None, force=False):
     """
@@ -77,23 +171,411 @@ def get_queue(queue=None):
     )
 
 
+@contextmanager
+def enqueue_batch(on_flush=None):
+    """
+    Collect the jobs enqueued in the block, and enqueue them all with one Redis pipeline when it ends.
+
+    Used where one request or event enqueues several jobs. `delay()` returns None
+    for jobs collected this way. Calls to coalesced tasks are coalesced together,
+    with one more pipeline, before the jobs that are still needed are enqueued.
+    A nested block joins the outer one. When jobs run synchronously (RQ_IS_ASYNC
+    off), they are enqueued straight away instead.
+
+    @param on_flush: called with the pipeline before it's executed, to add Redis
+        commands that should take effect together with the jobs
+    """
+    batch = _enqueue_batch.get()
+    if batch is not None:
+        if on_flush is not None:
+            batch.on_flush.append(on_flush)
+        yield
+        return
+
+    batch = SimpleNamespace(jobs=[], on_flush=[on_flush] if on_flush is not None else [])
+    token = _enqueue_batch.set(batch) if settings.RQ_IS_ASYNC else None
+    try:
+        yield
+    finally:
+        if token is not None:
+            _enqueue_batch.reset(token)
+        jobs = batch.jobs
+        if jobs or batch.on_flush:
+            try:
+                coalescing = [job for job in jobs if job[5].get("meta", {}).get("coalesce_key") is not None]
+                if coalescing:
+                    added = coalesce_calls(
+                        [
+                            (
+                                enqueue_kwargs["meta"]["task_name"],
+                                enqueue_kwargs["meta"]["coalesce_key"],
+                                enqueue_kwargs["job_id"],
+                                args,
+                                kwargs,
+                                enqueue_in,
+                            )
+                            for _queue, _func, args, kwargs, enqueue_in, enqueue_kwargs in coalescing
+                        ]
+                    )
+                    added_ids = {job[5]["job_id"] for job, was_added in zip(coalescing, added, strict=True) if was_added}
+                    jobs = [job for job in jobs if job[5].get("job_id") not in added_ids]
+                with get_redis_connection().pipeline() as pipe:
+                    for queue, func, args, kwargs, enqueue_in, enqueue_kwargs in jobs:
+                        if enqueue_in:
+                            queue.enqueue_in(enqueue_in, func, args=args, kwargs=kwargs, pipeline=pipe, **enqueue_kwargs)
+                        else:
+                            queue.enqueue_call(func, args=args, kwargs=kwargs, pipeline=pipe, **enqueue_kwargs)
+                    for callback in batch.on_flush:
+                        callback(pipe)
+                    pipe.execute()
+            except Exception:
+                for *_, enqueue_kwargs in batch.jobs:
+                    meta = enqueue_kwargs.get("meta", {})
+                    if meta.get("coalesce_key") is not None:
+                        release_coalesce_claim(meta["task_name"], meta["coalesce_key"], enqueue_kwargs["job_id"])
+                raise
+        if jobs:
+            metrics.histogram("base.rq.enqueue_batch.size", len(jobs))
+
+
+def add_to_enqueue_batch(queue, func, args, kwargs, enqueue_in=None, **enqueue_kwargs):
+    """
+    Add a job to the current `enqueue_batch()`.
+
+    @return: True if the job was added, False if there's no batch to add it to
+    """
+    batch = _enqueue_batch.get()
+    if batch is None:
+        return False
+    batch.jobs.append((queue, func, args, kwargs, enqueue_in, enqueue_kwargs))
+    return True
+
+
+def _coalesce_keys(task_name, key):
+    """Return the key of the claim, and the prefix of the keys of each job's calls."""
+    return f"coalesce:{task_name}:{key}", f"coalesce:{task_name}:{key}:calls:"
+
+
+def coalesce_call(task_name, key, job_id, args, kwargs, enqueue_in=None):
+    """
+    Add a call to the job waiting in the queue for the same coalescing key, if there is one.
+
+    A job's claim on the key lasts RQ_COALESCE_TTL seconds past its `enqueue_in`
+    delay, so a job that is lost or left waiting long only holds up the calls
+    made until then, and later calls enqueue a new job.
+
+    @return: True if the call was added to a waiting job, or False if `job_id` now
+        holds the key and should be enqueued for the call, or released with
+        `release_coalesce_claim()` if that fails
+    """
+    return coalesce_calls([(task_name, key, job_id, args, kwargs, enqueue_in)])[0]
+
+
+def coalesce_calls(calls):
+    """
+    Run `coalesce_call()` for each of `calls`, given as its arguments, with one Redis pipeline.
+
+    A call is added to the job of an earlier one in the list with the same key.
+
+    @return: the result of `coalesce_call()` for each call
+    """
+    with get_redis_connection().pipeline(transaction=False) as pipe:
+        for task_name, key, job_id, args, kwargs, enqueue_in in calls:
+            call = json.dumps([args, kwargs])
+            ttl = settings.RQ_COALESCE_TTL + (int(enqueue_in.total_seconds()) if enqueue_in else 0)
+            pipe.eval(COALESCE_SCRIPT, 2, *_coalesce_keys(task_name, key), job_id, call, ttl, ttl + COALESCED_CALLS_TTL)
+        return [not claimed for claimed in pipe.execute()]
+
+
+def release_coalesce_claim(task_name, key, job_id):
+    """Release the claim of a job that couldn't be enqueued, so the next call enqueues a new job."""
+    claim_key, calls_prefix = _coalesce_keys(task_name, key)
+    redis = get_redis_connection()
+    redis.eval(RELEASE_SCRIPT, 1, claim_key, job_id)
+    redis.delete(f"{calls_prefix}{job_id}")
+
+
+def take_coalesced_calls(job, task_name):
+    """
+    Return the calls added to `job` while it waited in the queue, oldest first, as (args, kwargs).
+
+    Calls for the same key made from now on enqueue a new job.
+    """
+    claim_key, calls_prefix = _coalesce_keys(task_name, job.meta["coalesce_key"])
+    calls = get_redis_connection().eval(TAKE_COALESCED_SCRIPT, 2, claim_key, f"{calls_prefix}{job.id}", job.id)
+    return [tuple(json.loads(call)) for call in calls]
+
+
+def get_queue_name(queue_class=QUEUE_DEFAULT):
+    """Return the name of the queue for a queue class."""
+    name = settings.RQ_DEFAULT_QUEUE or "default"
+    if queue_class == QUEUE_DEFAULT:
+        return name
+    return f"{name}-{queue_class}"
+
+
+def get_queue_class(queue_name):
+    """Return the queue class of a queue name, or None if it isn't one of ours."""
+    return next((queue_class for queue_class in QUEUE_CLASSES if get_queue_name(queue_class) == queue_name), None)
+
+
+def get_task_queue(task_name):
+    """Get the queue for a task, by its `rq_task` queue class."""
+    return get_queue(get_queue_name(TASK_QUEUE_CLASSES.get(task_name, QUEUE_DEFAULT)))
+
+
+def get_partition(key):
+    """Return the ordered partition for a partition key, the same in every process."""
+    digest = hashlib.sha1(str(key).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % settings.RQ_PARTITIONS
+
+
+def get_partition_queue_name(partition):
+    """Return the name of the queue for an ordered partition."""
+    return f"{settings.RQ_DEFAULT_QUEUE or 'default'}-partition-{partition}"
+
+
+def partition_lease_key(partition):
+    return f"rq:partition:{get_partition_queue_name(partition)}:owner"
+
+
+def record_queue_metrics(job, queue):
+    """Send the depth of `queue`, tagged by queue class."""
+    tags = [f"queue_class:{get_queue_class(queue.name) or queue.name}"]
+    metrics.gauge("rq.queue.depth", queue.count, tags=tags)
+
+
+def job_age(job):
+    """Return the seconds since `job` was put in its queue, or None if it isn't known."""
+    enqueued_at = job.enqueued_at
+    if enqueued_at is None:
+        return None
+    if enqueued_at.tzinfo is None:
+        # Older RQ versions store naive UTC datetimes.
+        enqueued_at = enqueued_at.replace(tzinfo=UTC)
+    return (timezone.now() - enqueued_at).total_seconds()
+
+
+@contextmanager
+def job_timings(job, task_name):
+    """
+    Send the attempt number, queue wait and execution time of a run of `job`.
+
+    The queue wait runs from when the job was put in its queue, which leaves out
+    `enqueue_in` delays and retry back-off, to when this run started. The block
+    can set `run.status` to say how the run ended; it's "failure" if the block
+    raises. End-to-end latency, from the first enqueue, is sent as `task.timings`.
+    """
+    tags = [f"task:{task_name}", f"queue_class:{get_queue_class(job.origin) or job.origin}"]
+    # Kept in the meta, which RQ retries and `reschedule_job` carry over to the next run.
+    job.meta["attempt"] = job.meta.get("attempt", 0) + 1
+    metrics.histogram("task.attempt", job.meta["attempt"], tags=tags)
+    wait_time = job_age(job)
+    if wait_time is not None:
+        metrics.timing("task.queue_wait", int(wait_time * 1000), tags=tags)
+
+    run = SimpleNamespace(status="success")
+    start = monotonic()
+    try:
+        yield run
+    except BaseException:
+        run.status = "failure"
+        raise
+    finally:
+        metrics.timing("task.execution", int((monotonic() - start) * 1000), tags=[*tags, f"status:{run.status}"])
+
+
+class WeightedWorker(SimpleWorker):
+    """
+    Worker that checks its queues in a new weighted random order after each job.
+
+    A queue with twice the weight of another is checked first about twice as
+    often, so busy low-priority queues slow high-priority ones down without
+    being starved by them.
+    """
+
+    def __init__(self, *args, weights=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.weights = weights or {}
+        self.reorder_queues(None)
+
+    def reorder_queues(self, reference_queue):
+        # Weighted random sampling without replacement (Efraimidis-Spirakis).
+        keys = {queue.name: random.random() ** (1 / self.weights.get(queue.name, 1)) for queue in self.queues}
+        self._ordered_queues = sorted(self.queues, key=lambda queue: keys[queue.name], reverse=True)
+
+    def execute_job(self, job, queue):
+        record_queue_metrics(job, queue)
+        return super().execute_job(job, queue)
+
+
+class PartitionWorker(WeightedWorker):
+    """
+    Worker that runs the jobs of its ordered partitions one at a time.
+
+    All the jobs for a partition key go to the same partition queue. The worker
+    holds a lease on each of its partitions in Redis, so no other worker runs
+    their jobs, and they run in the order they were enqueued. The leases are
+    renewed with the worker's heartbeat and released when it stops. A worker
+    that loses a lease takes no more jobs until it has the lease again.
+    """
+
+    def __init__(self, *args, partitions=(), owner=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.partitions = list(partitions)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+
+    def renew_lease(self, partition):
+        """Take or renew the lease on a partition, and return False if another worker holds it."""
+        return bool(self.connection.eval(CLAIM_PARTITION_SCRIPT, 1, partition_lease_key(partition), self.owner, settings.RQ_PARTITION_LEASE_TTL))
+
+    def claim_partitions(self, wait=5):
+        """Take the leases on all of the worker's partitions, waiting while other workers hold any of them."""
+        while unclaimed := [partition for partition in self.partitions if not self.renew_lease(partition)]:
+            # e.g. a worker from before a deploy that hasn't stopped yet.
+            metrics.incr("base.rq.partition.busy", value=len(unclaimed))
+            sleep(wait)
+
+    def release_partitions(self):
+        for partition in self.partitions:
+            self.connection.eval(RELEASE_SCRIPT, 1, partition_lease_key(partition), self.owner)
+
+    def heartbeat(self, timeout=None, pipeline=None, wait=5):
+        super().heartbeat(timeout, pipeline=pipeline)
+        lost = [partition for partition in self.partitions if not self.renew_lease(partition)]
+        for partition in lost:
+            metrics.incr("base.rq.partition.lost", tags=[f"partition:{partition}"])
+
+        # Another worker may be running the jobs of a lost partition, so take no job, including one
+        # just dequeued, until its lease is back. A heartbeat in a pipeline is part of starting a job
+        # that the heartbeat after dequeueing it has already checked.
+        while lost and pipeline is None:
+            sleep(wait)
+            super().heartbeat(timeout)
+            lost = [partition for partition in lost if not self.renew_lease(partition)]
+
+    def register_death(self, *args, **kwargs):
+        self.release_partitions()
+        super().register_death(*args, **kwargs)
+
+
 def get_worker(queues=None):
     """
     Get an RQ worker with our chosen parameters.
 
+    By default, the worker listens to the queues of all queue classes.
     """
     if queues is None:
-        queues = [get_queue()]
+        queues = [get_queue(get_queue_name(queue_class)) for queue_class in QUEUE_CLASSES]
 
-    return SimpleWorker(
+    return WeightedWorker(
         queues,
         connection=get_redis_connection(),
         disable_default_exception_handler=True,
         exception_handlers=[store_task_exception_handler],
         serializer=JSONSerializer,
+        weights={get_queue_name(queue_class): weight for queue_class, weight in settings.RQ_QUEUE_WEIGHTS.items()},
     )
 
 
+def get_partition_worker(partitions, owner=None):
+    """
+    Get an RQ worker for ordered partitions, holding their leases.
+
+    @param partitions: the partition numbers, below RQ_PARTITIONS
+    @param owner: identifies the lease holder, so a replacement worker can take
+        over the leases of the one it replaces. Default: host name and pid.
+    """
+    worker = PartitionWorker(
+        [get_queue(get_partition_queue_name(partition)) for partition in partitions],
+        connection=get_redis_connection(),
+        disable_default_exception_handler=True,
+        exception_handlers=[store_task_exception_handler],
+        serializer=JSONSerializer,
+        partitions=partitions,
+        owner=owner,
+    )
+    worker.claim_partitions()
+    return worker
+
+
+def run_worker_pool(num_workers, worker_factory=None, **work_kwargs):
+    """
+    Run `num_workers` workers as forked children of this process, until they're all done.
+
+    The children start with Django and the backends already imported, and each
+    runs one job at a time like a single worker. A child that exits, e.g. after
+    `max_jobs` jobs, is replaced by a fresh one unless the pool is in burst mode
+    or shutting down. SIGTERM is passed on to the children, which finish their
+    current job before exiting.
+
+    @param worker_factory: called with the child's index, from 0 to
+        `num_workers - 1`, to get its worker. A replacement child gets the index
+        of the one it replaces. Default: `get_worker()`.
+    @param work_kwargs: passed to `Worker.work()` in each child
+    """
+    if worker_factory is None:
+
+        def worker_factory(index):
+            return get_worker()
+
+    children = {}
+    stopping = False
+
+    def start_child(index):
+        # Don't share open connections with the child.
+        db.connections.close_all()
+        caches.close_all()
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                get_redis_connection(force=True)
+                worker_factory(index).work(**work_kwargs)
+            except BaseException:
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = (time(), index)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        # SIGINT from a terminal already reaches the whole process group.
+        if signum == signal.SIGTERM:
+            for pid in children:
+                try:
+                    os.kill(pid, signum)
+                except ProcessLookupError:
+                    pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(num_workers):
+        start_child(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        child = children.pop(pid, None)
+        if child is None:
+            continue
+        started, index = child
+        exit_code = os.waitstatus_to_exitcode(status)
+        metrics.incr("base.rq.worker_pool.exited", tags=[f"exit_code:{exit_code}"])
+        if stopping or work_kwargs.get("burst"):
+            continue
+        if exit_code and time() - started < 1:
+            # Don't fork in a tight loop if children fail straight away, e.g. while Redis is down.
+            sleep(1)
+        start_child(index)
+
+
 def get_enqueue_kwargs(func):
     if isinstance(func, str):
         task_name = func
@@ -120,6 +602,90 @@ def get_enqueue_kwargs(func):
     }
 
 
+def reschedule_job(job, delay, retries_left=None):
+    """
+    Enqueue a new run of `job` in `delay` seconds.
+
+    The new job keeps the original meta, so its timings still count from when
+    the task was first queued and its attempt number carries on from this run,
+    and the retries the original job had left unless `retries_left` is given.
+    `job` is marked as rescheduled, so its end-to-end time is only sent once
+    the last run ends.
+    """
+    if retries_left is None:
+        retries_left = job.retries_left
+    enqueue_kwargs = get_enqueue_kwargs(job.func_name)
+    enqueue_kwargs["meta"] = {key: value for key, value in job.meta.items() if key != "rescheduled"}
+    if retries_left:
+        enqueue_kwargs["retry"] = Retry(retries_left, job.retry_intervals or 0)
+    else:
+        enqueue_kwargs["retry"] = None
+
+    new_job = get_queue(job.origin).enqueue_in(
+        timedelta(seconds=max(1, int(delay))),
+        job.func_name,
+        args=job.args,
+        kwargs=job.kwargs,
+        **enqueue_kwargs,
+    )
+    job.meta["rescheduled"] = True
+    return new_job
+
+
+def parse_retry_after(value):
+    """Return the seconds to wait from a Retry-After header value, or None if it's not valid."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - timezone.now()).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0), settings.RQ_MAX_RETRY_DELAY)
+
+
+def transient_error(exc):
+    """
+    Check if an exception is a transient backend error that is worth running the job again for.
+
+    The exception and the ones it was raised from are checked, so backend errors
+    raised from a `requests` error count too.
+
+    @return: a tuple of whether the error is transient, and the seconds to wait
+        before running the job again if the error says so, or None
+    """
+    while exc is not None:
+        if isinstance(exc, RescheduleTask):
+            return True, exc.retry_after
+        if isinstance(exc, requests.HTTPError) and exc.response is not None:
+            if exc.response.status_code == 429:
+                return True, parse_retry_after(exc.response.headers.get("Retry-After"))
+            if exc.response.status_code >= 500:
+                return True, None
+            return False, None
+        if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+            return True, None
+        exc = exc.__cause__
+    return False, None
+
+
+class WorkerRetry(DeadlineRetry):
+    """
+    urllib3 Retry that only retries, and sleeps between attempts, outside of worker jobs,
+    and within the current deadline.
+
+    Inside a worker job the error is raised straight away, so the job is
+    rescheduled instead of holding the worker while backing off.
+    """
+
+    def increment(self, *args, **kwargs):
+        if in_worker_job():
+            return DeadlineRetry.increment(self.new(total=0), *args, **kwargs)
+        return super().increment(*args, **kwargs)
+
+
 def rq_exponential_backoff():
     """
     Return an array of retry delays for RQ using an exponential back-off, using
@@ -133,15 +699,18 @@ def rq_exponential_backoff():
 
 
 def record_metrics_timing(job, status):
+    """Send the end-to-end time of a task, from when it was first enqueued to when its last run ended."""
     task_name = job.meta["task_name"]
     start_time = job.meta.get("start_time")
     if start_time and not settings.MAINTENANCE_MODE and not task_name.endswith("snitch"):
         total_time = int((time() - start_time) * 1000)
-        metrics.timing("task.timings", total_time, tags=[f"task:{task_name}", f"status:{status}"])
+        metrics.timing("task.timings", total_time, tags=[f"task:{task_name}", f"queue:{job.origin}", f"status:{status}"])
 
 
 def rq_on_success(job, connection, result, *args, **kwargs):
-    record_metrics_timing(job, "success")
+    # A rescheduled run hasn't finished the task; its next run sends the timing.
+    if not job.meta.get("rescheduled"):
+        record_metrics_timing(job, "success")
 
 
 def rq_on_failure(job, connection, *exc_info, **kwargs):
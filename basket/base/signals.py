@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent right before the body of an `rq_task` runs, whether it was picked up by a
+# worker or called directly. It plays the same role for jobs as Django's
+# `request_started` does for web requests.
+task_started = Signal()
@@ -1,6 +1,14 @@
+import requests
+
+from basket.base.deadline import time_remaining
 from basket.base.decorators import rq_task
+from basket.base.exceptions import CircuitOpenError, RateLimitExceeded
+from basket.base.rq import QUEUE_INTERACTIVE
+from basket.news.backends.braze import BrazeInterface
 from basket.news.utils import NewsletterException
 
+braze_client = BrazeInterface("http://test.com", "test_api_key")
+
 
 @rq_task
 def failing_job(arg1, **kwargs):
@@ -15,3 +23,47 @@ def retryable_job(arg1, **kwargs):
 @rq_task
 def empty_job(arg1, **kwargs):
     pass
+
+
+@rq_task(queue_class=QUEUE_INTERACTIVE)
+def interactive_job(arg1, **kwargs):
+    pass
+
+
+@rq_task
+def time_remaining_job():
+    return time_remaining()
+
+
+@rq_task
+def circuit_open_job(arg1, **kwargs):
+    raise CircuitOpenError("ctms", 30)
+
+
+@rq_task
+def rate_limited_job(arg1, **kwargs):
+    raise RateLimitExceeded("braze:/users/track", 1.5)
+
+
+@rq_task
+def connection_error_job(arg1, **kwargs):
+    raise requests.ConnectionError("An exception to trigger a reschedule.")
+
+
+def record_call(*args):
+    pass
+
+
+@rq_task(coalesce=lambda arg1, *args, **kwargs: arg1)
+def coalesced_job(arg1, arg2):
+    record_call(arg1, arg2)
+
+
+@rq_task(partition_by=lambda arg1, **kwargs: arg1)
+def partitioned_job(arg1, **kwargs):
+    pass
+
+
+@rq_task
+def braze_track_job(email):
+    braze_client.track_user(email)
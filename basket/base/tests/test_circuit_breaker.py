@@ -0,0 +1,159 @@
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+
+import pytest
+import requests
+
+from basket import errors
+from basket.base.circuit_breaker import CircuitBreaker
+from basket.base.exceptions import CircuitOpenError, DeadlineExceeded
+from basket.news.backends.common import NewsletterException
+from basket.news.backends.ctms import CTMSSession
+from basket.news.utils import get_user_data
+
+BREAKER_SETTINGS = {
+    "CIRCUIT_BREAKER_ENABLED": True,
+    "CIRCUIT_BREAKER_WINDOW": 60,
+    "CIRCUIT_BREAKER_MIN_CALLS": 4,
+    "CIRCUIT_BREAKER_ERROR_RATE": 0.5,
+    "CIRCUIT_BREAKER_SLOW_CALL": 10,
+    "CIRCUIT_BREAKER_SLOW_RATE": 0.8,
+    "CIRCUIT_BREAKER_OPEN_SECONDS": 30,
+}
+
+
+def call(breaker, exc=None, failed=False):
+    with breaker.guard() as current:
+        current.failed = failed
+        if exc:
+            raise exc
+
+
+@pytest.fixture
+def breaker_settings(settings):
+    for name, value in BREAKER_SETTINGS.items():
+        setattr(settings, name, value)
+    cache.clear()
+    return settings
+
+
+class TestCircuitBreaker:
+    @pytest.fixture(autouse=True)
+    def setup(self, breaker_settings):
+        self.breaker = CircuitBreaker("test", failures=(requests.ConnectionError,))
+
+    def fail(self, times):
+        for _ in range(times):
+            with pytest.raises(requests.ConnectionError):
+                call(self.breaker, requests.ConnectionError())
+
+    def test_closed(self):
+        for _ in range(10):
+            call(self.breaker)
+        call(self.breaker)
+
+    def test_opens_on_error_rate(self, metricsmock):
+        call(self.breaker)
+        call(self.breaker)
+        self.fail(2)
+
+        metricsmock.assert_incr_once("base.circuit_breaker", tags=["backend:test", "state:open"])
+        with pytest.raises(CircuitOpenError) as exc_info:
+            call(self.breaker)
+        assert exc_info.value.name == "test"
+        assert 29 < exc_info.value.retry_after <= 30
+
+    def test_needs_min_calls(self):
+        self.fail(3)
+        call(self.breaker)
+
+    def test_other_errors_not_counted(self):
+        for _ in range(4):
+            with pytest.raises(ValueError):
+                call(self.breaker, ValueError())
+        call(self.breaker)
+
+    def test_deadline_not_counted(self):
+        for _ in range(4):
+            with pytest.raises(DeadlineExceeded):
+                call(self.breaker, DeadlineExceeded())
+        call(self.breaker)
+
+    def test_reported_failure(self):
+        for _ in range(4):
+            call(self.breaker, failed=True)
+        with pytest.raises(CircuitOpenError):
+            call(self.breaker)
+
+    def test_opens_on_slow_rate(self):
+        with patch("basket.base.circuit_breaker.monotonic", side_effect=[0, 11] * 4):
+            for _ in range(4):
+                call(self.breaker)
+        with pytest.raises(CircuitOpenError):
+            call(self.breaker)
+
+    def test_shared_by_name(self):
+        self.fail(4)
+        with pytest.raises(CircuitOpenError):
+            call(CircuitBreaker("test"))
+        call(CircuitBreaker("other"))
+
+    def test_probe_closes(self, metricsmock):
+        self.fail(4)
+        with patch("basket.base.circuit_breaker.time", return_value=cache.get("circuit:test:open_until") + 1):
+            with self.breaker.guard():
+                # Only one call probes the backend at a time.
+                with pytest.raises(CircuitOpenError):
+                    call(self.breaker)
+            call(self.breaker)
+
+        metricsmock.assert_incr_once("base.circuit_breaker", tags=["backend:test", "state:half_open"])
+        metricsmock.assert_incr_once("base.circuit_breaker", tags=["backend:test", "state:closed"])
+
+    def test_probe_reopens(self, metricsmock):
+        self.fail(4)
+        open_until = cache.get("circuit:test:open_until")
+        with patch("basket.base.circuit_breaker.time", return_value=open_until + 1):
+            self.fail(1)
+            with pytest.raises(CircuitOpenError) as exc_info:
+                call(self.breaker)
+
+        assert exc_info.value.retry_after == 30
+        assert len(metricsmock.filter_records("incr", stat="base.circuit_breaker", tags=["backend:test", "state:open"])) == 2
+
+    def test_probe_cut_short_by_deadline(self):
+        self.fail(4)
+        with patch("basket.base.circuit_breaker.time", return_value=cache.get("circuit:test:open_until") + 1):
+            with pytest.raises(DeadlineExceeded):
+                call(self.breaker, DeadlineExceeded())
+            # Another call can probe right away.
+            call(self.breaker)
+            call(self.breaker)
+
+    def test_disabled(self, breaker_settings):
+        breaker_settings.CIRCUIT_BREAKER_ENABLED = False
+        self.fail(10)
+        call(self.breaker)
+
+
+@pytest.mark.usefixtures("breaker_settings")
+class TestBackendCircuitBreakers:
+    def test_ctms_server_errors(self):
+        session = CTMSSession("https://ctms.example.com", "id", "secret")
+        oauth_session = Mock(token={"access_token": "token", "expires_at": None})
+        oauth_session.request.return_value = Mock(status_code=503)
+        with patch.object(CTMSSession, "_session", oauth_session):
+            for _ in range(4):
+                assert session.get("/ctms").status_code == 503
+            with pytest.raises(CircuitOpenError):
+                session.get("/ctms")
+        assert oauth_session.request.call_count == 4
+
+    @patch("basket.news.utils.ctms")
+    def test_get_user_data_fails_fast(self, mock_ctms):
+        mock_ctms.get.side_effect = CircuitOpenError("ctms", 30)
+        with pytest.raises(NewsletterException) as exc_info:
+            get_user_data(email="test@example.com")
+        assert exc_info.value.error_code == errors.BASKET_NETWORK_FAILURE
+        assert exc_info.value.status_code == 400
@@ -0,0 +1,132 @@
+from time import sleep
+from unittest.mock import patch
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+import pytest
+import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from basket.base.deadline import DeadlineHTTPAdapter, DeadlineRetry, attempt_timeout, deadline, stop_before_deadline, time_remaining
+from basket.base.exceptions import DeadlineExceeded
+from basket.base.middleware import DeadlineMiddleware
+from basket.base.tests.tasks import time_remaining_job
+
+
+class TestDeadline:
+    def test_no_deadline(self):
+        assert time_remaining() is None
+        assert attempt_timeout(3, 20) == (3, 20)
+
+    def test_deadline(self):
+        with deadline(10):
+            assert 9 < time_remaining() <= 10
+            connect, read = attempt_timeout(3, 20)
+            assert connect == 3
+            assert 9 < read <= 10
+        assert time_remaining() is None
+
+    def test_nested_deadline_only_shortens(self):
+        with deadline(5):
+            with deadline(60):
+                assert time_remaining() <= 5
+            with deadline(1):
+                assert time_remaining() <= 1
+            assert 1 < time_remaining() <= 5
+
+    def test_exceeded(self, metricsmock):
+        with deadline(0):
+            with pytest.raises(DeadlineExceeded):
+                attempt_timeout(3, 20)
+        metricsmock.assert_incr_once("base.deadline.exceeded")
+
+    def test_exceeded_is_a_timeout(self):
+        assert issubclass(DeadlineExceeded, requests.exceptions.Timeout)
+
+
+class TestDeadlineHTTPAdapter:
+    def send(self, adapter, **kwargs):
+        request = requests.Request("GET", "https://example.com/").prepare()
+        with patch("requests.adapters.HTTPAdapter.send") as mock_send:
+            adapter.send(request, **kwargs)
+        timeout = mock_send.call_args.kwargs["timeout"]
+        return timeout.connect_timeout, timeout.read_timeout
+
+    @override_settings(HTTP_CONNECT_TIMEOUT=3, HTTP_READ_TIMEOUT=20)
+    def test_default_timeouts(self):
+        assert self.send(DeadlineHTTPAdapter()) == (3, 20)
+        assert self.send(DeadlineHTTPAdapter(connect_timeout=1, read_timeout=5)) == (1, 5)
+
+    @override_settings(HTTP_CONNECT_TIMEOUT=3, HTTP_READ_TIMEOUT=20)
+    def test_caller_timeout_only_shortens(self):
+        assert self.send(DeadlineHTTPAdapter(), timeout=10) == (3, 10)
+        assert self.send(DeadlineHTTPAdapter(), timeout=(1, 60)) == (1, 20)
+
+    @override_settings(HTTP_CONNECT_TIMEOUT=3, HTTP_READ_TIMEOUT=20)
+    def test_deadline(self):
+        with deadline(2):
+            connect, read = self.send(DeadlineHTTPAdapter())
+        assert connect <= 2
+        assert read <= 2
+
+    def test_deadline_exceeded(self):
+        with deadline(0), pytest.raises(DeadlineExceeded):
+            self.send(DeadlineHTTPAdapter())
+
+    @override_settings(HTTP_CONNECT_TIMEOUT=3, HTTP_READ_TIMEOUT=20)
+    def test_slow_retries_exceed_deadline(self, metricsmock):
+        """Each retry gets the time left as its timeout, and retries stop once the deadline is used up."""
+        read_timeouts = []
+
+        def slow_attempt(conn, method, url, timeout, **kwargs):
+            read_timeouts.append(timeout.read_timeout)
+            sleep(0.2)
+            raise ReadTimeoutError(None, url, "Read timed out.")
+
+        session = requests.Session()
+        session.mount("https://", DeadlineHTTPAdapter(max_retries=DeadlineRetry(total=10, backoff_factor=0)))
+        with patch("urllib3.connectionpool.HTTPConnectionPool._make_request", side_effect=slow_attempt):
+            with deadline(0.5), pytest.raises(DeadlineExceeded):
+                session.get("https://example.com/")
+
+        assert len(read_timeouts) == 3
+        assert read_timeouts == sorted(read_timeouts, reverse=True)
+        assert read_timeouts[-1] <= 0.1
+        metricsmock.assert_incr_once("base.deadline.exceeded")
+
+    def test_retry_backoff_past_deadline(self):
+        """Retries stop when the backoff would outlast the deadline."""
+        retry = DeadlineRetry(total=10, backoff_factor=10)
+        retry = retry.increment("GET", "/", error=ProtocolError())
+        with deadline(5), pytest.raises(DeadlineExceeded):
+            retry.increment("GET", "/", error=ProtocolError())
+
+
+def test_stop_before_deadline():
+    stop = stop_before_deadline(2)
+    assert not stop(None)
+    with deadline(10):
+        assert not stop(None)
+    with deadline(1):
+        assert stop(None)
+
+
+@override_settings(REQUEST_DEADLINE=7)
+def test_middleware():
+    remaining = []
+
+    def get_response(request):
+        remaining.append(time_remaining())
+        return HttpResponse()
+
+    DeadlineMiddleware(get_response)(RequestFactory().get("/"))
+    assert 6 < remaining[0] <= 7
+    assert time_remaining() is None
+
+
+@override_settings(TASK_DEADLINE=9)
+def test_task_deadline():
+    assert 8 < time_remaining_job() <= 9
+    assert time_remaining() is None
@@ -6,8 +6,10 @@ from django.test.utils import override_settings
 import pytest
 from freezegun import freeze_time
 
-from basket.base.rq import get_worker
-from basket.base.tests.tasks import empty_job
+from basket.base.maintenance import STREAM_KEY, read_stream
+from basket.base.rq import get_redis_connection, get_task_queue, get_worker
+from basket.base.signals import task_started
+from basket.base.tests.tasks import empty_job, interactive_job
 from basket.news.models import QueuedTask
 
 
@@ -81,6 +83,26 @@ class TestDecorator:
             on_success=mock_callback(),
         )
 
+    @patch("basket.base.decorators.get_queue")
+    def test_rq_task_queue_class(self, mock_get_queue):
+        """
+        Test that the decorator sends jobs to the queue of the task's queue class.
+        """
+        interactive_job.delay("arg1")
+        mock_get_queue.assert_called_once_with("testqueue-interactive")
+
+        mock_get_queue.reset_mock()
+        empty_job.delay("arg1")
+        mock_get_queue.assert_called_once_with("testqueue")
+
+    def test_get_task_queue(self):
+        """
+        Test that retried tasks go back to the queue of their queue class.
+        """
+        assert get_task_queue("basket.base.tests.tasks.interactive_job").name == "testqueue-interactive"
+        assert get_task_queue("basket.base.tests.tasks.empty_job").name == "testqueue"
+        assert get_task_queue("unknown.task").name == "testqueue"
+
     @override_settings(MAINTENANCE_MODE=True)
     def test_maintenance_mode_no_readonly(self, metricsmock):
         """
@@ -93,6 +115,21 @@ class TestDecorator:
         metricsmock.assert_incr_once("basket.base.tests.tasks.empty_job.queued")
         assert QueuedTask.objects.count() == 1
 
+    @override_settings(MAINTENANCE_MODE=True, MAINTENANCE_QUEUE_BACKEND="redis")
+    def test_maintenance_mode_redis(self, metricsmock):
+        """
+        Test that maintenance mode can capture tasks in a Redis stream instead of the database.
+        """
+        get_redis_connection().delete(STREAM_KEY)
+
+        empty_job.delay("arg1", kwarg1="value1")
+
+        metricsmock.assert_incr_once("basket.base.tests.tasks.empty_job.queued")
+        assert QueuedTask.objects.count() == 0
+        [(_, task_name, args, kwargs)] = read_stream(10)
+        assert (task_name, args, kwargs) == ("basket.base.tests.tasks.empty_job", ["arg1"], {"kwarg1": "value1"})
+        get_redis_connection().delete(STREAM_KEY)
+
     def test_job_success(self, metricsmock):
         """
         Test that the decorator marks the job as successful if the task runs
@@ -103,4 +140,21 @@ class TestDecorator:
         worker = get_worker()
         worker.work(burst=True)  # Burst = worker will quit after all jobs consumed.
 
-        metricsmock.assert_timing_once("task.timings", tags=["task:basket.base.tests.tasks.empty_job", "status:success"])
+        metricsmock.assert_timing_once("task.timings", tags=["task:basket.base.tests.tasks.empty_job", "queue:testqueue", "status:success"])
+
+    def test_task_started_signal(self):
+        """
+        Test that the decorator sends `task_started` before running the task.
+        """
+        received = []
+
+        def receiver(sender, task_name, **kwargs):
+            received.append(task_name)
+
+        task_started.connect(receiver)
+        try:
+            empty_job.delay("arg1")
+        finally:
+            task_started.disconnect(receiver)
+
+        assert received == ["basket.base.tests.tasks.empty_job"]
@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+import pytest
+from freezegun import freeze_time
+
+from basket.base.exceptions import RateLimitExceeded
+from basket.base.rate_limiter import RateLimiter
+from basket.base.rq import get_redis_connection
+
+
+@pytest.fixture
+def limiter(settings):
+    settings.RATE_LIMIT_ENABLED = True
+    limiter = RateLimiter("test", limit=3, period=6)
+    get_redis_connection().delete(limiter.key)
+    yield limiter
+    get_redis_connection().delete(limiter.key)
+
+
+@freeze_time("2024-01-01 12:00:00")
+def test_burst_then_steady_rate(limiter):
+    # The full limit can be used at once...
+    assert [limiter.try_acquire() for _ in range(3)] == [0, 0, 0]
+    # ...after which calls are spaced one interval apart.
+    assert limiter.try_acquire() == pytest.approx(2)
+
+
+def test_budget_refills(limiter):
+    with freeze_time("2024-01-01 12:00:00") as frozen:
+        for _ in range(3):
+            limiter.try_acquire()
+        assert limiter.try_acquire() > 0
+        frozen.tick(2)
+        assert limiter.try_acquire() == 0
+        assert limiter.try_acquire() > 0
+
+
+def test_disabled(limiter, settings):
+    settings.RATE_LIMIT_ENABLED = False
+    assert [limiter.try_acquire() for _ in range(10)] == [0] * 10
+
+
+@freeze_time("2024-01-01 12:00:00")
+def test_acquire_waits(limiter):
+    for _ in range(3):
+        limiter.acquire()
+    with patch("basket.base.rate_limiter.sleep") as sleep, patch.object(limiter, "try_acquire", side_effect=[2, 0]):
+        limiter.acquire(max_wait=5)
+    sleep.assert_called_once_with(2)
+
+
+@freeze_time("2024-01-01 12:00:00")
+def test_acquire_raises(limiter):
+    for _ in range(3):
+        limiter.acquire()
+    with pytest.raises(RateLimitExceeded) as exc_info:
+        limiter.acquire(max_wait=1)
+    assert exc_info.value.name == "test"
+    assert exc_info.value.retry_after == pytest.approx(2)
+
+
+@freeze_time("2024-01-01 12:00:00")
+def test_observe_remaining(limiter):
+    limiter.observe(remaining=1)
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() > 0
+
+
+def test_observe_reset(limiter):
+    with freeze_time("2024-01-01 12:00:00") as frozen:
+        limiter.observe(remaining=0, reset=frozen.time_to_freeze.timestamp() + 30)
+        assert limiter.try_acquire() == pytest.approx(30)
+        frozen.tick(30)
+        assert limiter.try_acquire() == 0
+
+
+@freeze_time("2024-01-01 12:00:00")
+def test_observe_more_than_limit(limiter):
+    # A backend allowing more than our own limit doesn't raise it.
+    limiter.observe(remaining=100)
+    assert [limiter.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert limiter.try_acquire() > 0
@@ -1,22 +1,64 @@
+from datetime import timedelta
+from time import time
 from unittest.mock import patch
 from urllib.parse import urlparse
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test.utils import override_settings
 
 import pytest
+import redis
+import requests
+import requests_mock
+from freezegun import freeze_time
 from rq.job import Job, JobStatus
+from rq.queue import Queue
 from rq.serializers import JSONSerializer
+from urllib3.exceptions import MaxRetryError, ProtocolError
 
+from basket.base.exceptions import CircuitOpenError, RescheduleTask
 from basket.base.rq import (
     IGNORE_ERROR_MSGS,
+    QUEUE_BULK,
+    QUEUE_INTERACTIVE,
+    PartitionWorker,
+    WorkerRetry,
+    enqueue_batch,
+    get_partition,
+    get_partition_queue_name,
+    get_partition_worker,
     get_queue,
+    get_queue_class,
+    get_queue_name,
     get_redis_connection,
     get_worker,
+    job_timings,
+    parse_retry_after,
+    partition_lease_key,
+    record_queue_metrics,
     rq_exponential_backoff,
+    rq_on_success,
+    run_worker_pool,
     store_task_exception_handler,
+    transient_error,
+    worker_job,
 )
-from basket.base.tests.tasks import failing_job, retryable_job
+from basket.base.tests.tasks import (
+    braze_client,
+    braze_track_job,
+    circuit_open_job,
+    coalesced_job,
+    connection_error_job,
+    empty_job,
+    failing_job,
+    partitioned_job,
+    rate_limited_job,
+    retryable_job,
+    time_remaining_job,
+)
+from basket.news.backends.braze import BrazeEndpoint
 from basket.news.models import FailedTask
 from basket.news.utils import NewsletterException
 
@@ -116,16 +158,238 @@ class TestRQUtils:
         queue = get_queue()
         assert queue.name == "testqueue"
 
+    def test_get_queue_name(self):
+        """
+        Test that each queue class has its own queue, with "default" the one from settings.
+        """
+        assert get_queue_name() == "testqueue"
+        assert get_queue_name(QUEUE_INTERACTIVE) == "testqueue-interactive"
+        assert get_queue_name(QUEUE_BULK) == "testqueue-bulk"
+        assert get_queue_class("testqueue-bulk") == QUEUE_BULK
+        assert get_queue_class("other") is None
+
+    @override_settings(RQ_PARTITIONS=8)
+    def test_get_partition(self):
+        """
+        Test that a partition key always maps to the same partition.
+        """
+        partitions = [get_partition(f"uid-{n}") for n in range(100)]
+        assert partitions == [get_partition(f"uid-{n}") for n in range(100)]
+        assert set(partitions) == set(range(8))
+        assert get_partition_queue_name(3) == "testqueue-partition-3"
+
+    @override_settings(RQ_IS_ASYNC=True, RQ_PARTITIONS=8)
+    def test_partitioned_task(self):
+        """
+        Test that the jobs for a partition key go to their partition's queue.
+        """
+        partition_queue = get_queue(get_partition_queue_name(get_partition("the-uid")))
+        partition_queue.empty()
+        partitioned_job.delay("the-uid")
+        partitioned_job.delay("the-uid")
+        assert partition_queue.count == 2
+        assert self.queue.count == 0
+        partition_queue.empty()
+
+    @override_settings(RQ_IS_ASYNC=True)
+    def test_unpartitioned_task(self):
+        """
+        Test that partition keys are ignored without RQ_PARTITIONS.
+        """
+        partitioned_job.delay("the-uid")
+        assert self.queue.count == 1
+
+    @override_settings(RQ_PARTITIONS=4)
+    def test_partition_leases(self):
+        """
+        Test that only one worker at a time holds a partition's lease.
+        """
+        leases = [partition_lease_key(partition) for partition in range(4)]
+        get_redis_connection().delete(*leases)
+        worker = get_partition_worker([0, 1], owner="worker-1")
+        assert isinstance(worker, PartitionWorker)
+        assert [queue.name for queue in worker.queues] == ["testqueue-partition-0", "testqueue-partition-1"]
+
+        other = get_partition_worker([2], owner="worker-2")
+        assert not other.renew_lease(1)
+        # The same owner, e.g. a replacement worker in the pool, takes over its leases.
+        assert get_partition_worker([1], owner="worker-1").renew_lease(1)
+
+        worker.release_partitions()
+        assert other.renew_lease(1)
+        get_redis_connection().delete(*leases)
+
+    @override_settings(RQ_PARTITIONS=4)
+    def test_partition_lease_lost(self, metricsmock):
+        """
+        Test that a worker that loses a partition's lease waits for it before taking more jobs.
+        """
+        leases = [partition_lease_key(partition) for partition in range(4)]
+        get_redis_connection().delete(*leases)
+        worker = get_partition_worker([0, 1], owner="worker-1")
+        # e.g. the lease expired while the worker was stalled, and another worker took it.
+        get_redis_connection().delete(partition_lease_key(1))
+        other = get_partition_worker([1], owner="worker-2")
+
+        # Starting a job that was already checked doesn't wait.
+        with get_redis_connection().pipeline() as pipeline:
+            worker.heartbeat(pipeline=pipeline)
+        metricsmock.assert_incr_once("base.rq.partition.lost", tags=["partition:1"])
+
+        with patch("basket.base.rq.sleep", side_effect=lambda wait: other.release_partitions()) as mock_sleep:
+            worker.heartbeat()
+        mock_sleep.assert_called_once_with(5)
+        assert worker.renew_lease(1)
+        assert not other.renew_lease(1)
+        get_redis_connection().delete(*leases)
+
     def test_get_worker(self):
         """
         Test that the get_worker function returns a RQ worker with params we expect.
         """
         worker = get_worker()
-        assert worker.queues == [self.queue]
+        assert [queue.name for queue in worker.queues] == ["testqueue-interactive", "testqueue", "testqueue-bulk"]
+        assert worker.weights == {"testqueue-interactive": 6, "testqueue": 3, "testqueue-bulk": 1}
         assert worker.disable_default_exception_handler is True
         assert worker._exc_handlers == [store_task_exception_handler]
         assert worker.serializer == JSONSerializer
 
+    def test_weighted_worker_order(self):
+        """
+        Test that the worker checks higher-weighted queues first more often, but not always.
+        """
+        worker = get_worker()
+        first = {}
+        for _ in range(1000):
+            worker.reorder_queues(None)
+            name = worker._ordered_queues[0].name
+            first[name] = first.get(name, 0) + 1
+            assert sorted(queue.name for queue in worker._ordered_queues) == sorted(queue.name for queue in worker.queues)
+        assert first["testqueue-interactive"] > first["testqueue"] > first["testqueue-bulk"] > 0
+
+    @override_settings(RQ_IS_ASYNC=True)
+    def test_record_queue_metrics(self, metricsmock):
+        """
+        Test that queue depth is sent per queue class.
+        """
+        queue = get_queue(get_queue_name(QUEUE_BULK))
+        job = queue.enqueue("basket.base.tests.tasks.empty_job", args=["arg1"])
+        record_queue_metrics(job, queue)
+        metricsmock.assert_gauge("rq.queue.depth", value=1, tags=["queue_class:bulk"])
+        queue.empty()
+
+    @override_settings(RQ_IS_ASYNC=True)
+    def test_job_timings(self, metricsmock):
+        """
+        Test that each run sends its attempt number, queue wait and execution time.
+        """
+        queue = get_queue(get_queue_name(QUEUE_BULK))
+        with freeze_time("2024-01-01 12:00:00") as frozen:
+            job = queue.enqueue("basket.base.tests.tasks.empty_job", args=["arg1"])
+            frozen.tick(2)
+            with job_timings(job, "basket.base.tests.tasks.empty_job") as run:
+                run.status = "rescheduled"
+            with pytest.raises(ValueError), job_timings(job, "basket.base.tests.tasks.empty_job"):
+                raise ValueError
+
+        tags = ["task:basket.base.tests.tasks.empty_job", "queue_class:bulk"]
+        assert [record.value for record in metricsmock.filter_records("histogram", stat="task.attempt", tags=tags)] == [1, 2]
+        metricsmock.assert_timing("task.queue_wait", value=2000, tags=tags)
+        metricsmock.assert_timing("task.execution", tags=[*tags, "status:rescheduled"])
+        metricsmock.assert_timing("task.execution", tags=[*tags, "status:failure"])
+        queue.empty()
+
+    @override_settings(RQ_IS_ASYNC=True)
+    def test_export_queue_metrics(self, metricsmock):
+        """
+        Test that the depth and oldest job age of every queue are sent.
+        """
+        queue = get_queue(get_queue_name(QUEUE_INTERACTIVE))
+        with freeze_time("2024-01-01 12:00:00") as frozen:
+            queue.enqueue("basket.base.tests.tasks.empty_job", args=["arg1"])
+            frozen.tick(30)
+            queue.enqueue("basket.base.tests.tasks.empty_job", args=["arg2"])
+            call_command("export_queue_metrics")
+
+        metricsmock.assert_gauge("rq.queue.depth", value=2, tags=["queue_class:interactive"])
+        metricsmock.assert_gauge("rq.queue.oldest_job_age", value=30, tags=["queue_class:interactive"])
+        metricsmock.assert_gauge("rq.queue.oldest_job_age", value=0, tags=["queue_class:bulk"])
+        queue.empty()
+
+    @override_settings(RQ_IS_ASYNC=True)
+    def test_enqueue_batch(self, metricsmock):
+        """
+        Test that jobs enqueued in a batch reach Redis together when it ends.
+        """
+        registry = self.queue.scheduled_job_registry
+        already_scheduled = set(registry.get_job_ids())
+        with patch.object(get_redis_connection(), "pipeline", wraps=get_redis_connection().pipeline) as pipeline:
+            with enqueue_batch():
+                assert empty_job.delay("arg1") is None
+                with enqueue_batch():
+                    empty_job.delay("arg2")
+                empty_job.delay("arg3", enqueue_in=timedelta(minutes=5))
+                assert self.queue.count == 0
+            pipeline.assert_called_once()
+
+        assert [job.args for job in self.queue.get_jobs()] == [["arg1"], ["arg2"]]
+        scheduled_ids = set(registry.get_job_ids()) - already_scheduled
+        assert len(scheduled_ids) == 1
+        metricsmock.assert_histogram_once("base.rq.enqueue_batch.size", value=3)
+        registry.remove(scheduled_ids.pop(), delete_job=True)
+
+    def test_enqueue_batch_sync(self):
+        """
+        Test that jobs run straight away in a batch when jobs are synchronous.
+        """
+        with patch("basket.base.tests.tasks.time_remaining") as time_remaining:
+            with enqueue_batch():
+                time_remaining_job.delay()
+                time_remaining.assert_called_once()
+
+    @patch("basket.base.rq.caches")
+    @patch("basket.base.rq.db")
+    @patch("basket.base.rq.signal.signal")
+    @patch("basket.base.rq.os.wait", side_effect=[(101, 0), (102, 0)])
+    @patch("basket.base.rq.os.fork", side_effect=[101, 102])
+    def test_run_worker_pool_burst(self, fork, wait, signal, db, caches, metricsmock):
+        """
+        Test that a burst pool forks one worker per slot and doesn't replace them.
+        """
+        run_worker_pool(2, burst=True)
+        assert fork.call_count == 2
+        assert wait.call_count == 2
+        # Open connections are closed before forking, so workers don't share them.
+        assert db.connections.close_all.call_count == 2
+        metricsmock.assert_incr("base.rq.worker_pool.exited", tags=["exit_code:0"])
+
+    @patch("basket.base.rq.caches")
+    @patch("basket.base.rq.db")
+    @patch("basket.base.rq.signal.signal")
+    @patch("basket.base.rq.os.wait", side_effect=[(101, 0), ChildProcessError])
+    @patch("basket.base.rq.os.fork", side_effect=[101, 102, 103])
+    def test_run_worker_pool_replaces_workers(self, fork, wait, signal, db, caches):
+        """
+        Test that a worker exiting after `max_jobs` is replaced by a fresh one.
+        """
+        run_worker_pool(2, max_jobs=10)
+        assert fork.call_count == 3
+
+    @patch("basket.base.management.commands.rqworker.get_worker")
+    @patch("basket.base.management.commands.rqworker.run_worker_pool")
+    def test_rqworker_command(self, run_worker_pool, get_worker):
+        """
+        Test that the rqworker command runs a pool only for more than one worker.
+        """
+        call_command("rqworker", "--burst", "--max-jobs", "5", "--workers", "4")
+        run_worker_pool.assert_called_once_with(4, burst=True, with_scheduler=False, max_jobs=5)
+        get_worker.assert_not_called()
+
+        run_worker_pool.reset_mock()
+        call_command("rqworker", "--burst")
+        run_worker_pool.assert_not_called()
+        get_worker.return_value.work.assert_called_once_with(burst=True, with_scheduler=False, max_jobs=None)
+
     @override_settings(
         RQ_EXCEPTION_HANDLERS=["basket.base.rq.store_task_exception_handler"],
         RQ_IS_ASYNC=True,
@@ -156,7 +420,7 @@ class TestRQUtils:
         assert fail.exc == "ValueError('An exception to trigger the failure handler.')"
         assert "Traceback (most recent call last):" in fail.einfo
         assert "ValueError: An exception to trigger the failure handler." in fail.einfo
-        metricsmock.assert_timing_once("task.timings", tags=["task:basket.base.tests.tasks.failing_job", "status:failure"])
+        metricsmock.assert_timing_once("task.timings", tags=["task:basket.base.tests.tasks.failing_job", "queue:testqueue", "status:failure"])
         metricsmock.assert_incr_once("base.tasks.failed", tags=["task:basket.base.tests.tasks.failing_job"])
 
     @override_settings(
@@ -179,6 +443,300 @@ class TestRQUtils:
         assert job._status == JobStatus.SCHEDULED
         assert job.retries_left == 2
 
+    @override_settings(
+        RQ_EXCEPTION_HANDLERS=["basket.base.rq.store_task_exception_handler"],
+        RQ_IS_ASYNC=True,
+        RQ_MAX_RETRIES=3,
+    )
+    def test_circuit_open_reschedules(self, metricsmock):
+        """
+        Test that a job hitting an open circuit breaker is rescheduled without using a retry.
+        """
+        registry = self.queue.scheduled_job_registry
+        already_scheduled = set(registry.get_job_ids())
+        job = circuit_open_job.delay("arg1", arg2="foo")
+
+        worker = get_worker()
+        worker.work(burst=True)  # Burst = worker will quit after all jobs consumed.
+
+        assert FailedTask.objects.count() == 0
+
+        scheduled_ids = set(registry.get_job_ids()) - already_scheduled
+        assert len(scheduled_ids) == 1
+        rescheduled = Job.fetch(scheduled_ids.pop(), connection=self.queue.connection, serializer=JSONSerializer)
+        assert rescheduled.func_name == "basket.base.tests.tasks.circuit_open_job"
+        assert rescheduled.args == ["arg1"]
+        assert rescheduled.kwargs == {"arg2": "foo"}
+        # The meta is carried over, with the attempt that was rescheduled.
+        assert rescheduled.meta == {**job.meta, "attempt": 1}
+        assert rescheduled.retries_left == 3
+        metricsmock.assert_incr_once(
+            "base.tasks.rescheduled",
+            tags=["task:basket.base.tests.tasks.circuit_open_job", "reason:circuit_open", "backend:ctms"],
+        )
+        metricsmock.assert_not_incr("base.tasks.retried")
+        registry.remove(rescheduled, delete_job=True)
+
+    @override_settings(CIRCUIT_BREAKER_ENABLED=True, RATE_LIMIT_ENABLED=True, RQ_IS_ASYNC=True)
+    def test_braze_jobs_with_breaker_and_rate_limits(self, metricsmock):
+        """
+        Test Braze jobs with the circuit breaker and rate limits on, and their other
+        settings left at the defaults, as they run outside of tests.
+        """
+        rate_limiter = braze_client.rate_limiters[BrazeEndpoint.USERS_TRACK]
+        redis_conn = get_redis_connection()
+        redis_conn.delete(rate_limiter.key)
+        cache.clear()
+        registry = self.queue.scheduled_job_registry
+        already_scheduled = set(registry.get_job_ids())
+
+        with requests_mock.mock() as m:
+            # Braze reports that its limit is used up until a minute from now.
+            m.register_uri(
+                "POST",
+                "http://test.com/users/track",
+                headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time() + 60)},
+                json={},
+            )
+            braze_track_job.delay("1@example.com")
+            get_worker().work(burst=True)
+            assert m.call_count == 1
+            metricsmock.assert_timing_once("task.timings", tags=["task:basket.base.tests.tasks.braze_track_job", "queue:testqueue", "status:success"])
+
+            # The next job doesn't call Braze until then.
+            braze_track_job.delay("2@example.com")
+            get_worker().work(burst=True)
+            assert m.call_count == 1
+            metricsmock.assert_incr_once(
+                "base.tasks.rescheduled",
+                tags=["task:basket.base.tests.tasks.braze_track_job", "reason:rate_limited", "limit:braze:/users/track"],
+            )
+
+            # Braze fails the rest of the calls the circuit needs to open, and the next job doesn't call it.
+            redis_conn.delete(rate_limiter.key)
+            m.register_uri("POST", "http://test.com/users/track", status_code=500, json={})
+            for n in range(settings.CIRCUIT_BREAKER_MIN_CALLS):
+                braze_track_job.delay(f"{n}@example.com")
+            get_worker().work(burst=True)
+            assert m.call_count == settings.CIRCUIT_BREAKER_MIN_CALLS
+            metricsmock.assert_incr_once(
+                "base.tasks.rescheduled",
+                tags=["task:basket.base.tests.tasks.braze_track_job", "reason:circuit_open", "backend:braze"],
+            )
+
+        # The jobs turned away by the rate limit and the open circuit are waiting to run again.
+        scheduled_ids = set(registry.get_job_ids()) - already_scheduled
+        assert len(scheduled_ids) == 2
+        for job_id in scheduled_ids:
+            registry.remove(job_id, delete_job=True)
+        redis_conn.delete(rate_limiter.key)
+        cache.clear()
+
+    @override_settings(RQ_IS_ASYNC=True)
+    def test_coalesced_jobs(self, metricsmock):
+        """
+        Test that calls with the same coalescing key join the job waiting in the
+        queue, which runs once with the latest call.
+        """
+        get_redis_connection().delete("coalesce:basket.base.tests.tasks.coalesced_job:key")
+        coalesced_job.delay("key", 1)
+        coalesced_job.delay("key", 2)
+        coalesced_job.delay("key", 3)
+        coalesced_job.delay("other", 1)
+        assert self.queue.count == 2
+
+        with patch("basket.base.tests.tasks.record_call") as mock_record_call:
+            get_worker().work(burst=True)
+
+        assert sorted(call.args for call in mock_record_call.call_args_list) == [("key", 3), ("other", 1)]
+        metricsmock.assert_incr_once("base.tasks.coalesced", value=2, tags=["task:basket.base.tests.tasks.coalesced_job"])
+
+        # The job that ran released its key, so new calls are enqueued again.
+        coalesced_job.delay("key", 4)
+        assert self.queue.count == 1
+        get_redis_connection().delete("coalesce:basket.base.tests.tasks.coalesced_job:key")
+
+    @override_settings(RQ_IS_ASYNC=True)
+    def test_coalesced_jobs_in_batch(self, metricsmock):
+        """
+        Test that calls in a batch are coalesced with one pipeline, and the jobs
+        still needed are enqueued with another.
+        """
+        keys = ["coalesce:basket.base.tests.tasks.coalesced_job:key", "coalesce:basket.base.tests.tasks.coalesced_job:other"]
+        get_redis_connection().delete(*keys)
+        coalesced_job.delay("other", 1)
+        redis_conn = get_redis_connection()
+        with (
+            patch.object(redis_conn, "pipeline", wraps=redis_conn.pipeline) as pipeline,
+            patch.object(redis_conn, "eval", wraps=redis_conn.eval) as mock_eval,
+        ):
+            with enqueue_batch():
+                coalesced_job.delay("key", 1)
+                coalesced_job.delay("key", 2)
+                coalesced_job.delay("other", 2)
+                assert self.queue.count == 1
+            assert pipeline.call_count == 2
+            mock_eval.assert_not_called()
+        assert self.queue.count == 2
+        metricsmock.assert_histogram_once("base.rq.enqueue_batch.size", value=1)
+
+        with patch("basket.base.tests.tasks.record_call") as mock_record_call:
+            get_worker().work(burst=True)
+
+        assert sorted(call.args for call in mock_record_call.call_args_list) == [("key", 2), ("other", 2)]
+        get_redis_connection().delete(*keys)
+
+    @override_settings(RQ_IS_ASYNC=True)
+    def test_coalesced_job_claim_expired(self):
+        """
+        Test that calls added to a job still reach it after its claim expires,
+        and that later calls enqueue a new job.
+        """
+        get_redis_connection().delete("coalesce:basket.base.tests.tasks.coalesced_job:key")
+        coalesced_job.delay("key", 1)
+        coalesced_job.delay("key", 2)
+        get_redis_connection().delete("coalesce:basket.base.tests.tasks.coalesced_job:key")
+        coalesced_job.delay("key", 3)
+        assert self.queue.count == 2
+
+        with patch("basket.base.tests.tasks.record_call") as mock_record_call:
+            get_worker().work(burst=True)
+
+        assert [call.args for call in mock_record_call.call_args_list] == [("key", 2), ("key", 3)]
+
+    @override_settings(RQ_IS_ASYNC=True)
+    def test_coalesced_job_enqueue_error(self):
+        """
+        Test that a job that fails to be enqueued releases its claim, so the next call is enqueued.
+        """
+        get_redis_connection().delete("coalesce:basket.base.tests.tasks.coalesced_job:key")
+        with patch.object(Queue, "enqueue_call", side_effect=redis.ConnectionError), pytest.raises(redis.ConnectionError):
+            coalesced_job.delay("key", 1)
+        coalesced_job.delay("key", 2)
+        assert self.queue.count == 1
+        get_redis_connection().delete("coalesce:basket.base.tests.tasks.coalesced_job:key")
+
+    @override_settings(RQ_IS_ASYNC=True)
+    def test_coalesced_job_enqueue_batch_error(self):
+        """
+        Test that the jobs of a batch that fails to be enqueued release their claims.
+        """
+        get_redis_connection().delete("coalesce:basket.base.tests.tasks.coalesced_job:key")
+        with patch("redis.client.Pipeline.execute", side_effect=redis.ConnectionError), pytest.raises(redis.ConnectionError):
+            with enqueue_batch():
+                coalesced_job.delay("key", 1)
+                coalesced_job.delay("key", 2)
+        coalesced_job.delay("key", 3)
+        assert self.queue.count == 1
+        get_redis_connection().delete("coalesce:basket.base.tests.tasks.coalesced_job:key")
+
+    @override_settings(
+        RQ_EXCEPTION_HANDLERS=["basket.base.rq.store_task_exception_handler"],
+        RQ_IS_ASYNC=True,
+        RQ_MAX_RETRIES=3,
+    )
+    def test_rate_limited_reschedules(self, metricsmock):
+        """
+        Test that a job hitting a shared rate limit is rescheduled without using a retry.
+        """
+        registry = self.queue.scheduled_job_registry
+        already_scheduled = set(registry.get_job_ids())
+        rate_limited_job.delay("arg1")
+
+        worker = get_worker()
+        worker.work(burst=True)  # Burst = worker will quit after all jobs consumed.
+
+        assert FailedTask.objects.count() == 0
+
+        scheduled_ids = set(registry.get_job_ids()) - already_scheduled
+        assert len(scheduled_ids) == 1
+        rescheduled = Job.fetch(scheduled_ids.pop(), connection=self.queue.connection, serializer=JSONSerializer)
+        assert rescheduled.func_name == "basket.base.tests.tasks.rate_limited_job"
+        assert rescheduled.retries_left == 3
+        metricsmock.assert_incr_once(
+            "base.tasks.rescheduled",
+            tags=["task:basket.base.tests.tasks.rate_limited_job", "reason:rate_limited", "limit:braze:/users/track"],
+        )
+        registry.remove(rescheduled, delete_job=True)
+
+    @override_settings(
+        RQ_EXCEPTION_HANDLERS=["basket.base.rq.store_task_exception_handler"],
+        RQ_IS_ASYNC=True,
+        RQ_MAX_RETRIES=3,
+    )
+    def test_transient_error_reschedules(self, metricsmock):
+        """
+        Test that a job hitting a transient backend error is rescheduled, using up a retry.
+        """
+        registry = self.queue.scheduled_job_registry
+        already_scheduled = set(registry.get_job_ids())
+        job = connection_error_job.delay("arg1")
+
+        worker = get_worker()
+        worker.work(burst=True)  # Burst = worker will quit after all jobs consumed.
+
+        scheduled_ids = set(registry.get_job_ids()) - already_scheduled
+        assert len(scheduled_ids) == 1
+        rescheduled = Job.fetch(scheduled_ids.pop(), connection=self.queue.connection, serializer=JSONSerializer)
+        assert rescheduled.func_name == "basket.base.tests.tasks.connection_error_job"
+        assert rescheduled.meta == {**job.meta, "attempt": 1}
+        assert rescheduled.retries_left == 2
+        assert rescheduled.retry_intervals == job.retry_intervals
+        metricsmock.assert_incr_once("base.tasks.rescheduled", tags=["task:basket.base.tests.tasks.connection_error_job", "reason:transient"])
+        metricsmock.assert_not_incr("base.tasks.retried")
+        registry.remove(rescheduled, delete_job=True)
+
+    @override_settings(RQ_IS_ASYNC=True, RQ_MAX_RETRIES=3)
+    def test_rescheduled_run_no_success_timing(self, metricsmock):
+        """
+        Test that a rescheduled run doesn't send the end-to-end time as a success,
+        and that its next run does.
+        """
+        registry = self.queue.scheduled_job_registry
+        already_scheduled = set(registry.get_job_ids())
+        connection_error_job.delay("arg1")
+
+        get_worker().work(burst=True)
+
+        metricsmock.assert_timing(
+            "task.execution", tags=["task:basket.base.tests.tasks.connection_error_job", "queue_class:default", "status:rescheduled"]
+        )
+        metricsmock.assert_not_timing("task.timings")
+
+        scheduled_ids = set(registry.get_job_ids()) - already_scheduled
+        rescheduled = Job.fetch(scheduled_ids.pop(), connection=self.queue.connection, serializer=JSONSerializer)
+        assert "rescheduled" not in rescheduled.meta
+        rq_on_success(rescheduled, self.queue.connection, None)
+        metricsmock.assert_timing_once(
+            "task.timings", tags=["task:basket.base.tests.tasks.connection_error_job", "queue:testqueue", "status:success"]
+        )
+        registry.remove(rescheduled, delete_job=True)
+
+    @override_settings(
+        RQ_EXCEPTION_HANDLERS=["basket.base.rq.store_task_exception_handler"],
+        RQ_IS_ASYNC=True,
+        RQ_MAX_RETRIES=0,
+    )
+    def test_transient_error_no_retries_left(self, metricsmock):
+        """
+        Test that a job hitting a transient backend error fails once it has no retries left.
+        """
+        connection_error_job.delay("arg1")
+
+        worker = get_worker()
+        worker.work(burst=True)  # Burst = worker will quit after all jobs consumed.
+
+        assert FailedTask.objects.count() == 1
+        metricsmock.assert_not_incr("base.tasks.rescheduled")
+        metricsmock.assert_incr_once("base.tasks.failed", tags=["task:basket.base.tests.tasks.connection_error_job"])
+
+    def test_circuit_open_without_job(self):
+        """
+        Test that the error is raised when the task is called outside of a worker.
+        """
+        with pytest.raises(CircuitOpenError):
+            circuit_open_job("arg1")
+
     @override_settings(MAINTENANCE_MODE=True)
     def test_on_failure_maintenance(self, metricsmock):
         """
@@ -294,3 +852,64 @@ class TestRQUtils:
         metricsmock.assert_incr_once("base.tasks.retried", tags=["task:job.rescheduled"])
         assert mock_sentry_sdk.capture_exception.call_count == 1
         mock_sentry_sdk.isolation_scope.return_value.__enter__.return_value.set_tag.assert_called_once_with("action", "retried")
+
+
+def http_error(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return requests.HTTPError(response=response)
+
+
+class TestTransientErrors:
+    def test_rate_limited(self):
+        assert transient_error(http_error(429, {"Retry-After": "30"})) == (True, 30)
+        assert transient_error(http_error(429)) == (True, None)
+
+    def test_server_error(self):
+        assert transient_error(http_error(503)) == (True, None)
+
+    def test_client_error(self):
+        assert transient_error(http_error(400)) == (False, None)
+
+    def test_connection_error(self):
+        assert transient_error(requests.ConnectionError()) == (True, None)
+        assert transient_error(requests.Timeout()) == (True, None)
+
+    def test_reschedule_task(self):
+        assert transient_error(RescheduleTask(60)) == (True, 60)
+        assert transient_error(RescheduleTask()) == (True, None)
+
+    def test_raised_from(self):
+        class BackendError(Exception):
+            pass
+
+        try:
+            try:
+                raise http_error(500)
+            except requests.HTTPError as exc:
+                raise BackendError() from exc
+        except BackendError as exc:
+            assert transient_error(exc) == (True, None)
+
+    def test_other_error(self):
+        assert transient_error(ValueError()) == (False, None)
+
+    @freeze_time("2024-01-01 12:00:00")
+    def test_parse_retry_after(self):
+        assert parse_retry_after("120") == 120
+        assert parse_retry_after("Mon, 01 Jan 2024 12:01:00 GMT") == 60
+        assert parse_retry_after("Mon, 01 Jan 2024 11:00:00 GMT") == 0
+        assert parse_retry_after(str(10**9)) == settings.RQ_MAX_RETRY_DELAY
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after(None) is None
+
+
+class TestWorkerRetry:
+    def test_retries_outside_worker_job(self):
+        retry = WorkerRetry(total=3).increment(method="GET", url="/", error=ProtocolError())
+        assert retry.total == 2
+
+    def test_no_retries_in_worker_job(self):
+        with worker_job(True), pytest.raises(MaxRetryError):
+            WorkerRetry(total=3).increment(method="GET", url="/", error=ProtocolError())
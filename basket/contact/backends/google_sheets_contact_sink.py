@@ -6,6 +6,8 @@ from django.conf import settings
 from google.auth.transport.requests import AuthorizedSession
 from google.oauth2.service_account import Credentials
 
+from basket.base.deadline import DeadlineHTTPAdapter
+
 from .contact_sink import ContactSink
 
 logger = logging.getLogger(__name__)
@@ -21,6 +23,7 @@ class GoogleSheetsContactSink(ContactSink):
             scopes=_SCOPES,
         )
         session = AuthorizedSession(credentials)
+        session.mount("https://", DeadlineHTTPAdapter())
 
         row = [
             contact["first_name"],
@@ -11,6 +11,7 @@ from ninja.decorators import decorate_view
 from ninja.errors import Throttled, ValidationError
 
 from basket import errors, metrics
+from basket.base.rq import enqueue_batch
 from basket.base.throttling import TokenThrottle, WebhookGlobalThrottle, WebhookIdentifierThrottle
 from basket.base.utils import is_valid_uuid
 from basket.news import tasks
@@ -85,15 +86,16 @@ def confirm_user(request, token: uuid.UUID):
         return _maintenance_error()
 
     if settings.BRAZE_PARALLEL_WRITE_ENABLE:
-        tasks.confirm_user.delay(
-            str(token),
-            use_braze_backend=True,
-            extra_metrics_tags=["backend:braze"],
-        )
-        tasks.confirm_user.delay(
-            str(token),
-            use_braze_backend=False,
-        )
+        with enqueue_batch():
+            tasks.confirm_user.delay(
+                str(token),
+                use_braze_backend=True,
+                extra_metrics_tags=["backend:braze"],
+            )
+            tasks.confirm_user.delay(
+                str(token),
+                use_braze_backend=False,
+            )
     elif settings.BRAZE_ONLY_WRITE_ENABLE:
         tasks.confirm_user.delay(
             str(token),
@@ -1,20 +1,32 @@
 import json
 import logging
+import socket
 import warnings
 from datetime import timedelta
 from enum import Enum
+from functools import cached_property
 from urllib.parse import urljoin, urlparse, urlunparse
 
 from django.conf import settings
 from django.utils import timezone
 
 import requests
-from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
+import sentry_sdk
+from rq import get_current_job
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, stop_any, wait_fixed
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
 from basket import metrics
+from basket.base.circuit_breaker import CircuitBreaker
+from basket.base.deadline import DeadlineHTTPAdapter, stop_before_deadline, time_remaining
 from basket.base.decorators import rq_task
+from basket.base.rate_limiter import RateLimiter
+from basket.base.rq import QUEUE_BULK, QUEUE_INTERACTIVE, get_redis_connection, in_worker_job
 from basket.base.utils import is_valid_uuid
+from basket.news.backends.contact_cache import ContactCache
 from basket.news.backends.ctms import ctms, process_country, process_lang
+from basket.news.models import FailedTask
 from basket.news.newsletters import newsletter_obj, slug_to_vendor_id, vendor_id_to_slug
 
 log = logging.getLogger(__name__)
@@ -27,21 +39,36 @@ BRAZE_OPTIMAL_DELAY = timedelta(minutes=5)
 
 # These tasks cannot be placed in basket/news/tasks.py because it would
 # create a circular dependency.
-@rq_task
+@rq_task(queue_class=QUEUE_BULK)
 def add_fxa_id_alias_task(external_id, fxa_id):
     braze.interface.add_fxa_id_alias(external_id, fxa_id)
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_BULK)
 def add_basket_token_alias_task(external_id, basket_token):
     braze.interface.add_basket_token_alias(external_id, basket_token)
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_BULK)
 def assign_basket_token_alias_task(external_id):
     braze.interface.add_basket_token_alias(external_id, external_id)
 
 
+@rq_task(queue_class=QUEUE_BULK)
+def flush_track_buffer_task(name):
+    track_buffers[name].flush()
+
+
+@rq_task(queue_class=QUEUE_INTERACTIVE)
+def flush_tx_track_buffer_task(name):
+    track_buffers[name].flush()
+
+
+@rq_task(queue_class=QUEUE_BULK)
+def flush_alias_bucket_task(name, bucket):
+    alias_queues[name].flush(bucket)
+
+
 # Braze errors: https://www.braze.com/docs/api/errors/
 class BrazeBadRequestError(Exception):
     pass  # 400 error (invalid request)
@@ -93,8 +120,282 @@ class BrazeEndpoint(Enum):
     USERS_IDENTIFY = "/users/identify"
 
 
+class MeteredConnectionPoolMixin:
+    """Count whether each checked-out connection is a new one or a reused keep-alive one."""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        # Pooled connections that are still alive keep their socket; new connections,
+        # and ones that were dropped by the server, have to connect first.
+        status = "reused" if getattr(conn, "sock", None) is not None else "created"
+        metrics.incr("news.backends.braze.connection", tags=[f"status:{status}"])
+        return conn
+
+
+class MeteredHTTPConnectionPool(MeteredConnectionPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class MeteredHTTPSConnectionPool(MeteredConnectionPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class BrazeHTTPAdapter(DeadlineHTTPAdapter):
+    """HTTPAdapter with TCP keep-alive, connection reuse metrics and deadline timeouts."""
+
+    def __init__(self, keepalive_idle=None, **kwargs):
+        self.keepalive_idle = keepalive_idle
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        socket_options = [*HTTPConnection.default_socket_options, (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        if self.keepalive_idle and hasattr(socket, "TCP_KEEPIDLE"):
+            socket_options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle))
+        kwargs["socket_options"] = socket_options
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": MeteredHTTPConnectionPool,
+            "https": MeteredHTTPSConnectionPool,
+        }
+
+
+class BrazeTrackBuffer:
+    """
+    Buffer of /users/track payloads written by worker jobs, sent to Braze in batches.
+
+    Payloads are kept in a Redis list along with the job that wrote them. A
+    flush job is queued when the list fills a batch, or BRAZE_TRACK_FLUSH_INTERVAL
+    seconds after the first payload. One flush job at a time sends the oldest
+    payloads in batches of up to BRAZE_TRACK_BATCH_SIZE objects per array, and
+    removes them from the list once Braze has accepted them. Objects that Braze
+    rejects are stored as a FailedTask of the job that wrote them, and reported
+    like a failed job. The buffer of a transactional interface is flushed from
+    the interactive queue, so its sends don't wait behind bulk jobs.
+    """
+
+    # Braze accepts at most 75 attributes, events and purchases per request.
+    MAX_BATCH_SIZE = 75
+    # Seconds a flush job holds the lock; a crashed flush job lets another take over after this.
+    LOCK_TIMEOUT = 300
+
+    def __init__(self, interface):
+        self.interface = interface
+        self.key = f"braze:track:{interface.name}"
+        self.lock_key = f"{self.key}:lock"
+        self.timer_key = f"{self.key}:timer"
+        self.flush_task = flush_tx_track_buffer_task if interface.transactional else flush_track_buffer_task
+
+    @property
+    def batch_size(self):
+        return min(settings.BRAZE_TRACK_BATCH_SIZE, self.MAX_BATCH_SIZE)
+
+    @property
+    def enabled(self):
+        return settings.BRAZE_TRACK_BATCHING and self.interface.active and in_worker_job()
+
+    def add(self, data):
+        """Buffer a /users/track payload written by the current job."""
+        job = get_current_job()
+        item = {
+            "data": data,
+            "job_id": job.id,
+            "task_name": job.meta.get("task_name"),
+            "args": job.args,
+            "kwargs": job.kwargs,
+        }
+        redis = get_redis_connection()
+        length = redis.rpush(self.key, json.dumps(item))
+        metrics.incr("news.backends.braze.track_buffer", tags=[f"buffer:{self.interface.name}", "action:added"])
+        if length % self.batch_size == 0:
+            self.flush_task.delay(self.interface.name)
+        elif redis.set(self.timer_key, 1, nx=True, ex=settings.BRAZE_TRACK_FLUSH_INTERVAL * 10):
+            self.flush_task.delay(self.interface.name, enqueue_in=timedelta(seconds=settings.BRAZE_TRACK_FLUSH_INTERVAL))
+
+    def _take_batch(self, items):
+        """Return how many of the oldest items fit in one request."""
+        counts = {}
+        for taken, item in enumerate(items):
+            for array, objects in item["data"].items():
+                counts[array] = counts.get(array, 0) + len(objects)
+                if taken and counts[array] > self.batch_size:
+                    return taken
+        return len(items)
+
+    def _store_failure(self, item, error):
+        metrics.incr("news.backends.braze.track_buffer", tags=[f"buffer:{self.interface.name}", "action:failed"])
+        FailedTask.objects.create(
+            task_id=item["job_id"],
+            name=item["task_name"],
+            args=item["args"],
+            kwargs=item["kwargs"],
+            exc=repr(error),
+            einfo="",
+        )
+        # The job that wrote the item has already succeeded, so report the failure for it.
+        metrics.incr("base.tasks.failed", tags=[f"task:{item['task_name']}"])
+        with sentry_sdk.isolation_scope() as scope:
+            scope.set_tag("action", "failed")
+            scope.set_tag("task", item["task_name"])
+            sentry_sdk.capture_exception(error)
+
+    def _send(self, items):
+        """Send items in one request, and store the ones Braze rejects as failed tasks."""
+        data = {}
+        owners = {}
+        for index, item in enumerate(items):
+            for array, objects in item["data"].items():
+                data.setdefault(array, []).extend(objects)
+                owners.setdefault(array, []).extend([index] * len(objects))
+
+        try:
+            response = self.interface._request(BrazeEndpoint.USERS_TRACK, data)
+        except BrazeBadRequestError as exc:
+            # The whole request was rejected, so send the items one by one to find the bad ones.
+            if len(items) == 1:
+                self._store_failure(items[0], exc)
+            else:
+                for item in items:
+                    self._send([item])
+            return
+
+        failed = set()
+        for error in (response or {}).get("errors", []):
+            try:
+                index = owners[error["input_array"]][error["index"]]
+            except (KeyError, IndexError, TypeError):
+                log.warning("Unable to match Braze error to a buffered item: %s", error)
+                continue
+            if index not in failed:
+                failed.add(index)
+                self._store_failure(items[index], BrazeBadRequestError(json.dumps(error)))
+        metrics.incr("news.backends.braze.track_buffer", tags=[f"buffer:{self.interface.name}", "action:sent"], value=len(items))
+
+    def flush(self):
+        """Send everything in the buffer to Braze."""
+        redis = get_redis_connection()
+        if not redis.set(self.lock_key, 1, nx=True, ex=self.LOCK_TIMEOUT):
+            # Another flush job is running; check again once it's likely done.
+            self.flush_task.delay(self.interface.name, enqueue_in=timedelta(seconds=settings.BRAZE_TRACK_FLUSH_INTERVAL))
+            return
+
+        try:
+            # Payloads added from here on queue a new flush job.
+            redis.delete(self.timer_key)
+            while raw_items := redis.lrange(self.key, 0, self.batch_size - 1):
+                items = [json.loads(raw_item) for raw_item in raw_items]
+                items = items[: self._take_batch(items)]
+                self._send(items)
+                redis.ltrim(self.key, len(items), -1)
+                self._invalidate_contacts(items)
+        finally:
+            redis.delete(self.lock_key)
+
+    def _invalidate_contacts(self, items):
+        """Forget contacts that may have been cached between buffering a write and sending it."""
+        contacts = []
+        for item in items:
+            for attributes in item["data"].get("attributes", []):
+                contacts.append({"email_id": attributes.get("external_id"), "email": attributes.get("email")})
+        braze.contact_cache.invalidate(*contacts)
+
+
+class BrazeAliasQueue:
+    """
+    Alias operations waiting BRAZE_OPTIMAL_DELAY to be sent to Braze, grouped by due minute.
+
+    Each operation is added to the Redis list of the first minute at least
+    BRAZE_OPTIMAL_DELAY from now, and the first operation in a minute schedules
+    one flush job for it. The flush job sends the list in batches of up to 50
+    aliases. Aliases that Braze rejects are stored as a FailedTask of the alias
+    task that would have added them on its own.
+    """
+
+    # Braze accepts at most 50 aliases per request.
+    BATCH_SIZE = 50
+    # Tasks that add a single alias, by alias label.
+    ALIAS_TASKS = {
+        "fxa_id": "basket.news.backends.braze.add_fxa_id_alias_task",
+        "basket_token": "basket.news.backends.braze.add_basket_token_alias_task",
+    }
+
+    def __init__(self, interface):
+        self.interface = interface
+        self.key_prefix = f"braze:aliases:{interface.name}"
+
+    @property
+    def enabled(self):
+        return settings.BRAZE_ALIAS_BATCHING and self.interface.active
+
+    def bucket_key(self, bucket):
+        return f"{self.key_prefix}:{bucket}"
+
+    def add(self, external_id, alias_name, alias_label):
+        """Queue an alias to be added to the user with `external_id` after BRAZE_OPTIMAL_DELAY."""
+        now = int(timezone.now().timestamp())
+        due = now + int(BRAZE_OPTIMAL_DELAY.total_seconds())
+        # Round up, so every alias waits at least BRAZE_OPTIMAL_DELAY.
+        bucket = -(-due // 60) * 60
+        key = self.bucket_key(bucket)
+        # Keep unsent aliases around for a day in case the flush job is lost.
+        expires = bucket - now + 86400
+
+        redis = get_redis_connection()
+        with redis.pipeline() as pipe:
+            pipe.rpush(key, json.dumps({"external_id": external_id, "alias_name": alias_name, "alias_label": alias_label}))
+            pipe.expire(key, expires)
+            pipe.set(f"{key}:scheduled", 1, nx=True, ex=expires)
+            _, _, schedule = pipe.execute()
+        metrics.incr("news.backends.braze.alias_queue", tags=[f"queue:{self.interface.name}", "action:added"])
+        if schedule:
+            flush_alias_bucket_task.delay(self.interface.name, bucket, enqueue_in=timedelta(seconds=bucket - now))
+
+    def _store_failure(self, operation, error):
+        metrics.incr("news.backends.braze.alias_queue", tags=[f"queue:{self.interface.name}", "action:failed"])
+        FailedTask.objects.create(
+            task_id=f"{self.key_prefix}:{operation['external_id']}:{operation['alias_label']}",
+            name=self.ALIAS_TASKS.get(operation["alias_label"], "basket.news.backends.braze.add_basket_token_alias_task"),
+            args=[operation["external_id"], operation["alias_name"]],
+            exc=repr(error),
+            einfo="",
+        )
+
+    def _send(self, operations):
+        """Send operations in one request, and store the ones Braze rejects as failed tasks."""
+        try:
+            response = self.interface.add_aliases(operations)
+        except BrazeBadRequestError as exc:
+            # The whole request was rejected, so send the aliases one by one to find the bad ones.
+            if len(operations) == 1:
+                self._store_failure(operations[0], exc)
+            else:
+                for operation in operations:
+                    self._send([operation])
+            return
+
+        failed = set()
+        for error in (response or {}).get("errors", []):
+            index = error.get("index") if isinstance(error, dict) else None
+            if not isinstance(index, int) or not 0 <= index < len(operations):
+                log.warning("Unable to match Braze error to a queued alias: %s", error)
+                continue
+            if index not in failed:
+                failed.add(index)
+                self._store_failure(operations[index], BrazeBadRequestError(json.dumps(error)))
+        metrics.incr("news.backends.braze.alias_queue", tags=[f"queue:{self.interface.name}", "action:sent"], value=len(operations))
+
+    def flush(self, bucket):
+        """Send every alias due in `bucket` to Braze."""
+        key = self.bucket_key(bucket)
+        redis = get_redis_connection()
+        # Aliases stay in the list until Braze has answered, so a rescheduled flush job picks them up.
+        while raw_operations := redis.lrange(key, 0, self.BATCH_SIZE - 1):
+            self._send([json.loads(raw_operation) for raw_operation in raw_operations])
+            redis.ltrim(key, len(raw_operations), -1)
+        redis.delete(key, f"{key}:scheduled")
+
+
 class BrazeInterface:
-    def __init__(self, base_url, api_key):
+    def __init__(self, base_url, api_key, name="braze", transactional=False):
         urlbits = urlparse(base_url)
         if not urlbits.scheme or not urlbits.netloc:
             raise ValueError("Invalid base_url")
@@ -105,6 +406,56 @@ class BrazeInterface:
             warnings.warn("Braze API key is not configured", stacklevel=2)
 
         self.active = bool(self.api_key)
+        self.name = name
+        self.transactional = transactional
+        self.track_buffer = BrazeTrackBuffer(self)
+        self.alias_queue = BrazeAliasQueue(self)
+        self.circuit_breaker = CircuitBreaker(
+            "braze",
+            failures=(BrazeInternalServerError, requests.ConnectionError, requests.Timeout),
+        )
+        # Braze rate limits are per workspace, so both interfaces share them.
+        self.rate_limiters = {
+            endpoint: RateLimiter(f"braze:{endpoint.value}", *settings.BRAZE_RATE_LIMITS[endpoint.value])
+            for endpoint in BrazeEndpoint
+            if endpoint.value in settings.BRAZE_RATE_LIMITS
+        }
+
+    @cached_property
+    def session(self):
+        """Get a long-lived session so connections to Braze are pooled and kept alive"""
+        session = requests.Session()
+        adapter = BrazeHTTPAdapter(
+            keepalive_idle=settings.BRAZE_HTTP_KEEPALIVE_IDLE,
+            pool_connections=1,
+            pool_maxsize=settings.BRAZE_HTTP_POOL_MAXSIZE,
+        )
+        session.mount(self.api_url, adapter)
+        return session
+
+    def _rate_limit(self, endpoint, max_wait):
+        """Wait for the endpoint's shared rate limit, for up to `max_wait` seconds and no longer than the deadline."""
+        rate_limiter = self.rate_limiters.get(endpoint)
+        if rate_limiter is None:
+            return
+        if max_wait is None:
+            max_wait = settings.RATE_LIMIT_MAX_WAIT
+        remaining = time_remaining()
+        if remaining is not None:
+            max_wait = min(max_wait, remaining)
+        rate_limiter.acquire(max_wait)
+
+    def _observe_rate_limit(self, endpoint, response):
+        """Lower the endpoint's shared rate limit to what Braze reports in the response headers."""
+        rate_limiter = self.rate_limiters.get(endpoint)
+        if rate_limiter is None:
+            return
+        try:
+            remaining = int(response.headers["X-RateLimit-Remaining"])
+            reset = float(response.headers["X-RateLimit-Reset"]) if "X-RateLimit-Reset" in response.headers else None
+        except (KeyError, ValueError):
+            return
+        rate_limiter.observe(remaining, reset)
 
     @retry(
         reraise=True,
@@ -115,15 +466,17 @@ class BrazeInterface:
                 requests.ConnectionError,
             )
         ),
-        stop=stop_after_attempt(3),
+        # Worker jobs are rescheduled by `rq_task` instead of sleeping here.
+        stop=stop_any(stop_after_attempt(3), lambda retry_state: in_worker_job(), stop_before_deadline(2)),
         wait=wait_fixed(2),
     )
-    def _request(self, endpoint, data=None, method="POST", params=None):
+    def _request(self, endpoint, data=None, method="POST", params=None, max_wait=None):
         """
         Make a request to the Braze API.
 
         @param endpoint: The Braze endpoint to call, from the BrazeEndpoint enum.
         @param data: The data to send to the endpoint, as a dict.
+        @param max_wait: Seconds to wait for the endpoint's rate limit, or None for RATE_LIMIT_MAX_WAIT.
         @return: The response from the Braze API, as a dict.
         @raises: BrazeBadRequestError: 400 error (invalid request)
         @raises: BrazeUnauthorizedError: 401 error (invalid API key)
@@ -132,11 +485,15 @@ class BrazeInterface:
         @raises: BrazeRateLimitError: 429 error (rate limit exceeded)
         @raises: BrazeInternalServerError: 500 error (Braze server error)
         @raises: BrazeClientError: any other error
+        @raises: CircuitOpenError: Braze has been failing and isn't called
+        @raises: RateLimitExceeded: the endpoint's rate limit would be exceeded
 
         """
         if not self.active:
             return
 
+        self._rate_limit(endpoint, max_wait)
+
         url = urljoin(self.api_url, endpoint.value)
 
         headers = {
@@ -144,41 +501,43 @@ class BrazeInterface:
             "Content-Type": "application/json",
         }
 
-        try:
-            if settings.DEBUG:
-                print(f"{method} {url}")  # noqa: T201
-                print(f"Headers: {headers}")  # noqa: T201
-                print(f"Params: {params}")  # noqa: T201
-                print(json.dumps(data, indent=2))  # noqa: T201
-            if method == "GET":
-                response = requests.get(url, headers=headers, params=params, data=json.dumps(data))
-            else:
-                response = requests.post(url, headers=headers, data=json.dumps(data))
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.HTTPError as exc:
-            status_code = exc.response.status_code
-            message = exc.response.text
-
-            if status_code == 400:
-                raise BrazeBadRequestError(message) from exc
-
-            if status_code == 401:
-                raise BrazeUnauthorizedError(message) from exc
-
-            if status_code == 403:
-                raise BrazeForbiddenError(message) from exc
-
-            if status_code == 404:
-                raise BrazeNotFoundError(message) from exc
-
-            if status_code == 429:
-                raise BrazeRateLimitError(message) from exc
-
-            if status_code >= 500 and status_code <= 599:
-                raise BrazeInternalServerError(message) from exc
-
-            raise BrazeClientError(message) from exc
+        with self.circuit_breaker.guard():
+            try:
+                if settings.DEBUG:
+                    print(f"{method} {url}")  # noqa: T201
+                    print(f"Headers: {headers}")  # noqa: T201
+                    print(f"Params: {params}")  # noqa: T201
+                    print(json.dumps(data, indent=2))  # noqa: T201
+                if method == "GET":
+                    response = self.session.get(url, headers=headers, params=params, data=json.dumps(data))
+                else:
+                    response = self.session.post(url, headers=headers, data=json.dumps(data))
+                self._observe_rate_limit(endpoint, response)
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.HTTPError as exc:
+                status_code = exc.response.status_code
+                message = exc.response.text
+
+                if status_code == 400:
+                    raise BrazeBadRequestError(message) from exc
+
+                if status_code == 401:
+                    raise BrazeUnauthorizedError(message) from exc
+
+                if status_code == 403:
+                    raise BrazeForbiddenError(message) from exc
+
+                if status_code == 404:
+                    raise BrazeNotFoundError(message) from exc
+
+                if status_code == 429:
+                    raise BrazeRateLimitError(message) from exc
+
+                if status_code >= 500 and status_code <= 599:
+                    raise BrazeInternalServerError(message) from exc
+
+                raise BrazeClientError(message) from exc
 
     def track_user(self, email, event=None, user_data=None):
         """
@@ -227,6 +586,8 @@ class BrazeInterface:
                 events["user_alias"] = {"alias_name": email, "alias_label": "email"}
             data["events"] = [events]
 
+        if self.track_buffer.enabled:
+            return self.track_buffer.add(data)
         return self._request(BrazeEndpoint.USERS_TRACK, data)
 
     def export_users(self, email, fields_to_export=None, external_id=None, fxa_id=None):
@@ -309,6 +670,8 @@ class BrazeInterface:
         Creates a new user or updates attributes for an existing user in Braze.
         https://www.braze.com/docs/api/endpoints/user_data/post_user_track/
         """
+        if self.track_buffer.enabled:
+            return self.track_buffer.add(braze_user_data)
         return self._request(BrazeEndpoint.USERS_TRACK, braze_user_data)
 
     def add_fxa_id_alias(self, external_id, fxa_id):
@@ -327,9 +690,10 @@ class BrazeInterface:
         data = {"user_aliases": [{"alias_name": basket_token, "alias_label": "basket_token", "external_id": external_id}]}
         return self._request(BrazeEndpoint.USERS_ADD_ALIAS, data)
 
-    def add_aliases(self, alias_operations):
+    def add_aliases(self, alias_operations, max_wait=None):
         """
         @param alias_operations: List of user alias objects (schema below)
+        @param max_wait: Seconds to wait for the rate limit, or None for RATE_LIMIT_MAX_WAIT
 
         {
             "external_id" : (optional, string),
@@ -341,7 +705,7 @@ class BrazeInterface:
         https://www.braze.com/docs/api/endpoints/user_data/post_user_alias
         """
         data = {"user_aliases": alias_operations}
-        return self._request(BrazeEndpoint.USERS_ADD_ALIAS, data)
+        return self._request(BrazeEndpoint.USERS_ADD_ALIAS, data, max_wait=max_wait)
 
     def identify_user(self, aliases_to_identify=None, emails_to_identify=None):
         """
@@ -368,12 +732,14 @@ class Braze:
 
     def __init__(self, interface):
         self.interface = interface
+        self.contact_cache = ContactCache("braze")
 
     def get(
         self,
         token=None,
         email=None,
         fxa_id=None,
+        use_cache=True,
     ):
         """
         Get a user using the first ID provided.
@@ -382,8 +748,16 @@ class Braze:
         @param token: basket_token
         @param email: email address
         @param fxa_id: external ID from FxA
+        @param use_cache: read and populate the contact cache, if enabled
         @return: dict, or None if not found
         """
+        cache_key = None
+        if use_cache:
+            cache_key = self.contact_cache.lookup_key(token=token, email=email, fxa_id=fxa_id)
+            if cache_key and (cached := self.contact_cache.get(cache_key)):
+                return cached
+        if cache_key:
+            generation = self.contact_cache.generation(cache_key)
 
         user_response = self.interface.export_users(
             email,
@@ -425,7 +799,10 @@ class Braze:
                 subscription_response = self.interface.get_user_subscriptions(user_data["external_id"], email)
                 subscriptions = subscription_response.get("users", [{}])[0].get("subscription_groups", [])
 
-            return self.from_vendor(user_data, subscriptions)
+            basket_user_data = self.from_vendor(user_data, subscriptions)
+            if cache_key:
+                self.contact_cache.set(basket_user_data, cache_key, generation)
+            return basket_user_data
 
         # If we only have an outdated token or the Braze fxa_id migrations haven't been
         # completed we won't be able to look up the user. We add a temporary shim here which
@@ -438,7 +815,7 @@ class Braze:
                 if ctms_response:
                     ctms_email = ctms_response.get("email")
                     if ctms_email:
-                        result = self.get(email=ctms_email)
+                        result = self.get(email=ctms_email, use_cache=use_cache)
                         if result:
                             metrics.incr("news.backends.braze.get", tags=[f"status:not_found_ctms_resolved_braze_found_by_{lookup_type}"])
                         else:
@@ -459,23 +836,18 @@ class Braze:
         """
         braze_user_data = self.to_vendor(None, data)
         external_id = braze_user_data["attributes"][0]["external_id"]
-        self.interface.save_user(braze_user_data)
+        try:
+            self.interface.save_user(braze_user_data)
+        finally:
+            self.contact_cache.invalidate(data)
 
         if data.get("fxa_id"):
-            add_fxa_id_alias_task.delay(
-                external_id,
-                data["fxa_id"],
-                enqueue_in=BRAZE_OPTIMAL_DELAY,
-            )
+            self.add_alias_later(external_id, data["fxa_id"], "fxa_id")
 
         # Add basket_token (which is email_id/external_id) as alias
         # to all new users so they are consistent with existing users which
         # have been processed by `process_braze_aliases_migrator.py`.
-        add_basket_token_alias_task.delay(
-            external_id,
-            external_id,
-            enqueue_in=BRAZE_OPTIMAL_DELAY,
-        )
+        self.add_alias_later(external_id, external_id, "basket_token")
 
         return {"email": {"email_id": external_id}}
 
@@ -488,14 +860,36 @@ class Braze:
         """
         braze_user_data = self.to_vendor(existing_data, update_data)
         external_id = braze_user_data["attributes"][0]["external_id"]
-        self.interface.save_user(braze_user_data)
+        # With the contact cache, existing_data may be stale, so only trust it without.
+        if settings.SUPPRESS_NOOP_WRITES and not self.contact_cache.enabled:
+            trimmed_data = self.trim_unchanged(existing_data, braze_user_data)
+            if trimmed_data is None:
+                metrics.incr("news.backends.braze.writes_suppressed", tags=["result:skipped"])
+            elif trimmed_data != braze_user_data:
+                metrics.incr("news.backends.braze.writes_suppressed", tags=["result:trimmed"])
+            braze_user_data = trimmed_data
+
+        if braze_user_data:
+            try:
+                self.interface.save_user(braze_user_data)
+            finally:
+                self.contact_cache.invalidate(existing_data, update_data)
 
         if update_data.get("fxa_id") and existing_data.get("fxa_id") != update_data["fxa_id"]:
-            add_fxa_id_alias_task.delay(
-                external_id,
-                update_data["fxa_id"],
-                enqueue_in=BRAZE_OPTIMAL_DELAY,
-            )
+            self.add_alias_later(external_id, update_data["fxa_id"], "fxa_id")
+
+    def add_alias_later(self, external_id, alias_name, alias_label):
+        """
+        Add a user alias after BRAZE_OPTIMAL_DELAY, once Braze has processed the user.
+
+        With BRAZE_ALIAS_BATCHING, the alias is sent along with the others due the same minute.
+        """
+        if self.interface.alias_queue.enabled:
+            self.interface.alias_queue.add(external_id, alias_name, alias_label)
+        elif alias_label == "fxa_id":
+            add_fxa_id_alias_task.delay(external_id, alias_name, enqueue_in=BRAZE_OPTIMAL_DELAY)
+        else:
+            add_basket_token_alias_task.delay(external_id, alias_name, enqueue_in=BRAZE_OPTIMAL_DELAY)
 
     def update_by_fxa_id(self, fxa_id, update_data):
         """
@@ -505,7 +899,7 @@ class Braze:
         @param update_data: dict of new data
         @raises BrazeUserNotFoundByFxaIdError: when no record found
         """
-        existing_user = self.get(fxa_id=fxa_id)
+        existing_user = self.get(fxa_id=fxa_id, use_cache=False)
         if not existing_user:
             raise BrazeUserNotFoundByFxaIdError
         self.update(existing_user, update_data)
@@ -518,7 +912,7 @@ class Braze:
         @param update_data: dict of new data
         @raises BrazeUserNotFoundByTokenError: when no record found
         """
-        existing_user = self.get(token=token)
+        existing_user = self.get(token=token, use_cache=False)
         if not existing_user:
             raise BrazeUserNotFoundByTokenError
         self.update(existing_user, update_data)
@@ -539,10 +933,64 @@ class Braze:
         user_aliases = data["users"][0].get("user_aliases", [])
         fxa_id = next((user_alias["alias_name"] for user_alias in user_aliases if user_alias.get("alias_label") == "fxa_id"), None)
 
-        self.interface.delete_user(email)
+        try:
+            self.interface.delete_user(email)
+        finally:
+            self.contact_cache.invalidate({"email": email, "email_id": email_id, "fxa_id": fxa_id})
         # return in list of {email_id, fxa_id} to match CTMS.delete
         return [{"email_id": email_id, "fxa_id": fxa_id}]
 
+    def trim_unchanged(self, existing_data, braze_data):
+        """
+        Remove the user attributes of an update that match the existing user.
+
+        Braze replaces `user_attributes_v1` as a whole, so it is either sent
+        unchanged or not at all. Events are always sent. Timestamps of the
+        update itself are ignored when comparing.
+
+        @param existing_data: current user record, basket format
+        @param braze_data: update in Braze format, from to_vendor()
+        @return: the trimmed update, or None if it would change nothing
+        """
+        attributes = braze_data["attributes"][0]
+        baseline = self.to_vendor(existing_data)["attributes"][0]
+        subscribed = set(existing_data["newsletters"]) if "newsletters" in existing_data else None
+
+        changed = {}
+        for name, value in attributes.items():
+            if name in ("external_id", "_update_existing_only", "update_timestamp"):
+                continue
+            if name == "subscription_groups" and subscribed is not None:
+                value = [
+                    group
+                    for group in value
+                    if (group["subscription_state"] == "subscribed") != (vendor_id_to_slug(group["subscription_group_id"]) in subscribed)
+                ]
+                if value:
+                    changed[name] = value
+            elif name == "user_attributes_v1":
+                without_timestamps = [{key: val for key, val in item.items() if key != "updated_at"} for item in value]
+                baseline_without_timestamps = [{key: val for key, val in item.items() if key != "updated_at"} for item in baseline[name]]
+                if without_timestamps != baseline_without_timestamps:
+                    changed[name] = value
+            elif name not in baseline or value != baseline[name]:
+                changed[name] = value
+
+        events = braze_data.get("events")
+        if not changed and not events:
+            return None
+
+        trimmed_attributes = {
+            "external_id": attributes["external_id"],
+            "update_timestamp": attributes["update_timestamp"],
+            "_update_existing_only": attributes["_update_existing_only"],
+            **changed,
+        }
+        trimmed_data = {"attributes": [trimmed_attributes]}
+        if events:
+            trimmed_data["events"] = events
+        return trimmed_data
+
     def from_vendor(self, braze_user_data, subscription_groups):
         """
         Converts Braze-formatted data to Basket-formatted data.
@@ -692,5 +1140,7 @@ def process_braze_country(country):
         return None
 
 
-braze_tx = Braze(BrazeInterface(settings.BRAZE_BASE_API_URL, settings.BRAZE_API_KEY))
+braze_tx = Braze(BrazeInterface(settings.BRAZE_BASE_API_URL, settings.BRAZE_API_KEY, name="braze_tx", transactional=True))
 braze = Braze(BrazeInterface(settings.BRAZE_BASE_API_URL, settings.BRAZE_NEWSLETTER_API_KEY))
+track_buffers = {backend.interface.name: backend.interface.track_buffer for backend in (braze, braze_tx)}
+alias_queues = {backend.interface.name: backend.interface.alias_queue for backend in (braze, braze_tx)}
@@ -0,0 +1,102 @@
+"""
+Short-lived read-through cache of contacts returned by the backends.
+
+Contacts are stored in Basket format under each of their IDs, so a later
+lookup by any one of them is served without a remote call. Writes through
+the backends must call `invalidate` with every version of the contact they
+touch so stale data is never read back and written to the backend again.
+
+A backend read can still be running when a write invalidates the contact, so
+each lookup key has a generation that `invalidate` changes. A contact is only
+kept in the cache if its lookup key's generation didn't change while it was
+being read. Jobs that read a contact to write it back don't use the cache.
+"""
+
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from basket import metrics
+
+# The IDs contacts can be looked up by, in the order the backends give them precedence.
+CACHED_IDS = ("email_id", "token", "email", "fxa_id")
+# How long an invalidation is remembered. Longer than any backend read takes.
+GENERATION_TTL = 60 * 60
+
+
+class ContactCache:
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def enabled(self):
+        return settings.CONTACT_CACHE_TTL > 0
+
+    def _key(self, id_name, id_value):
+        return f"contact:{self.name}:{id_name}:{id_value}"
+
+    def _contact_keys(self, contact):
+        keys = set()
+        for id_name in CACHED_IDS:
+            if value := contact.get(id_name):
+                keys.add(self._key(id_name, value))
+        # A token lookup also matches the `email_id`.
+        if email_id := contact.get("email_id"):
+            keys.add(self._key("token", email_id))
+        return keys
+
+    def lookup_key(self, **ids):
+        """
+        Return the cache key for a lookup, or None if it can't be cached.
+
+        Only the ID with the highest precedence is used, since that is the one
+        the backend would answer with. Lookups with any other kind of ID are
+        not cached.
+        """
+        if not self.enabled:
+            return None
+        ids = {name: value for name, value in ids.items() if value}
+        if not ids or not ids.keys() <= set(CACHED_IDS):
+            return None
+        id_name = next(name for name in CACHED_IDS if name in ids)
+        return self._key(id_name, ids[id_name])
+
+    def _generation_key(self, key):
+        return f"{key}:generation"
+
+    def get(self, key):
+        contact = cache.get(key)
+        metrics.incr(f"news.backends.{self.name}.contact_cache", tags=[f"status:{'hit' if contact else 'miss'}"])
+        return contact
+
+    def generation(self, key):
+        """Return the generation of a lookup key, to pass to `set` along with the contact read for it."""
+        return cache.get(self._generation_key(key))
+
+    def set(self, contact, key, generation):
+        """
+        Cache a contact read for the lookup `key`.
+
+        If the key was invalidated since `generation` was taken, the contact may
+        be older than the write, so it's removed again.
+        """
+        keys = self._contact_keys(contact)
+        cache.set_many(dict.fromkeys(keys, contact), timeout=settings.CONTACT_CACHE_TTL)
+        if cache.get(self._generation_key(key)) != generation:
+            cache.delete_many(list(keys))
+            metrics.incr(f"news.backends.{self.name}.contact_cache", tags=["status:discarded"])
+
+    def invalidate(self, *contacts):
+        """Remove every cached copy of the given contacts, old and new."""
+        if not self.enabled:
+            return
+        keys = set()
+        for contact in contacts:
+            if contact:
+                keys |= self._contact_keys(contact)
+        if keys:
+            # New generations first: a read that raced the write either sees
+            # them in `set`, or is cached before the delete below.
+            cache.set_many({self._generation_key(key): uuid4().hex for key in keys}, timeout=GENERATION_TTL)
+            cache.delete_many(list(keys))
@@ -5,20 +5,29 @@ https://github.com/mozilla-it/ctms-api/
 
 import logging
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from contextvars import copy_context
 from functools import cached_property, partial, partialmethod
+from time import sleep, time
 from urllib.parse import urljoin, urlparse, urlunparse
+from uuid import uuid4
 
 from django.conf import settings
 from django.core.cache import cache
 
+import requests
 import sentry_sdk
 from oauthlib.oauth2 import BackendApplicationClient
-from requests.adapters import HTTPAdapter
 from requests_oauthlib import OAuth2Session
-from urllib3.util import Retry
 
 from basket import metrics
+from basket.base.circuit_breaker import CircuitBreaker
+from basket.base.deadline import DeadlineHTTPAdapter
+from basket.base.rq import WorkerRetry
 from basket.news.backends.common import get_timer_decorator
+from basket.news.backends.contact_cache import ContactCache
 from basket.news.country_codes import SFDC_COUNTRIES_LIST, convert_country_3_to_2
 from basket.news.newsletters import (
     is_supported_newsletter_language,
@@ -220,6 +229,43 @@ TO_VENDOR_PROCESSORS = {
 }
 
 
+def trim_unchanged(ctms_data, existing_data):
+    """
+    Remove the parts of a CTMS update that match the existing contact.
+
+    Only values known to be unchanged are removed. Waitlists, deleting AMO data
+    and unsubscribing from all newsletters are always sent. The basket format
+    has no per-newsletter data, so a newsletter entry is only removed if it
+    carries nothing but its name and an unchanged subscription, and
+    re-subscriptions with a language or source are always sent.
+
+    @params ctms_data: update in CTMS format, from to_vendor()
+    @params existing_data: existing user data, basket format
+    @return: dict in CTMS format, empty if the update would change nothing
+    """
+    trimmed = {}
+    for group_name, group in ctms_data.items():
+        basket_group = CTMS_TO_BASKET_NAMES.get(group_name)
+        if basket_group and isinstance(group, dict):
+            changed = {}
+            for key, value in group.items():
+                basket_name = basket_group.get(key)
+                if not basket_name or basket_name not in existing_data or existing_data[basket_name] != value:
+                    changed[key] = value
+            if changed:
+                trimmed[group_name] = changed
+        elif group_name == "newsletters" and isinstance(group, list) and "newsletters" in existing_data:
+            subscribed = set(existing_data["newsletters"])
+            changed = [
+                newsletter for newsletter in group if newsletter != {"name": newsletter["name"], "subscribed": newsletter["name"] in subscribed}
+            ]
+            if changed:
+                trimmed[group_name] = changed
+        else:
+            trimmed[group_name] = group
+    return trimmed
+
+
 def waitlist_fields_for_slug(data, slug):
     """
     Gather arbitrary fields using the slug as prefix.
@@ -441,6 +487,8 @@ class CTMSSession:
         if not token_cache_key:
             raise ValueError("client_secret is empty")
         self.token_cache_key = token_cache_key
+        self.token_lock_key = f"{token_cache_key}:lock"
+        self.circuit_breaker = CircuitBreaker("ctms", failures=(requests.ConnectionError, requests.Timeout))
 
     @property
     def _token(self):
@@ -485,25 +533,78 @@ class CTMSSession:
             "refresh_token_response",
             CTMSSession.check_2xx_response,
         )
-        # Mount an HTTPAdapter to retry requests.
-        retries = Retry(
+        # Mount an HTTPAdapter to retry requests, within the deadline. Worker jobs
+        # are rescheduled instead of retrying here.
+        retries = WorkerRetry(
             total=5,
             backoff_factor=0.5,
             allowed_methods={"GET", "POST", "PATCH"},
         )
-        session.mount(self.api_url, HTTPAdapter(max_retries=retries))
+        session.mount(self.api_url, DeadlineHTTPAdapter(max_retries=retries))
         if not session.authorized:
             session = self._authorize_session(session)
         return session
 
-    def _authorize_session(self, session):
-        """Fetch a client-crendetials token and add to the session."""
+    @staticmethod
+    def _expires_soon(token):
+        """
+        Return True if the token expires within CTMS_TOKEN_REFRESH_MARGIN seconds.
+
+        The margin is at most half of the token's lifetime, so a short-lived
+        token isn't expiring soon as soon as it's fetched.
+        """
+        expires_at = token and token.get("expires_at")
+        if not expires_at:
+            return False
+        margin = min(settings.CTMS_TOKEN_REFRESH_MARGIN, int(token.get("expires_in", 60)) / 2)
+        return expires_at - time() < margin
+
+    def _fetch_token(self, session):
+        """Fetch a client-credentials token from CTMS and save it for all processes."""
         self._token = session.fetch_token(
             token_url=urljoin(self.api_url, "/token"),
             client_id=self.client_id,
             client_secret=self.client_secret,
         )
-        return session
+        metrics.incr("news.backends.ctms.token", tags=["action:fetched"])
+
+    def _authorize_session(self, session, stale_token=None):
+        """
+        Add a valid client-credentials token to the session.
+
+        Only one process fetches a new token at a time, holding a lock in the
+        shared cache. The others wait for it to save the token and reuse it. If
+        the lock holder takes longer than CTMS_TOKEN_LOCK_WAIT, we fetch our own.
+
+        @param session: the OAuth2Session to authorize
+        @param stale_token: a token that must not be reused, such as one that
+            was just rejected by CTMS
+        """
+        stale_access_token = stale_token and stale_token.get("access_token")
+        deadline = time() + settings.CTMS_TOKEN_LOCK_WAIT
+        while True:
+            token = self._token
+            if token and token.get("access_token") != stale_access_token and not self._expires_soon(token):
+                session.token = token
+                metrics.incr("news.backends.ctms.token", tags=["action:reused"])
+                return session
+
+            owner = uuid4().hex
+            if cache.add(self.token_lock_key, owner, timeout=60):
+                try:
+                    self._fetch_token(session)
+                finally:
+                    # Past the lock timeout, another process may hold the lock now.
+                    if cache.get(self.token_lock_key) == owner:
+                        cache.delete(self.token_lock_key)
+                return session
+
+            if time() >= deadline:
+                metrics.incr("news.backends.ctms.token", tags=["action:lock_timeout"])
+                self._fetch_token(session)
+                return session
+
+            sleep(0.1)
 
     def request(self, method, path, *args, **kwargs):
         """
@@ -519,16 +620,23 @@ class CTMSSession:
             params (for querystring parameters) and json (for the JSON-encoded
             body).
         @return a requests Response
+        @raises CircuitOpenError: if CTMS has been failing and isn't called
         """
-        session = self._session
-        url = urljoin(self.api_url, path)
-        resp = session.request(method, url, *args, **kwargs)
-        metrics.incr("news.backends.ctms.request", tags=[f"method:{method}", f"status_code:{resp.status_code}"])
-        if resp.status_code == 401:
-            self._session = self._authorize_session(session)
-            metrics.incr("news.backends.ctms.session_refresh")
+        with self.circuit_breaker.guard() as call:
+            session = self._session
+            if self._expires_soon(session.token):
+                # Refresh before the token expires, instead of waiting for a 401.
+                self._session = self._authorize_session(session, stale_token=session.token)
+                metrics.incr("news.backends.ctms.session_refresh", tags=["reason:expiring"])
+            url = urljoin(self.api_url, path)
             resp = session.request(method, url, *args, **kwargs)
             metrics.incr("news.backends.ctms.request", tags=[f"method:{method}", f"status_code:{resp.status_code}"])
+            if resp.status_code == 401:
+                self._session = self._authorize_session(session, stale_token=session.token)
+                metrics.incr("news.backends.ctms.session_refresh", tags=["reason:unauthorized"])
+                resp = session.request(method, url, *args, **kwargs)
+                metrics.incr("news.backends.ctms.request", tags=[f"method:{method}", f"status_code:{resp.status_code}"])
+            call.failed = resp.status_code >= 500
         return resp
 
     get = partialmethod(request, "GET")
@@ -811,12 +919,29 @@ class CTMSNotConfigured(CTMSError):
         return "CTMS is not configured"
 
 
+_lookup_executor = None
+_lookup_executor_lock = threading.Lock()
+
+
+def get_lookup_executor():
+    """Get the thread pool shared by concurrent alternate ID lookups."""
+    global _lookup_executor
+    with _lookup_executor_lock:
+        if _lookup_executor is None:
+            _lookup_executor = ThreadPoolExecutor(
+                max_workers=settings.CTMS_LOOKUP_MAX_WORKERS,
+                thread_name_prefix="ctms-lookup",
+            )
+    return _lookup_executor
+
+
 class CTMS:
     """Basket interface to CTMS"""
 
     def __init__(self, interface, is_primary=False):
         self.interface = interface
         self.is_primary = is_primary
+        self.contact_cache = ContactCache("ctms")
 
     def get(
         self,
@@ -827,6 +952,7 @@ class CTMS:
         mofo_email_id=None,
         amo_id=None,
         sfdc_id=None,
+        use_cache=True,
     ):
         """
         Get a contact record, using the first ID provided.
@@ -838,6 +964,7 @@ class CTMS:
         @param mofo_email_id: external ID from MoFo
         @param amo_id: external ID from AMO
         @param sfdc_id: legacy SFDC ID
+        @param use_cache: read and populate the contact cache, if enabled
         @return: dict, or None if disabled
         @raises CTMSNoIds: no IDs are set
         @raises CTMSMultipleContacts:: multiple contacts returned
@@ -848,6 +975,22 @@ class CTMS:
             else:
                 return None
 
+        cache_key = None
+        if use_cache:
+            cache_key = self.contact_cache.lookup_key(
+                email_id=email_id,
+                token=token,
+                email=email,
+                fxa_id=fxa_id,
+                mofo_email_id=mofo_email_id,
+                amo_id=amo_id,
+                sfdc_id=sfdc_id,
+            )
+            if cache_key and (cached := self.contact_cache.get(cache_key)):
+                return cached
+        if cache_key:
+            generation = self.contact_cache.generation(cache_key)
+
         if email_id:
             contact = self.interface.get_by_email_id(email_id)
         else:
@@ -885,14 +1028,14 @@ class CTMS:
             first_run = True
             first_contacts = None
             contact = None
-            for params in alt_ids:
-                contacts = self.interface.get_by_alternate_id(**params)
-                if first_run:
-                    first_contacts = contacts
-                    first_run = False
-                if len(contacts) == 1:
-                    contact = contacts[0]
-                    break
+            with closing(self._get_by_alternate_ids(alt_ids)) as results:
+                for contacts in results:
+                    if first_run:
+                        first_contacts = contacts
+                        first_run = False
+                    if len(contacts) == 1:
+                        contact = contacts[0]
+                        break
 
             # Did not find single contact, return result of first ID check
             # If first alt ID returned multiple, raise exception
@@ -902,10 +1045,37 @@ class CTMS:
                 raise CTMSMultipleContactsError(id_name, id_value, first_contacts)
 
         if contact:
-            return from_vendor(contact)
+            user_data = from_vendor(contact)
+            if cache_key:
+                self.contact_cache.set(user_data, cache_key, generation)
+            return user_data
         else:
             return None
 
+    def _get_by_alternate_ids(self, alt_ids):
+        """
+        Yield the contacts found for each set of alternate IDs, in order.
+
+        With CTMS_CONCURRENT_LOOKUPS, all lookups are started at once on a
+        bounded thread pool, and the results are still yielded in the order of
+        `alt_ids`. Lookups that are still queued when the caller stops are
+        cancelled.
+        """
+        if not settings.CTMS_CONCURRENT_LOOKUPS or len(alt_ids) == 1:
+            for params in alt_ids:
+                yield self.interface.get_by_alternate_id(**params)
+            return
+
+        executor = get_lookup_executor()
+        # Run each lookup in a copy of our context, so it shares our deadline.
+        futures = [executor.submit(copy_context().run, partial(self.interface.get_by_alternate_id, **params)) for params in alt_ids]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
     def add(self, data):
         """
         Create a contact record.
@@ -918,7 +1088,10 @@ class CTMS:
                 raise CTMSNotConfigured()
             else:
                 return None
-        return self.interface.post_to_create(to_vendor(data))
+        try:
+            return self.interface.post_to_create(to_vendor(data))
+        finally:
+            self.contact_cache.invalidate(data)
 
     def update(self, existing_data, update_data):
         """
@@ -926,7 +1099,7 @@ class CTMS:
 
         @param existing_data: current contact record
         @param update_data: dict of new data
-        @return: updated user data, CTMS format
+        @return: updated user data, CTMS format, or None if nothing changed
         """
         if not self.interface:
             if self.is_primary:
@@ -938,7 +1111,19 @@ class CTMS:
             metrics.incr("news.backends.ctms.update_no_email_id")
             raise CTMSNotFoundByEmailIDError(email_id)
         ctms_data = to_vendor(update_data, existing_data)
-        return self.interface.patch_by_email_id(email_id, ctms_data)
+        # With the contact cache, existing_data may be stale, so only trust it without.
+        if settings.SUPPRESS_NOOP_WRITES and not self.contact_cache.enabled:
+            trimmed_data = trim_unchanged(ctms_data, existing_data)
+            if not trimmed_data:
+                metrics.incr("news.backends.ctms.writes_suppressed", tags=["result:skipped"])
+                return None
+            if trimmed_data != ctms_data:
+                metrics.incr("news.backends.ctms.writes_suppressed", tags=["result:trimmed"])
+            ctms_data = trimmed_data
+        try:
+            return self.interface.patch_by_email_id(email_id, ctms_data)
+        finally:
+            self.contact_cache.invalidate(existing_data, update_data)
 
     def update_by_alt_id(self, alt_id_name, alt_id_value, update_data):
         """
@@ -947,7 +1132,7 @@ class CTMS:
         @param alt_id_name: the alternate ID name, such as 'token'
         @param alt_id_value: the alternate ID value
         @param update_data: dict of new data
-        @return: updated user data, CTMS format
+        @return: updated user data, CTMS format, or None if nothing changed
         @raises CTMSNotFoundByAltID: when no record found
         """
         if not self.interface:
@@ -956,7 +1141,8 @@ class CTMS:
             else:
                 return None
 
-        contact = self.get(**{alt_id_name: alt_id_value})
+        # Never update from a cached copy of the contact.
+        contact = self.get(**{alt_id_name: alt_id_value}, use_cache=False)
         if contact:
             return self.update(contact, update_data)
         else:
@@ -975,7 +1161,12 @@ class CTMS:
                 raise CTMSNotConfigured()
             else:
                 return None
-        return self.interface.delete_by_email(email)
+        deleted = None
+        try:
+            deleted = self.interface.delete_by_email(email)
+            return deleted
+        finally:
+            self.contact_cache.invalidate({"email": email}, *(deleted or []))
 
 
 def ctms_session():
@@ -2,6 +2,8 @@ import threading
 import time
 from itertools import chain
 
+from django.conf import settings
+
 from basket.news.backends.braze import braze
 
 
@@ -74,7 +76,13 @@ def mask(external_id):
     return "-".join(["***"] * 3 + parts[3:])
 
 
+# Seconds a migration request waits for the shared /users/alias/new rate limit.
+RATE_LIMIT_MAX_WAIT = 60
+
+
 class ThreadSafeRateLimiter:
+    """Per-process pacing for when the shared rate limits are turned off with RATE_LIMIT_ENABLED."""
+
     def __init__(self, max_requests=19500, time_window=60):
         self.max_requests = max_requests
         self.time_window = time_window
@@ -97,6 +105,7 @@ class ThreadSafeRateLimiter:
             self.requests.append(now)
 
 
-def rate_limited_add_aliases(chunk, rate_limiter):
-    rate_limiter.acquire()
-    return braze.interface.add_aliases(chunk)
+def rate_limited_add_aliases(chunk, rate_limiter=None):
+    if rate_limiter is not None and not settings.RATE_LIMIT_ENABLED:
+        rate_limiter.acquire()
+    return braze.interface.add_aliases(chunk, max_wait=RATE_LIMIT_MAX_WAIT)
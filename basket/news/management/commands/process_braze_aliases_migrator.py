@@ -3,14 +3,14 @@ import tempfile
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 
 import pyarrow.parquet as pq
 import sentry_sdk
 from google.cloud import storage
 
-from basket.base.rq import get_queue
-from basket.news.backends.braze import braze
+from basket.base.rq import QUEUE_BULK, get_queue, get_queue_name
 from basket.news.management.commands.alias_migration.lib import (
     ThreadSafeRateLimiter,
     build_alias_operations_from_dataframe,
@@ -36,6 +36,8 @@ def process_migration_batch(
     """
     try:
         if parallel:
+            # Requests are paced by the /users/alias/new rate limit shared with every other process,
+            # or by this process alone when the shared rate limits are turned off.
             rate_limiter = ThreadSafeRateLimiter(max_requests=19500, time_window=60)
 
             with ThreadPoolExecutor(max_workers=threads) as executor:
@@ -52,12 +54,14 @@ def process_migration_batch(
                 if use_fake_braze:
                     fake_add_aliases(chunk)
                 else:
-                    braze.interface.add_aliases(chunk)
+                    rate_limited_add_aliases(chunk)
 
-                end_time = time.time()
-                execution_time = end_time - start_time
-                sleep_time = max(0, 0.003 - execution_time)
-                time.sleep(sleep_time)
+                if not settings.RATE_LIMIT_ENABLED:
+                    # Without the shared rate limits, keep to a fixed pace.
+                    end_time = time.time()
+                    execution_time = end_time - start_time
+                    sleep_time = max(0, 0.003 - execution_time)
+                    time.sleep(sleep_time)
 
         log.info(f"Successfully processed batch (batch index {batch_index}) with {len(batch)} chunks.")
 
@@ -172,7 +176,7 @@ class Command(BaseCommand):
         if not blob.exists():
             raise CommandError(f"File '{file}' not found in bucket '{bucket}'")
 
-        queue = get_queue()
+        queue = get_queue(get_queue_name(QUEUE_BULK))
         previous_job = None
 
         for df in self.read_parquet_blob(blob, chunk_size, batch_size):
@@ -1,7 +1,11 @@
 import json
 import logging
+import statistics
 import sys
-from time import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import monotonic, sleep, time
+from types import SimpleNamespace
 
 from django.conf import settings
 from django.core.management import BaseCommand, CommandError
@@ -11,6 +15,7 @@ import requests
 import sentry_sdk
 
 from basket import metrics
+from basket.base.rq import enqueue_batch
 from basket.news.backends.braze import BRAZE_OPTIMAL_DELAY
 from basket.news.tasks import (
     fxa_delete,
@@ -31,11 +36,151 @@ FXA_EVENT_TYPES = {
 log = logging.getLogger(__name__)
 
 
+def dispatch_event(event_type, event):
+    """Enqueue the jobs for an FxA event, or add them to the current `enqueue_batch()`."""
+    enqueue_in = BRAZE_OPTIMAL_DELAY if should_delay_execution(event_type, event) else None
+    if settings.BRAZE_PARALLEL_WRITE_ENABLE:
+        pre_generated_token = generate_token()
+        FXA_EVENT_TYPES[event_type].delay(
+            event,
+            use_braze_backend=True,
+            should_send_tx_messages=False,
+            pre_generated_token=pre_generated_token,
+            enqueue_in=enqueue_in,
+        )
+        FXA_EVENT_TYPES[event_type].delay(
+            event,
+            use_braze_backend=False,
+            should_send_tx_messages=True,
+            pre_generated_token=pre_generated_token,
+        )
+    elif settings.BRAZE_ONLY_WRITE_ENABLE:
+        FXA_EVENT_TYPES[event_type].delay(
+            event,
+            use_braze_backend=True,
+            enqueue_in=enqueue_in,
+        )
+    else:
+        FXA_EVENT_TYPES[event_type].delay(
+            event,
+            use_braze_backend=False,
+        )
+
+
+def delete_messages(queue, msgs):
+    """Delete handled messages from the SQS queue, up to 10 per request."""
+    for i in range(0, len(msgs), 10):
+        chunk = msgs[i : i + 10]
+        response = queue.delete_messages(
+            Entries=[{"Id": str(n), "ReceiptHandle": msg.receipt_handle} for n, msg in enumerate(chunk)],
+        )
+        failed = response.get("Failed", [])
+        if failed:
+            # These will be received again once their visibility timeout ends.
+            metrics.incr("fxa.events.delete_failed", value=len(failed))
+            log.warning(f"Failed to delete {len(failed)} FxA event messages: {failed}")
+
+
+class Throughput:
+    """
+    Count the events handled, and time each batch, to report how fast the consumer dispatches them.
+
+    This only covers receiving the events and enqueueing their jobs. How long the
+    jobs take to run is in the `task.timings` metric.
+    """
+
+    def __init__(self, rate=0, track_latency=False):
+        """
+        @param rate: most events per second to handle, 0 for no limit
+        @param track_latency: keep each batch's latency for the report, which a
+            long-running consumer shouldn't
+        """
+        self.rate = rate
+        self.events = 0
+        self.latencies = [] if track_latency else None
+        self.start = monotonic()
+        self.lock = threading.Lock()
+
+    def record(self, events, seconds):
+        with self.lock:
+            self.events += events
+            if self.latencies is not None:
+                self.latencies.append(seconds)
+
+    def throttle(self):
+        """Sleep as long as needed to keep the average under the rate cap."""
+        if self.rate:
+            sleep(max(0, self.events / self.rate - (monotonic() - self.start)))
+
+    def report(self):
+        elapsed = monotonic() - self.start
+        lines = [f"Dispatched {self.events} events in {elapsed:.1f}s: {self.events / max(elapsed, 0.001):.1f} events/s."]
+        if self.latencies and len(self.latencies) > 1:
+            percentiles = statistics.quantiles(self.latencies, n=100, method="inclusive")
+            p50, p95, p99 = (percentiles[n - 1] * 1000 for n in (50, 95, 99))
+            lines.append(f"Batch dispatch latency: p50 {p50:.1f}ms, p95 {p95:.1f}ms, p99 {p99:.1f}ms, max {max(self.latencies) * 1000:.1f}ms.")
+        lines.append("Jobs were enqueued, not run: see the task.timings metric for how long they took.")
+        return "\n".join(lines)
+
+
+class ReplayQueue:
+    """Stands in for the SQS queue when replaying events from a file."""
+
+    def delete_messages(self, Entries):
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+
+def read_replay_file(path):
+    """Yield batches of up to 10 messages from an NDJSON file of SNS message bodies, as SQS would return them."""
+    batch = []
+    with open(path) as f:
+        for n, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            batch.append(SimpleNamespace(body=line, receipt_handle=f"replay-{n}"))
+            if len(batch) == 10:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
 class Command(BaseCommand):
     snitch_delay = 300  # 5 min
     snitch_last_timestamp = 0
     snitch_id = settings.FXA_EVENTS_SNITCH_ID
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-c",
+            "--concurrency",
+            type=int,
+            default=settings.FXA_EVENTS_QUEUE_CONCURRENCY,
+            help=f"Number of SQS pollers to run at once, if RQ_PARTITIONS is set ({settings.FXA_EVENTS_QUEUE_CONCURRENCY})",
+        )
+        parser.add_argument(
+            "--replay",
+            metavar="FILE",
+            help="Run the events in an NDJSON file of SNS message bodies through the same dispatch, instead of polling SQS",
+        )
+        parser.add_argument(
+            "--load",
+            metavar="FILE",
+            help="Send the events in an NDJSON file of SNS message bodies to the SQS queue, e.g. a local stand-in, and exit",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Stop polling when the SQS queue is empty, and report dispatch throughput",
+        )
+        parser.add_argument(
+            "--rate",
+            type=int,
+            default=0,
+            help="Most events per second to replay, load or process, 0 for no limit (0)",
+        )
+
     def snitch(self):
         if not self.snitch_id:
             return
@@ -45,103 +190,158 @@ class Command(BaseCommand):
             requests.post(f"https://nosnch.in/{self.snitch_id}")
             self.snitch_last_timestamp = time()
 
-    def handle(self, *args, **options):
-        if not settings.FXA_EVENTS_ACCESS_KEY_ID:
-            raise CommandError("AWS SQS Credentials not configured")
-
-        if not settings.FXA_EVENTS_QUEUE_ENABLE:
-            raise CommandError("FxA Events Queue is not enabled")
-
-        sqs = boto3.resource(
+    def get_sqs_queue(self):
+        # boto3 sessions aren't thread safe, so each poller has its own.
+        sqs = boto3.session.Session().resource(
             "sqs",
             region_name=settings.FXA_EVENTS_QUEUE_REGION,
             aws_access_key_id=settings.FXA_EVENTS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.FXA_EVENTS_SECRET_ACCESS_KEY,
             endpoint_url=settings.FXA_EVENTS_ENDPOINT_URL,
         )
-        queue = sqs.Queue(settings.FXA_EVENTS_QUEUE_URL)
+        return sqs.Queue(settings.FXA_EVENTS_QUEUE_URL)
+
+    def process_batch(self, queue, msgs):
+        """
+        Enqueue the jobs for a batch of received messages with one Redis pipeline,
+        then delete the handled messages from SQS.
+
+        Events are enqueued in the order they happened. If enqueueing fails, the
+        batch's events are left in SQS to be received again.
+        """
+        handled = []
+        events = []
+        for msg in msgs:
+            if not (msg and msg.body):
+                continue
 
+            if settings.FXA_EVENTS_QUEUE_IGNORE_MODE:
+                metrics.incr("fxa.events.message", tags=["info:ignored_mode"])
+                handled.append(msg)
+                continue
+
+            try:
+                data = json.loads(msg.body)
+                event = json.loads(data["Message"])
+            except ValueError:
+                # body was not JSON
+                metrics.incr("fxa.events.message", tags=["info:json_error"])
+                with sentry_sdk.isolation_scope() as scope:
+                    scope.set_extra("msg.body", msg.body)
+                    sentry_sdk.capture_exception()
+
+                handled.append(msg)
+                continue
+
+            event_type = event.get("event", "__NONE__").replace(":", "-")
+            metrics.incr("fxa.events.message", tags=["info:received", f"event:{event_type}"])
+            if event_type not in FXA_EVENT_TYPES:
+                metrics.incr("fxa.events.message", tags=["info:ignored_excluded", f"event:{event_type}"])
+                log.debug(f"IGNORED: {event}")
+                # we can safely remove from the queue message types we
+                # don't need this keeps the queue from filling up with
+                # old messages
+                handled.append(msg)
+                continue
+
+            events.append((msg, event_type, event))
+
+        # SQS doesn't keep messages in order, but their events have timestamps.
+        events.sort(key=lambda item: item[2].get("ts", 0))
         try:
-            # Poll for messages indefinitely.
-            while True:
-                self.snitch()
-                msgs = queue.receive_messages(
-                    WaitTimeSeconds=settings.FXA_EVENTS_QUEUE_WAIT_TIME,
-                    MaxNumberOfMessages=10,
-                )
-                for msg in msgs:
-                    if not (msg and msg.body):
-                        continue
-
-                    if settings.FXA_EVENTS_QUEUE_IGNORE_MODE:
-                        metrics.incr("fxa.events.message", tags=["info:ignored_mode"])
-                        msg.delete()
-                        continue
+            with enqueue_batch():
+                for _msg, event_type, event in events:
+                    dispatch_event(event_type, event)
+        except Exception:
+            # something's wrong with the queue. try again.
+            for _msg, event_type, _event in events:
+                metrics.incr("fxa.events.message", tags=["info:queue_error", f"event:{event_type}"])
+            with sentry_sdk.isolation_scope() as scope:
+                scope.set_tag("action", "retried")
+                sentry_sdk.capture_exception()
+        else:
+            for msg, event_type, _event in events:
+                metrics.incr("fxa.events.message", tags=["info:success", f"event:{event_type}"])
+                handled.append(msg)
 
+        if handled:
+            delete_messages(queue, handled)
+
+    def run_batch(self, queue, msgs):
+        start = monotonic()
+        self.process_batch(queue, msgs)
+        self.throughput.record(len(msgs), monotonic() - start)
+        self.throughput.throttle()
+
+    def poll(self, burst=False):
+        """Poll for messages until the command stops, or in burst mode until the queue is empty."""
+        queue = self.get_sqs_queue()
+        while not self.stopping.is_set():
+            self.snitch()
+            msgs = queue.receive_messages(
+                WaitTimeSeconds=settings.FXA_EVENTS_QUEUE_WAIT_TIME,
+                MaxNumberOfMessages=10,
+            )
+            if burst and not msgs:
+                return
+            self.run_batch(queue, msgs)
+
+    def replay(self, path):
+        """Run the events in a file through the same dispatch as SQS messages."""
+        queue = ReplayQueue()
+        for msgs in read_replay_file(path):
+            self.run_batch(queue, msgs)
+
+    def load(self, path):
+        """Send the events in a file to the SQS queue, 10 per request."""
+        queue = self.get_sqs_queue()
+        for msgs in read_replay_file(path):
+            queue.send_messages(Entries=[{"Id": str(n), "MessageBody": msg.body} for n, msg in enumerate(msgs)])
+            self.throughput.record(len(msgs), 0)
+            self.throughput.throttle()
+
+    def handle(self, *args, **options):
+        self.throughput = Throughput(options["rate"], track_latency=bool(options["replay"] or options["burst"]))
+        if options["replay"]:
+            self.replay(options["replay"])
+            self.stdout.write(self.throughput.report())
+            return
+
+        if not settings.FXA_EVENTS_ACCESS_KEY_ID:
+            raise CommandError("AWS SQS Credentials not configured")
+
+        if not settings.FXA_EVENTS_QUEUE_ENABLE:
+            raise CommandError("FxA Events Queue is not enabled")
+
+        if options["load"]:
+            self.load(options["load"])
+            self.stdout.write(f"Sent {self.throughput.events} events.")
+            return
+
+        concurrency = options["concurrency"]
+        if concurrency > 1 and not settings.RQ_PARTITIONS:
+            # Pollers enqueue the events for one uid in any order, so they only
+            # apply in order once their jobs run in the uid's ordered partition.
+            log.warning("Running one SQS poller: concurrent pollers need RQ_PARTITIONS to keep per-uid ordering.")
+            concurrency = 1
+        burst = options["burst"]
+        self.stopping = threading.Event()
+        try:
+            if concurrency <= 1:
+                self.poll(burst)
+            else:
+                with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="fxa-poller") as executor:
+                    futures = [executor.submit(self.poll, burst) for _ in range(concurrency)]
                     try:
-                        data = json.loads(msg.body)
-                        event = json.loads(data["Message"])
-                    except ValueError:
-                        # body was not JSON
-                        metrics.incr("fxa.events.message", tags=["info:json_error"])
-                        with sentry_sdk.isolation_scope() as scope:
-                            scope.set_extra("msg.body", msg.body)
-                            sentry_sdk.capture_exception()
-
-                        msg.delete()
-                        continue
-
-                    event_type = event.get("event", "__NONE__").replace(":", "-")
-                    metrics.incr("fxa.events.message", tags=["info:received", f"event:{event_type}"])
-                    if event_type not in FXA_EVENT_TYPES:
-                        metrics.incr("fxa.events.message", tags=["info:ignored_excluded", f"event:{event_type}"])
-                        log.debug(f"IGNORED: {event}")
-                        # we can safely remove from the queue message types we
-                        # don't need this keeps the queue from filling up with
-                        # old messages
-                        msg.delete()
-                        continue
-
-                    enqueue_in = BRAZE_OPTIMAL_DELAY if should_delay_execution(event_type, event) else None
-                    try:
-                        if settings.BRAZE_PARALLEL_WRITE_ENABLE:
-                            pre_generated_token = generate_token()
-                            FXA_EVENT_TYPES[event_type].delay(
-                                event,
-                                use_braze_backend=True,
-                                should_send_tx_messages=False,
-                                pre_generated_token=pre_generated_token,
-                                enqueue_in=enqueue_in,
-                            )
-                            FXA_EVENT_TYPES[event_type].delay(
-                                event,
-                                use_braze_backend=False,
-                                should_send_tx_messages=True,
-                                pre_generated_token=pre_generated_token,
-                            )
-                        elif settings.BRAZE_ONLY_WRITE_ENABLE:
-                            FXA_EVENT_TYPES[event_type].delay(
-                                event,
-                                use_braze_backend=True,
-                                enqueue_in=enqueue_in,
-                            )
-                        else:
-                            FXA_EVENT_TYPES[event_type].delay(
-                                event,
-                                use_braze_backend=False,
-                            )
-                    except Exception:
-                        # something's wrong with the queue. try again.
-                        metrics.incr("fxa.events.message", tags=["info:queue_error", f"event:{event_type}"])
-                        with sentry_sdk.isolation_scope() as scope:
-                            scope.set_tag("action", "retried")
-                            sentry_sdk.capture_exception()
-
-                        continue
-
-                    metrics.incr("fxa.events.message", tags=["info:success", f"event:{event_type}"])
-                    msg.delete()
+                        for future in as_completed(futures):
+                            # Outside burst mode, a poller only stops on an error: stop the others, and raise it.
+                            future.result()
+                    finally:
+                        self.stopping.set()
+            if burst:
+                self.stdout.write(self.throughput.report())
         except KeyboardInterrupt:
+            self.stopping.set()
             sys.exit("\nBuh bye")
 
 
@@ -1,22 +1,114 @@
+import json
+from time import monotonic, sleep
+
 from django.conf import settings
 from django.core.management import BaseCommand, CommandError
 
+from basket.base.maintenance import STREAM_KEY, enqueue_task, read_stream, stream_length
+from basket.base.rq import enqueue_batch, get_redis_connection
 from basket.news.models import QueuedTask
 
+# The pks of the last chunk of queued tasks put in RQ. They're set in the same
+# Redis transaction as the jobs, so after a crash between enqueueing a chunk and
+# deleting it, the chunk is deleted instead of enqueued again. Only those pks are
+# deleted: tasks captured by other processes can be committed out of pk order.
+CHECKPOINT_KEY = "basket:maintenance_queue:checkpoint"
+CHECKPOINT_TTL = 7 * 24 * 60 * 60
+
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument(
             "-n", "--num-tasks", type=int, default=settings.QUEUE_BATCH_SIZE, help=f"Number of tasks to process ({settings.QUEUE_BATCH_SIZE})"
         )
+        parser.add_argument(
+            "--drain",
+            action="store_true",
+            help="Keep processing chunks of --num-tasks tasks until none are left",
+        )
+        parser.add_argument(
+            "--rate",
+            type=int,
+            default=settings.QUEUE_DRAIN_RATE,
+            help=f"Most tasks to enqueue per second, 0 for no limit ({settings.QUEUE_DRAIN_RATE})",
+        )
+
+    def resume(self):
+        """Delete the queued tasks that were enqueued before a crash."""
+        checkpoint = get_redis_connection().get(CHECKPOINT_KEY)
+        if checkpoint is None:
+            return
+        deleted, _ = QueuedTask.objects.filter(pk__in=json.loads(checkpoint)).delete()
+        if deleted:
+            print(f"Resuming: deleted {deleted} tasks that were already enqueued.")
+
+    def process_chunk(self, num_tasks):
+        """
+        Enqueue the oldest `num_tasks` queued tasks with one Redis pipeline, then delete them.
+
+        @return: the tasks processed
+        """
+        queued_tasks = list(QueuedTask.objects.order_by("pk")[:num_tasks])
+        enqueued = []
+
+        def set_checkpoint(pipe):
+            if enqueued:
+                pipe.set(CHECKPOINT_KEY, json.dumps([task.pk for task in enqueued]), ex=CHECKPOINT_TTL)
+
+        with enqueue_batch(on_flush=set_checkpoint):
+            for task in queued_tasks:
+                task.enqueue()
+                enqueued.append(task)
+        # Only forget the tasks once they're all in the queue.
+        QueuedTask.objects.filter(pk__in=[task.pk for task in enqueued]).delete()
+        return enqueued
+
+    def process_stream_chunk(self, num_tasks):
+        """
+        Enqueue the oldest `num_tasks` tasks in the Redis stream, and remove them in the same transaction.
+
+        @return: the stream entry IDs processed
+        """
+        enqueued = []
+
+        def remove_entries(pipe):
+            if enqueued:
+                pipe.xdel(STREAM_KEY, *enqueued)
+
+        with enqueue_batch(on_flush=remove_entries):
+            for entry_id, task_name, args, kwargs in read_stream(num_tasks):
+                enqueue_task(task_name, args, kwargs)
+                enqueued.append(entry_id)
+        return enqueued
+
+    def remaining(self):
+        return QueuedTask.objects.count() + stream_length()
 
     def handle(self, *args, **options):
         if settings.MAINTENANCE_MODE:
             raise CommandError("Command unavailable in maintenance mode")
 
+        num_tasks = options["num_tasks"]
+        rate = options["rate"] if options["drain"] else 0
+        self.resume()
         count = 0
-        for task in QueuedTask.objects.all()[: options["num_tasks"]]:
-            task.retry()
-            count += 1
+        start = monotonic()
+        while True:
+            # Tasks captured in the database first, then those in the Redis stream.
+            processed = self.process_chunk(num_tasks) or self.process_stream_chunk(num_tasks)
+            if not processed:
+                break
+            count += len(processed)
+            if not options["drain"]:
+                break
+
+            elapsed = monotonic() - start
+            print(f"{count} processed, {count / max(elapsed, 0.001):.0f}/s. {self.remaining()} remaining.")
+            if rate:
+                # Keep the average under the rate cap.
+                sleep(max(0, count / rate - elapsed))
+
+        # Every chunk enqueued has been deleted.
+        get_redis_connection().delete(CHECKPOINT_KEY)
 
-        print(f"{count} processed. {QueuedTask.objects.count()} remaining.")
+        print(f"{count} processed. {self.remaining()} remaining.")
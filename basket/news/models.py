@@ -7,7 +7,8 @@ from django.utils.timezone import now
 import sentry_sdk
 
 from basket import metrics
-from basket.base.rq import get_enqueue_kwargs, get_queue
+from basket.base.maintenance import enqueue_task
+from basket.base.rq import get_enqueue_kwargs, get_task_queue
 from basket.news.fields import LocaleField
 
 
@@ -195,9 +196,12 @@ class QueuedTask(models.Model):
     def __str__(self):  # pragma: no cover
         return f"{self.name} {self.args} {self.kwargs}"
 
+    def enqueue(self):
+        """Enqueue the task, or add it to the current `enqueue_batch()`."""
+        enqueue_task(self.name, self.args, self.kwargs)
+
     def retry(self):
-        kwargs = get_enqueue_kwargs(self.name)
-        get_queue().enqueue(self.name, args=self.args, kwargs=self.kwargs, **kwargs)
+        self.enqueue()
         # Forget the old task.
         self.delete()
 
@@ -222,42 +226,37 @@ class FailedTask(models.Model):
 
     def retry(self):
         kwargs = get_enqueue_kwargs(self.name)
-        get_queue().enqueue(self.name, args=self.args, kwargs=self.kwargs, **kwargs)
+        get_task_queue(self.name).enqueue(self.name, args=self.args, kwargs=self.kwargs, **kwargs)
         # Forget the old task
         self.delete()
 
 
 class BrazeTxEmailMessageManager(models.Manager):
     def get_message(self, message_id, language):
-        message = None
-        req_language = language  # Store this for error reporting below.
-        language = language.strip() or "en-US"
-        exc = BrazeTxEmailMessage.DoesNotExist
-        try:
-            # try to get the exact language
-            message = self.get(message_id=message_id, language=language)
-        except exc:
-            if "-" in language:
-                language = language.split("-")[0]
-
-            try:
-                # failing above, try to get the language prefix
-                message = self.get(message_id=message_id, language__startswith=language)
-            except exc:
-                try:
-                    # failing above, try to get the default language
-                    message = self.get(message_id=message_id, language="en-US")
-                except exc:
-                    # couldn't find a message. give up.
-                    with sentry_sdk.isolation_scope() as scope:
-                        scope.set_tag("language", req_language)
-                        scope.set_tag("message_id", message_id)
-                        sentry_sdk.capture_exception()
+        """
+        Return the message for the exact language, failing that for the language
+        prefix, failing that for en-US. Returns None if there's no match.
+
+        Resolved from the in-memory newsletter registry, so it doesn't query the DB.
+        """
+        # Here to avoid a circular import.
+        from basket.news.newsletters import tx_message_table
+
+        message = tx_message_table().resolve(message_id, language)
+        if message is None:
+            # couldn't find a message. give up.
+            with sentry_sdk.isolation_scope() as scope:
+                scope.set_tag("language", language)
+                scope.set_tag("message_id", message_id)
+                sentry_sdk.capture_message("BrazeTxEmailMessage not found")
 
         return message
 
     def get_tx_message_ids(self):
-        return list(set(list(self.filter(private=False).values_list("message_id", flat=True)) + list(settings.BRAZE_MESSAGE_ID_MAP.keys())))
+        # Here to avoid a circular import.
+        from basket.news.newsletters import tx_message_table
+
+        return list(tx_message_table().public_ids | settings.BRAZE_MESSAGE_ID_MAP.keys())
 
 
 class BrazeTxEmailMessage(models.Model):
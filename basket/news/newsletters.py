@@ -5,9 +5,18 @@ It's used to lookup the backend-specific newsletter name from a
 generic one passed by the user. This decouples the API from any
 specific email provider."""
 
+import threading
+from dataclasses import dataclass
+from time import monotonic, time_ns
+from types import MappingProxyType
+
+from django.conf import settings
 from django.core.cache import cache
-from django.db.models.signals import post_delete, post_save
+from django.core.signals import request_started
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
+from basket import metrics
+from basket.base.signals import task_started
 from basket.news.models import BrazeTxEmailMessage, Newsletter, NewsletterGroup
 
 __all__ = (
@@ -18,60 +27,190 @@ __all__ = (
 )
 
 
-CACHE_KEY = "newsletters_cache_data"
+VERSION_CACHE_KEY = "newsletters_cache_version"
+
+
+@dataclass(frozen=True)
+class LanguageIndex:
+    """Lookup tables for the languages supported by newsletters and tx emails."""
+
+    # The codes as stored, e.g. "pt-BR"
+    exact: frozenset
+    # The lowercased codes, e.g. "pt-br"
+    lower: frozenset
+    # Lowercased 2-letter prefix -> the lowercased code to use for it
+    prefixes: MappingProxyType
+
+    @classmethod
+    def from_languages(cls, languages):
+        exact = frozenset(languages)
+        lower = frozenset(lang.lower() for lang in exact)
+        prefixes = {}
+        # Sort so the bare 2-letter code wins over longer codes with the same
+        # prefix, and so the choice between longer codes is stable.
+        for lang in sorted(lower, key=lambda x: (len(x), x)):
+            prefixes.setdefault(lang[:2], lang)
+
+        return cls(exact=exact, lower=lower, prefixes=MappingProxyType(prefixes))
+
+
+@dataclass(frozen=True)
+class TxMessageTable:
+    """
+    Resolution table for Braze transactional messages.
+
+    Holds the language fallback chain used by `BrazeTxEmailMessage.objects.get_message`:
+    the exact language, then the language prefix, then en-US.
+    """
+
+    # (message_id, language) -> BrazeTxEmailMessage
+    exact: MappingProxyType
+    # (message_id, lowercased language prefix) -> BrazeTxEmailMessage
+    prefixes: MappingProxyType
+    # message_id -> en-US BrazeTxEmailMessage
+    defaults: MappingProxyType
+    # message_ids of the non-private messages
+    public_ids: frozenset
+
+    @classmethod
+    def from_messages(cls, messages):
+        exact = {}
+        prefixes = {}
+        defaults = {}
+        public_ids = set()
+        # Sort so a message stored under the bare prefix (e.g. "es") wins over
+        # ones for a region (e.g. "es-ES"), and so the choice between regions is stable.
+        for msg in sorted(messages, key=lambda m: (m.message_id, len(m.language), m.language)):
+            exact[(msg.message_id, msg.language)] = msg
+            prefixes.setdefault((msg.message_id, msg.language.split("-")[0].lower()), msg)
+            if msg.language == "en-US":
+                defaults[msg.message_id] = msg
+            if not msg.private:
+                public_ids.add(msg.message_id)
+
+        return cls(
+            exact=MappingProxyType(exact),
+            prefixes=MappingProxyType(prefixes),
+            defaults=MappingProxyType(defaults),
+            public_ids=frozenset(public_ids),
+        )
+
+    def resolve(self, message_id, language):
+        """Return the best message for the language, or None."""
+        language = language.strip() or "en-US"
+        message = self.exact.get((message_id, language))
+        if message is None:
+            prefix = language.split("-")[0].lower()
+            message = self.prefixes.get((message_id, prefix)) or self.defaults.get(message_id)
+
+        return message
+
+
+@dataclass(frozen=True)
+class NewsletterRegistry:
+    """
+    An immutable snapshot of the newsletter data, held in process memory.
+
+    A snapshot is built once per version of the newsletter data and shared by
+    all threads of the process, so it must never be modified in place.
+    """
+
+    version: int | None
+    # newsletter slug -> Newsletter object
+    by_name: MappingProxyType
+    # newsletter vendor_id -> Newsletter object
+    by_vendor_id: MappingProxyType
+    # group slug -> tuple of newsletter slugs
+    groups: MappingProxyType
+    private_slugs: tuple
+    inactive_slugs: tuple
+    waitlist_slugs: tuple
+    and_group_slugs: tuple
+    languages: LanguageIndex
+    tx_messages: TxMessageTable
+
+
+# The current process-wide snapshot. Replaced wholesale, never mutated.
+_registry = None
+# Per-thread record of when the version was last checked during the current
+# request or job. Reset by the `request_started` and `task_started` signals.
+_local = threading.local()
+
+
+def _get_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        # Never set, or evicted. Seed it with the clock so a value seen before
+        # the eviction can't be reused by accident.
+        cache.add(VERSION_CACHE_KEY, time_ns(), timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+
+    return version
 
 
 def _newsletters():
-    """Returns a data structure with the data about newsletters.
-    It's cached until clear_newsletter_cache() is called, so we're
-    not constantly hitting the database for data that rarely changes.
-
-    The returned data structure looks like::
-
-        {
-            'by_name': {
-                'newsletter_name_1': a Newsletter object,
-                'newsletter_name_2': another Newsletter object,
-            },
-            'by_vendor_id': {
-                'NEWSLETTER_ID_1': a Newsletter object,
-                'NEWSLETTER_ID_2': another Newsletter object,
-            },
-            'groups': {
-                'group_slug': a list of newsletter slugs,
-                ...
-            }
-        }
-    """
-    data = cache.get(CACHE_KEY)
-    if data is None:
-        data = _get_newsletters_data()
-        data["groups"] = _get_newsletter_groups_data()
-        cache.set(CACHE_KEY, data)
-
-    return data
-
-
-def _get_newsletter_groups_data():
-    groups = NewsletterGroup.objects.filter(active=True)
-    return {nlg.slug: nlg.newsletter_slugs() for nlg in groups}
-
-
-def _get_newsletters_data():
+    """Returns a `NewsletterRegistry` with the data about newsletters.
+
+    The registry lives in process memory. The shared version counter in the
+    cache is checked once per request or job, and again every
+    NEWSLETTER_REGISTRY_CHECK_INTERVAL seconds for long-running loops outside
+    of them. The registry is only rebuilt from the database when that version
+    has changed, which happens when `clear_newsletter_cache()` is called.
+    """
+    global _registry
+
+    registry = _registry
+    checked_at = getattr(_local, "checked_at", None)
+    if registry is not None and checked_at is not None and monotonic() - checked_at < settings.NEWSLETTER_REGISTRY_CHECK_INTERVAL:
+        return registry
+
+    version = _get_version()
+    _local.checked_at = monotonic()
+    if registry is None or registry.version != version:
+        registry = _registry = _build_registry(version)
+        metrics.incr("news.newsletters.registry", tags=["action:rebuild"])
+
+    return registry
+
+
+def _build_registry(version):
     by_name = {}
     by_vendor_id = {}
     for nl in Newsletter.objects.all():
         by_name[nl.slug] = nl
         by_vendor_id[nl.vendor_id] = nl
 
-    return {
-        "by_name": by_name,
-        "by_vendor_id": by_vendor_id,
-    }
+    groups = {nlg.slug: tuple(nlg.newsletter_slugs()) for nlg in NewsletterGroup.objects.filter(active=True).prefetch_related("newsletters")}
+
+    tx_messages = list(BrazeTxEmailMessage.objects.all())
+
+    languages = set()
+    for nl in by_name.values():
+        languages.update(nl.language_list)
+    # include Tx email languages
+    languages.update(msg.language for msg in tx_messages)
+
+    return NewsletterRegistry(
+        version=version,
+        by_name=MappingProxyType(by_name),
+        by_vendor_id=MappingProxyType(by_vendor_id),
+        groups=MappingProxyType(groups),
+        private_slugs=tuple(nl.slug for nl in by_name.values() if nl.private),
+        inactive_slugs=tuple(nl.slug for nl in by_name.values() if not nl.active),
+        waitlist_slugs=tuple(nl.slug for nl in by_name.values() if nl.is_waitlist),
+        and_group_slugs=tuple(set(by_name) | set(groups)),
+        languages=LanguageIndex.from_languages(languages),
+        tx_messages=TxMessageTable.from_messages(tx_messages),
+    )
+
+
+def reset_newsletter_registry_check(*args, **kwargs):
+    """Make the next lookup in this thread re-check the shared version."""
+    _local.checked_at = None
 
 
 def newsletter_map():
-    by_name = _newsletters()["by_name"]
+    by_name = _newsletters().by_name
     return {name: nl.vendor_id for name, nl in by_name.items()}
 
 
@@ -82,7 +221,7 @@ def newsletter_inv_map():
 def newsletter_obj(slug):
     """Lookup the newsletter object for the given slug"""
     try:
-        return _newsletters()["by_name"][slug]
+        return _newsletters().by_name[slug]
     except KeyError:
         return None
 
@@ -90,7 +229,7 @@ def newsletter_obj(slug):
 def newsletter_field(name):
     """Lookup the backend-specific field (vendor ID) for the newsletter"""
     try:
-        return _newsletters()["by_name"][name].vendor_id
+        return _newsletters().by_name[name].vendor_id
     except KeyError:
         return None
 
@@ -98,7 +237,7 @@ def newsletter_field(name):
 def newsletter_name(field):
     """Lookup the generic name for this newsletter field"""
     try:
-        return _newsletters()["by_vendor_id"][field].slug
+        return _newsletters().by_vendor_id[field].slug
     except KeyError:
         return None
 
@@ -106,7 +245,7 @@ def newsletter_name(field):
 def newsletter_group_newsletter_slugs(name):
     """Return the newsletter slugs associated with a group."""
     try:
-        return _newsletters()["groups"][name]
+        return list(_newsletters().groups[name])
     except KeyError:
         return None
 
@@ -116,7 +255,7 @@ def newsletter_slugs():
     Get a list of all the available newsletters.
     Returns a list of their slugs.
     """
-    return list(_newsletters()["by_name"].keys())
+    return list(_newsletters().by_name)
 
 
 def newsletter_waitlist_slugs():
@@ -124,7 +263,7 @@ def newsletter_waitlist_slugs():
     Get a list of all waitlist newsletters.
     Returns a list of their slugs.
     """
-    return [nl.slug for nl in _newsletters()["by_name"].values() if nl.is_waitlist]
+    return list(_newsletters().waitlist_slugs)
 
 
 def newsletter_group_slugs():
@@ -132,40 +271,44 @@ def newsletter_group_slugs():
     Get a list of all the available newsletter groups.
     Returns a list of their slugs.
     """
-    # using get() in case old format cached
-    return list(_newsletters().get("groups", {}).keys())
+    return list(_newsletters().groups)
 
 
 def newsletter_and_group_slugs():
     """Return a list of all newsletter and group slugs."""
-    return list(set(newsletter_slugs()) | set(newsletter_group_slugs()))
+    return list(_newsletters().and_group_slugs)
 
 
 def newsletter_private_slugs():
     """Return a list of private newsletter ids"""
-    return [nl.slug for nl in _newsletters()["by_name"].values() if nl.private]
+    return list(_newsletters().private_slugs)
 
 
 def newsletter_inactive_slugs():
-    return [nl.slug for nl in _newsletters()["by_name"].values() if not nl.active]
+    return list(_newsletters().inactive_slugs)
 
 
 def slug_to_vendor_id(slug):
     """Given a newsletter's slug, return its vendor_id"""
-    return _newsletters()["by_name"][slug].vendor_id
+    return _newsletters().by_name[slug].vendor_id
 
 
 def vendor_id_to_slug(vendor_id):
     """Given a newsletter's vendor_id, return its slug"""
     try:
-        return _newsletters()["by_vendor_id"][vendor_id].slug
+        return _newsletters().by_vendor_id[vendor_id].slug
     except KeyError:
         return None
 
 
 def newsletter_fields():
     """Get a list of all the newsletter backend-specific fields"""
-    return list(_newsletters()["by_vendor_id"].keys())
+    return list(_newsletters().by_vendor_id)
+
+
+def newsletter_language_index():
+    """Return the `LanguageIndex` of the languages supported by newsletters."""
+    return _newsletters().languages
 
 
 def newsletter_languages():
@@ -173,14 +316,12 @@ def newsletter_languages():
     Return a set of the 2 or 5 char codes of all the languages
     supported by newsletters.
     """
-    lang_set = set()
-    for newsletter in _newsletters()["by_name"].values():
-        lang_set |= set(newsletter.language_list)
+    return newsletter_language_index().exact
 
-    # include Tx email languages
-    lang_set |= set(BrazeTxEmailMessage.objects.values_list("language", flat=True))
 
-    return lang_set
+def tx_message_table():
+    """Return the `TxMessageTable` for the Braze transactional messages."""
+    return _newsletters().tx_messages
 
 
 def newsletter_field_choices():
@@ -197,14 +338,32 @@ def is_supported_newsletter_language(code):
     Return True if the given language code is supported by any of the
     newsletters. (Only compares first two chars; case-insensitive.)
     """
-    return code[:2].lower() in [lang[:2].lower() for lang in newsletter_languages()]
+    return code[:2].lower() in newsletter_language_index().prefixes
 
 
 def clear_newsletter_cache(*args, **kwargs):
-    cache.delete(CACHE_KEY)
+    """
+    Invalidate the newsletter registry in every process.
+
+    Bumps the shared version so other processes rebuild on their next check,
+    and drops this process's snapshot so the change is visible right away.
+    """
+    global _registry
+
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        # The version key is missing, so any new value is a change.
+        cache.set(VERSION_CACHE_KEY, time_ns(), timeout=None)
+    _registry = None
 
 
 post_save.connect(clear_newsletter_cache, sender=Newsletter)
 post_delete.connect(clear_newsletter_cache, sender=Newsletter)
 post_save.connect(clear_newsletter_cache, sender=NewsletterGroup)
 post_delete.connect(clear_newsletter_cache, sender=NewsletterGroup)
+m2m_changed.connect(clear_newsletter_cache, sender=NewsletterGroup.newsletters.through)
+post_save.connect(clear_newsletter_cache, sender=BrazeTxEmailMessage)
+post_delete.connect(clear_newsletter_cache, sender=BrazeTxEmailMessage)
+request_started.connect(reset_newsletter_registry_check)
+task_started.connect(reset_newsletter_registry_check)
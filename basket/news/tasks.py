@@ -1,3 +1,5 @@
+import hashlib
+import json
 import logging
 from urllib.parse import urlencode
 
@@ -9,6 +11,7 @@ import sentry_sdk
 from basket import metrics
 from basket.base.decorators import rq_task
 from basket.base.exceptions import BasketError
+from basket.base.rq import QUEUE_BULK, QUEUE_INTERACTIVE, enqueue_batch
 from basket.base.utils import email_is_testing, is_valid_uuid
 from basket.news.backends.braze import (
     BRAZE_OPTIMAL_DELAY,
@@ -47,6 +50,91 @@ from basket.news.utils import (
 
 log = logging.getLogger(__name__)
 
+# How long the time of the last FxA event applied to an account is kept, in seconds.
+# Longer than the back-off of a rescheduled job (RQ_MAX_RETRY_DELAY).
+FXA_EVENT_TS_TTL = 48 * 60 * 60
+
+
+def fxa_uid(data, *args, **kwargs):
+    """Partition FxA events by account, so each account's events run in order."""
+    return data.get("uid")
+
+
+def coalesce_by_token(token, *args, use_braze_backend=False, **kwargs):
+    """Coalesce pending updates to the same contact, by token and backend."""
+    return f"{token}:{use_braze_backend}"
+
+
+def coalesce_by_fxa_id(data, use_braze_backend=False, **kwargs):
+    """Coalesce pending FxA events for the same account and backend."""
+    if not data.get("uid"):
+        return None
+    return f"{data['uid']}:{use_braze_backend}"
+
+
+def coalesce_fxa_login(data, use_braze_backend=False, **kwargs):
+    """Coalesce repeated logins to the same FxA account from the same campaign."""
+    if not data.get("uid"):
+        return None
+    campaign = data.get("metricsContext", {}).get("utm_campaign")
+    return f"{data['uid']}:{campaign}:{use_braze_backend}"
+
+
+def coalesce_identical(api_call_type, data, use_braze_backend=False, should_send_tx_messages=True, pre_generated_token=None):
+    """
+    Coalesce identical submissions, e.g. a form sent twice.
+
+    Each post gets its own pre-generated token, so the token isn't part of the
+    key. The first call's token is kept (see `first_call`).
+    """
+    submission = json.dumps([api_call_type, data, use_braze_backend, should_send_tx_messages], sort_keys=True)
+    return hashlib.sha256(submission.encode()).hexdigest()
+
+
+def merge_updates(calls):
+    """Merge pending `(token, data)` updates into one, with the latest value of each field."""
+    data = {}
+    for args, _kwargs in calls:
+        data.update(args[1])
+    args, kwargs = calls[-1]
+    return [args[0], data, *args[2:]], kwargs
+
+
+def first_call(calls):
+    """Keep the first of identical calls, e.g. for the token already given to the user."""
+    return calls[0]
+
+
+def latest_fxa_event(calls):
+    """Keep the call for the latest FxA event, by its timestamp."""
+    return max(calls, key=lambda call: call[0][0]["ts"])
+
+
+def fxa_event_applied_later(event_name, data):
+    """
+    Check if a later event of the same kind, or the account's deletion, was already applied.
+
+    Partitioned FxA events run in order, but a rescheduled job goes to the back
+    of its partition and coalesced events run in place of the first one, so an
+    older event can still run after a newer one.
+    """
+    ts = data.get("ts")
+    fxa_id = data.get("uid")
+    if not ts or not fxa_id:
+        return False
+    for name in dict.fromkeys([event_name, "fxa_delete"]):
+        prev_ts = float(cache.get(f"{name}:{fxa_id}", 0))
+        if prev_ts and prev_ts > ts:
+            metrics.incr("news.tasks.fxa_event_applied_later", tags=[f"event:{event_name}"])
+            return True
+    return False
+
+
+def record_fxa_event(event_name, data):
+    """Record the time of an FxA event applied to the account, for `fxa_event_applied_later()`."""
+    if data.get("ts") and data.get("uid"):
+        cache.set(f"{event_name}:{data['uid']}", data["ts"], FXA_EVENT_TS_TTL)
+
 
 def fxa_source_url(metrics):
     source_url = settings.FXA_REGISTER_SOURCE_URL
@@ -57,24 +145,21 @@ def fxa_source_url(metrics):
     return source_url
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_BULK, coalesce=coalesce_by_fxa_id, merge=latest_fxa_event, partition_by=fxa_uid)
 def fxa_email_changed(
     data,
     use_braze_backend=False,
     pre_generated_token=None,
     **kwargs,
 ):
-    ts = data["ts"]
     fxa_id = data["uid"]
     email = data["email"]
-    cache_key = f"fxa_email_changed:{fxa_id}"
-    prev_ts = float(cache.get(cache_key, 0))
-    if prev_ts and prev_ts > ts:
+    if fxa_event_applied_later("fxa_email_changed", data):
         # message older than our last update for this UID
         return
 
     # Update backend
-    user_data = get_user_data(fxa_id=fxa_id, extra_fields=["id", "email_id"], use_braze_backend=use_braze_backend)
+    user_data = get_user_data(fxa_id=fxa_id, extra_fields=["id", "email_id"], use_braze_backend=use_braze_backend, use_cache=False)
     if user_data:
         if use_braze_backend:
             braze.update(user_data, {"fxa_primary_email": email})
@@ -82,7 +167,7 @@ def fxa_email_changed(
             ctms.update(user_data, {"fxa_primary_email": email})
     else:
         # FxA record not found, try email
-        user_data = get_user_data(email=email, extra_fields=["id", "email_id"], use_braze_backend=use_braze_backend)
+        user_data = get_user_data(email=email, extra_fields=["id", "email_id"], use_braze_backend=use_braze_backend, use_cache=False)
         if user_data:
             if use_braze_backend:
                 braze.update(user_data, {"fxa_id": fxa_id, "fxa_primary_email": email})
@@ -107,7 +192,7 @@ def fxa_email_changed(
                 data["email_id"] = contact["email"]["email_id"]
             metrics.incr("news.tasks.fxa_email_changed.user_not_found")
 
-    cache.set(cache_key, ts, 7200)  # 2 hr
+    record_fxa_event("fxa_email_changed", data)
 
 
 def set_user_fxa_id(user_data, fxa_id, use_braze_backend=False):
@@ -133,12 +218,15 @@ def fxa_direct_update_contact(fxa_id, data, use_braze_backend=False):
         pass
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_BULK, partition_by=fxa_uid)
 def fxa_delete(data, use_braze_backend=False, **kwargs):
+    if fxa_event_applied_later("fxa_delete", data):
+        return
     fxa_direct_update_contact(data["uid"], {"fxa_deleted": True}, use_braze_backend)
+    record_fxa_event("fxa_delete", data)
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_BULK, partition_by=fxa_uid)
 def fxa_verified(
     data,
     use_braze_backend=False,
@@ -147,7 +235,7 @@ def fxa_verified(
 ):
     """Add new FxA users"""
     # if we're not using the sandbox ignore testing domains
-    if email_is_testing(data["email"]):
+    if email_is_testing(data["email"]) or fxa_event_applied_later("fxa_verified", data):
         return
 
     lang = get_best_language(get_accept_languages(data.get("locale")))
@@ -175,28 +263,30 @@ def fxa_verified(
     newsletters.append(settings.FXA_REGISTER_NEWSLETTER)
     new_data["newsletters"] = newsletters
 
-    user_data = get_fxa_user_data(fxa_id, email, use_braze_backend)
+    user_data = get_fxa_user_data(fxa_id, email, use_braze_backend, update_primary_email=False)
     # don't overwrite the user's language if already set
     if not (user_data and user_data.get("lang")):
         new_data["lang"] = lang
 
-    upsert_contact(
-        SUBSCRIBE,
+    upsert_fxa_contact(
         new_data,
         user_data,
         use_braze_backend=use_braze_backend,
         should_send_tx_messages=should_send_tx_messages,
         pre_generated_token=pre_generated_token,
     )
+    record_fxa_event("fxa_verified", data)
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_BULK, partition_by=fxa_uid)
 def fxa_newsletters_update(
     data,
     use_braze_backend=False,
     should_send_tx_messages=True,
     pre_generated_token=None,
 ):
+    if fxa_event_applied_later("fxa_newsletters_update", data):
+        return
     email = data["email"]
     fxa_id = data["uid"]
     new_data = {
@@ -208,17 +298,17 @@ def fxa_newsletters_update(
         "fxa_id": fxa_id,
         "optin": True,
     }
-    upsert_contact(
-        SUBSCRIBE,
+    upsert_fxa_contact(
         new_data,
-        get_fxa_user_data(fxa_id, email),
+        get_fxa_user_data(fxa_id, email, use_braze_backend, update_primary_email=False),
         use_braze_backend=use_braze_backend,
         should_send_tx_messages=should_send_tx_messages,
         pre_generated_token=pre_generated_token,
     )
+    record_fxa_event("fxa_newsletters_update", data)
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_BULK, coalesce=coalesce_fxa_login, partition_by=fxa_uid)
 def fxa_login(
     data,
     use_braze_backend=False,
@@ -227,27 +317,31 @@ def fxa_login(
 ):
     email = data["email"]
     # if we're not using the sandbox ignore testing domains
-    if email_is_testing(email):
+    if email_is_testing(email) or fxa_event_applied_later("fxa_login", data):
         return
 
     metrics_context = data.get("metricsContext", {})
     newsletter = settings.FXA_LOGIN_CAMPAIGNS.get(metrics_context.get("utm_campaign"))
     if newsletter:
-        upsert_user.delay(
+        new_data = {
+            "email": email,
+            "newsletters": newsletter,
+            "source_url": fxa_source_url(metrics_context),
+            "country": data.get("countryCode", ""),
+        }
+        # Subscribe in this job, finding the contact by email as `upsert_user` does.
+        upsert_contact(
             SUBSCRIBE,
-            {
-                "email": email,
-                "newsletters": newsletter,
-                "source_url": fxa_source_url(metrics_context),
-                "country": data.get("countryCode", ""),
-            },
+            new_data,
+            get_user_data(email=email, extra_fields=["id", "email_id"], use_braze_backend=use_braze_backend, use_cache=False),
             use_braze_backend=use_braze_backend,
             should_send_tx_messages=should_send_tx_messages,
             pre_generated_token=pre_generated_token,
         )
+        record_fxa_event("fxa_login", data)
 
 
-@rq_task
+@rq_task(coalesce=coalesce_by_token, merge=merge_updates)
 def update_user_meta(token, data, use_braze_backend=False):
     """Update a user's metadata, not newsletters"""
     if use_braze_backend:
@@ -259,7 +353,7 @@ def update_user_meta(token, data, use_braze_backend=False):
             raise
 
 
-@rq_task
+@rq_task(coalesce=coalesce_identical, merge=first_call)
 def upsert_user(
     api_call_type,
     data,
@@ -283,6 +377,7 @@ def upsert_user(
             email=data.get("email"),
             extra_fields=["id", "email_id"],
             use_braze_backend=use_braze_backend,
+            use_cache=False,
         ),
         use_braze_backend=use_braze_backend,
         should_send_tx_messages=should_send_tx_messages,
@@ -290,6 +385,41 @@ def upsert_user(
     )
 
 
+def upsert_fxa_contact(
+    new_data,
+    user_data,
+    use_braze_backend=False,
+    should_send_tx_messages=True,
+    pre_generated_token=None,
+):
+    """
+    Subscribe the contact for an FxA event with a single write.
+
+    If `user_data` was found by FxA ID but has another email than the event,
+    `fxa_primary_email` is set in the same update rather than on its own.
+    """
+    email = new_data["email"]
+    fix_up = {}
+    if user_data and user_data.get("email") not in (None, email):
+        fix_up["fxa_primary_email"] = email
+        new_data.update(fix_up)
+
+    token = upsert_contact(
+        SUBSCRIBE,
+        new_data,
+        user_data,
+        use_braze_backend=use_braze_backend,
+        should_send_tx_messages=should_send_tx_messages,
+        pre_generated_token=pre_generated_token,
+    )[0]
+    if fix_up and not token:
+        # There was nothing else to write, e.g. only transactional messages.
+        if use_braze_backend:
+            braze.update(user_data, fix_up)
+        else:
+            ctms.update(user_data, fix_up)
+
+
 def upsert_contact(
     api_call_type,
     data,
@@ -492,7 +622,7 @@ def ctms_add_or_update(update_data, user_data=None):
         ctms.add(update_data)
     except CTMSUniqueIDConflictError:
         # Try as an update
-        user_data = get_user_data(email=update_data["email"], extra_fields=["email_id"])
+        user_data = get_user_data(email=update_data["email"], extra_fields=["email_id"], use_cache=False)
         if not user_data:
             raise
         update_data.pop("token", None)
@@ -500,7 +630,7 @@ def ctms_add_or_update(update_data, user_data=None):
         ctms.update(user_data, update_data)
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_INTERACTIVE)
 def send_tx_message(email, message_id, language, user_data=None):
     metrics.incr("news.tasks.send_tx_message", tags=[f"message_id:{message_id}", f"language:{language}"])
     braze_tx.interface.track_user(email, event=f"send-{message_id}-{language}", user_data=user_data)
@@ -509,17 +639,18 @@ def send_tx_message(email, message_id, language, user_data=None):
 def send_tx_messages(email, lang, message_ids):
     sent = 0
     lang = lang.strip() or "en-US"
-    for mid in message_ids:
-        mid = settings.BRAZE_MESSAGE_ID_MAP.get(mid, mid)
-        txm = BrazeTxEmailMessage.objects.get_message(mid, lang)
-        if txm:
-            send_tx_message.delay(email, txm.message_id, txm.language)
-            sent += 1
+    with enqueue_batch():
+        for mid in message_ids:
+            mid = settings.BRAZE_MESSAGE_ID_MAP.get(mid, mid)
+            txm = BrazeTxEmailMessage.objects.get_message(mid, lang)
+            if txm:
+                send_tx_message.delay(email, txm.message_id, txm.language)
+                sent += 1
 
     return sent
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_INTERACTIVE)
 def send_confirm_message(email, token, lang, message_type):
     lang = lang.strip()
     lang = lang or "en-US"
@@ -529,7 +660,7 @@ def send_confirm_message(email, token, lang, message_type):
         send_tx_message(email, txm.message_id, txm.language, user_data={"basket_token": token, "email_id": token})
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_INTERACTIVE)
 def confirm_user(token, use_braze_backend=False, extra_metrics_tags=None):
     """
     Confirm any pending subscriptions for the user with this token.
@@ -551,6 +682,7 @@ def confirm_user(token, use_braze_backend=False, extra_metrics_tags=None):
         token=token,
         extra_fields=["email_id"],
         use_braze_backend=use_braze_backend,
+        use_cache=False,
     )
 
     if user_data is None:
@@ -570,7 +702,7 @@ def confirm_user(token, use_braze_backend=False, extra_metrics_tags=None):
         ctms.update(user_data, {"optin": True})
 
 
-@rq_task
+@rq_task(coalesce=coalesce_by_token)
 def update_custom_unsub(token, reason, use_braze_backend=False):
     """Record a user's custom unsubscribe reason."""
     try:
@@ -583,7 +715,7 @@ def update_custom_unsub(token, reason, use_braze_backend=False):
         pass
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_INTERACTIVE)
 def send_recovery_message(email, lang, token):
     message_id = "account-recovery"
     txm = BrazeTxEmailMessage.objects.get_message(message_id, lang)
@@ -592,12 +724,12 @@ def send_recovery_message(email, lang, token):
         send_tx_message(email, txm.message_id, txm.language, user_data=user_data)
 
 
-@rq_task
+@rq_task(queue_class=QUEUE_BULK)
 def record_common_voice_update(data):
     # do not change the sent data in place. A retry will use the changed data.
     dcopy = data.copy()
     email = dcopy.pop("email")
-    user_data = get_user_data(email=email, extra_fields=["id", "email_id"])
+    user_data = get_user_data(email=email, extra_fields=["id", "email_id"], use_cache=False)
     new_data = {
         "source_url": "https://voice.mozilla.org",
         "newsletters": [settings.COMMON_VOICE_NEWSLETTER],
@@ -650,7 +782,7 @@ def braze_assign_external_id(data):
 
     try:
         # If the user already has an external_id, there is nothing to do.
-        user = braze.get(email=email, token=basket_token, fxa_id=fxa_id)
+        user = braze.get(email=email, token=basket_token, fxa_id=fxa_id, use_cache=False)
         if user and user.get("email_id"):
             metrics.incr("news.tasks.braze_assign_external_id", tags=["status:already_assigned"])
             return
@@ -682,7 +814,10 @@ def braze_assign_external_id(data):
         # Enqueued with a delay (not inline): Braze needs time to propagate the just-assigned
         # external_id before alias/new can attach to it, otherwise it silently no-ops.
         if not basket_token:
-            assign_basket_token_alias_task.delay(external_id, enqueue_in=BRAZE_OPTIMAL_DELAY)
+            if braze.interface.alias_queue.enabled:
+                braze.interface.alias_queue.add(external_id, external_id, "basket_token")
+            else:
+                assign_basket_token_alias_task.delay(external_id, enqueue_in=BRAZE_OPTIMAL_DELAY)
 
         metrics.incr("news.tasks.braze_assign_external_id", tags=["status:assigned"])
     except NON_RETRYABLE_BRAZE_ERRORS as exc:
@@ -696,7 +831,7 @@ def braze_assign_external_id(data):
         metrics.incr("news.tasks.braze_assign_external_id", tags=["status:braze_client_error"])
 
 
-def get_fxa_user_data(fxa_id, email, use_braze_backend=False):
+def get_fxa_user_data(fxa_id, email, use_braze_backend=False, update_primary_email=True):
     """
     Return a user data dict, just like `get_user_data` below, but ensure we have
     a good FxA contact
@@ -706,14 +841,18 @@ def get_fxa_user_data(fxa_id, email, use_braze_backend=False):
     user's FxA_ID to "DUPE:<fxa_id>" so that we don't run into dupe issues, and
     set "fxa_deleted" to True. Then look up a user with the email address and
     return that or None.
+
+    With `update_primary_email` off, a user found by FxA ID with another email
+    isn't updated here: the caller writes `fxa_primary_email` along with its own
+    update (see `upsert_fxa_contact`).
     """
     user_data = None
     # try getting user data with the fxa_id first
-    user_data_fxa = get_user_data(fxa_id=fxa_id, extra_fields=["id", "email_id"], use_braze_backend=use_braze_backend)
+    user_data_fxa = get_user_data(fxa_id=fxa_id, extra_fields=["id", "email_id"], use_braze_backend=use_braze_backend, use_cache=False)
     if user_data_fxa:
         user_data = user_data_fxa
         # If email doesn't match, update FxA primary email field with the new email.
-        if user_data_fxa["email"] != email:
+        if update_primary_email and user_data_fxa["email"] != email:
             if use_braze_backend:
                 braze.update(user_data_fxa, {"fxa_primary_email": email})
             else:
@@ -721,6 +860,6 @@ def get_fxa_user_data(fxa_id, email, use_braze_backend=False):
 
     # if we still don't have user data try again with email this time
     if not user_data:
-        user_data = get_user_data(email=email, extra_fields=["id", "email_id"], use_braze_backend=use_braze_backend)
+        user_data = get_user_data(email=email, extra_fields=["id", "email_id"], use_braze_backend=use_braze_backend, use_cache=False)
 
     return user_data
@@ -72,6 +72,7 @@ class TestLookupUserAPI(_TestAPIwCTMSBase):
                 email="test@example.com",
                 fxa_id=None,
                 token=None,
+                use_cache=True,
             )
             data = resp.json()
             self.validate_schema(data, UserSchema)
@@ -89,6 +90,7 @@ class TestLookupUserAPI(_TestAPIwCTMSBase):
                 email="test@example.com",
                 fxa_id=None,
                 token=None,
+                use_cache=True,
             )
             data = resp.json()
             self.validate_schema(data, UserSchema)
@@ -106,6 +108,7 @@ class TestLookupUserAPI(_TestAPIwCTMSBase):
                 email=None,
                 fxa_id=None,
                 token=self.token,
+                use_cache=False,
             )
             data = resp.json()
             self.validate_schema(data, UserSchema)
@@ -123,6 +126,7 @@ class TestLookupUserAPI(_TestAPIwCTMSBase):
                 email=None,
                 fxa_id=None,
                 token=self.token,
+                use_cache=True,
             )
             data = resp.json()
             self.validate_schema(data, UserSchema)
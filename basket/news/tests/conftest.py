@@ -1,7 +1,18 @@
 import os
 
+import pytest
+
+from basket.news.newsletters import clear_newsletter_cache
+
 
 # This seems to be needed in tests since each reverse of a URL triggers another import or `urls.py`
 # which violates the django-ninja registry.
 def pytest_generate_tests(metafunc):
     os.environ["NINJA_SKIP_REGISTRY"] = "yes"
+
+
+@pytest.fixture(autouse=True)
+def reset_newsletter_registry():
+    # The newsletter registry lives in process memory, so it isn't rolled back
+    # with the test database. Start each test from a fresh one.
+    clear_newsletter_cache()
@@ -7,6 +7,7 @@ import fxa.constants
 import fxa.errors
 
 from basket.news.models import BlockedEmail
+from basket.news.newsletters import LanguageIndex
 from basket.news.utils import (
     email_block_list_cache,
     email_is_blocked,
@@ -192,8 +193,8 @@ class TestGetAcceptLanguages(TestCase):
 
     def setUp(self):
         patcher = patch(
-            "basket.news.utils.newsletter_languages",
-            return_value=["de", "en", "es", "fr", "id", "pt-BR", "ru", "pl", "hu"],
+            "basket.news.utils.newsletter_language_index",
+            return_value=LanguageIndex.from_languages(["de", "en", "es", "fr", "id", "pt-BR", "ru", "pl", "hu"]),
         )
         self.addCleanup(patcher.stop)
         patcher.start()
@@ -238,8 +239,8 @@ class TestGetAcceptLanguages(TestCase):
 class GetBestLanguageTests(TestCase):
     def setUp(self):
         patcher = patch(
-            "basket.news.utils.newsletter_languages",
-            return_value=["de", "en", "es", "fr", "id", "pt-BR", "ru", "pl", "hu"],
+            "basket.news.utils.newsletter_language_index",
+            return_value=LanguageIndex.from_languages(["de", "en", "es", "fr", "id", "pt-BR", "ru", "pl", "hu"]),
         )
         self.addCleanup(patcher.stop)
         patcher.start()
@@ -269,19 +270,21 @@ class GetBestLanguageTests(TestCase):
 class TestGetBestSupportedLang(TestCase):
     def setUp(self):
         patcher = patch(
-            "basket.news.utils.newsletter_languages",
-            return_value=[
-                "de",
-                "en",
-                "es",
-                "fr",
-                "id",
-                "pt",
-                "ru",
-                "pl",
-                "hu",
-                "zh-TW",
-            ],
+            "basket.news.utils.newsletter_language_index",
+            return_value=LanguageIndex.from_languages(
+                [
+                    "de",
+                    "en",
+                    "es",
+                    "fr",
+                    "id",
+                    "pt",
+                    "ru",
+                    "pl",
+                    "hu",
+                    "zh-TW",
+                ]
+            ),
         )
         self.addCleanup(patcher.stop)
         patcher.start()
@@ -1,14 +1,33 @@
+import json
+import threading
 from collections import namedtuple
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
 from unittest import mock
 
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
 from django.utils import timezone
 
 import pytest
 import requests_mock
 from freezegun import freeze_time
 
+from basket.base.exceptions import RateLimitExceeded
+from basket.base.rq import QUEUE_INTERACTIVE, get_queue_name, get_redis_connection, get_task_queue, transient_error, worker_job
 from basket.news.backends import braze
 from basket.news.backends.braze import Braze, optin_to_boolean
+from basket.news.models import FailedTask
+from basket.news.newsletters import LanguageIndex
+
+
+@pytest.fixture(autouse=True)
+def retry_sleep():
+    """Don't wait between retries of Braze requests."""
+    with mock.patch.object(braze.BrazeInterface._request.retry, "sleep") as mock_sleep:
+        yield mock_sleep
 
 
 @pytest.fixture
@@ -41,6 +60,56 @@ def test_braze_client_headers(braze_client):
         assert m.last_request.headers["Authorization"] == "Bearer test_api_key"
 
 
+@override_settings(BRAZE_HTTP_POOL_MAXSIZE=3)
+def test_braze_client_session(braze_client):
+    session = braze_client.session
+    assert braze_client.session is session
+    adapter = session.get_adapter("http://test.com/users/track")
+    assert isinstance(adapter, braze.BrazeHTTPAdapter)
+    assert adapter._pool_maxsize == 3
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/track", json={})
+        braze_client.track_user("test@test.com")
+        braze_client.track_user("test@test.com")
+        assert m.call_count == 2
+    assert braze_client.session is session
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def braze_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_braze_client_connection_metrics(braze_server, metricsmock):
+    braze_client = braze.BrazeInterface(braze_server, "test_api_key")
+    braze_client.track_user("test@test.com")
+    braze_client.track_user("test@test.com")
+    braze_client.track_user("test@test.com")
+    metricsmock.assert_incr_once("news.backends.braze.connection", tags=["status:created"])
+    assert len(metricsmock.filter_records("incr", stat="news.backends.braze.connection", tags=["status:reused"])) == 2
+
+
 def test_braze_track_user(braze_client):
     email = "test@test.com"
     expected = {
@@ -316,6 +385,302 @@ def test_braze_exception_500(braze_client):
         m.register_uri("POST", "http://test.com/users/track", status_code=500, json={})
         with pytest.raises(braze.BrazeInternalServerError):
             braze_client.track_user("test@test.com")
+        assert m.call_count == 3
+
+
+def test_braze_exception_500_retried(braze_client, retry_sleep):
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/track", [{"status_code": 500, "json": {}}, {"status_code": 201, "json": {}}])
+        braze_client.track_user("test@test.com")
+        assert m.call_count == 2
+    retry_sleep.assert_called_once_with(2)
+
+
+def test_braze_exception_429_in_worker_job(braze_client):
+    # Worker jobs are rescheduled instead of retrying in process.
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/track", status_code=429, headers={"Retry-After": "30"}, json={})
+        with worker_job(True), pytest.raises(braze.BrazeRateLimitError) as exc_info:
+            braze_client.track_user("test@test.com")
+        assert m.call_count == 1
+    assert transient_error(exc_info.value) == (True, 30)
+
+
+def test_braze_rate_limit(braze_client):
+    rate_limiter = braze_client.rate_limiters[braze.BrazeEndpoint.USERS_TRACK]
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/track", json={})
+        with (
+            mock.patch.object(rate_limiter, "acquire", side_effect=RateLimitExceeded(rate_limiter.name, 1)) as acquire,
+            pytest.raises(RateLimitExceeded),
+        ):
+            braze_client.track_user("test@test.com")
+        acquire.assert_called_once_with(settings.RATE_LIMIT_MAX_WAIT)
+        assert m.call_count == 0
+
+
+def test_braze_rate_limit_headers(braze_client):
+    rate_limiter = braze_client.rate_limiters[braze.BrazeEndpoint.USERS_TRACK]
+    with requests_mock.mock() as m, mock.patch.object(rate_limiter, "observe") as observe:
+        m.register_uri(
+            "POST",
+            "http://test.com/users/track",
+            status_code=429,
+            headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1704110460"},
+            json={},
+        )
+        with pytest.raises(braze.BrazeRateLimitError):
+            braze_client.track_user("test@test.com")
+    observe.assert_called_with(0, 1704110460.0)
+
+
+@pytest.fixture
+def track_buffer():
+    interface = braze.BrazeInterface("http://test.com", "test_api_key", name="test")
+    track_buffer = interface.track_buffer
+    redis = get_redis_connection()
+    redis.delete(track_buffer.key, track_buffer.lock_key, track_buffer.timer_key)
+    job = SimpleNamespace(id="job-id", meta={"task_name": "basket.news.tasks.send_tx_message"}, args=["test@example.com"], kwargs={})
+    with (
+        override_settings(BRAZE_TRACK_BATCHING=True),
+        mock.patch("basket.news.backends.braze.get_current_job", return_value=job),
+        mock.patch.object(track_buffer, "flush_task"),
+        worker_job(True),
+    ):
+        yield track_buffer
+    redis.delete(track_buffer.key, track_buffer.lock_key, track_buffer.timer_key)
+
+
+def track_data(n):
+    return {
+        "attributes": [{"external_id": str(n), "email": f"{n}@example.com"}],
+        "events": [{"external_id": str(n), "name": "send-test"}],
+    }
+
+
+def test_track_buffer_disabled_outside_worker_jobs(braze_client):
+    with override_settings(BRAZE_TRACK_BATCHING=True):
+        assert not braze_client.track_buffer.enabled
+        with worker_job(True):
+            assert braze_client.track_buffer.enabled
+
+
+def test_track_buffer_flush_queue():
+    assert braze.braze.interface.track_buffer.flush_task is braze.flush_track_buffer_task
+    # Transactional sends are flushed from the interactive queue.
+    assert braze.braze_tx.interface.track_buffer.flush_task is braze.flush_tx_track_buffer_task
+    assert get_task_queue("basket.news.backends.braze.flush_tx_track_buffer_task").name == get_queue_name(QUEUE_INTERACTIVE)
+
+
+def test_track_buffer_add(track_buffer):
+    with requests_mock.mock() as m:
+        track_buffer.interface.save_user(track_data(1))
+        track_buffer.interface.track_user("2@example.com", event="send-test")
+        assert m.call_count == 0
+
+    assert get_redis_connection().llen(track_buffer.key) == 2
+    # Only the first payload starts the flush timer.
+    track_buffer.flush_task.delay.assert_called_once_with("test", enqueue_in=timedelta(seconds=settings.BRAZE_TRACK_FLUSH_INTERVAL))
+
+
+def test_track_buffer_add_full_batch(track_buffer):
+    for n in range(75):
+        track_buffer.add(track_data(n))
+    track_buffer.flush_task.delay.assert_called_with("test")
+
+
+def test_track_buffer_flush(track_buffer, metricsmock):
+    for n in range(80):
+        track_buffer.add(track_data(n))
+
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/track", json={"message": "success"})
+        track_buffer.flush()
+
+    assert [len(request.json()["attributes"]) for request in m.request_history] == [75, 5]
+    assert [len(request.json()["events"]) for request in m.request_history] == [75, 5]
+    assert m.request_history[1].json()["attributes"][0]["external_id"] == "75"
+    assert get_redis_connection().llen(track_buffer.key) == 0
+    assert get_redis_connection().get(track_buffer.lock_key) is None
+    sent = metricsmock.filter_records("incr", stat="news.backends.braze.track_buffer", tags=["buffer:test", "action:sent"])
+    assert sum(record.value for record in sent) == 80
+
+
+def test_track_buffer_flush_locked(track_buffer):
+    track_buffer.add(track_data(1))
+    get_redis_connection().set(track_buffer.lock_key, 1)
+
+    with requests_mock.mock() as m:
+        track_buffer.flush()
+        assert m.call_count == 0
+
+    track_buffer.flush_task.delay.assert_called_with("test", enqueue_in=timedelta(seconds=settings.BRAZE_TRACK_FLUSH_INTERVAL))
+    assert get_redis_connection().llen(track_buffer.key) == 1
+
+
+@pytest.mark.django_db
+def test_track_buffer_flush_item_errors(track_buffer, metricsmock):
+    for n in range(3):
+        track_buffer.add(track_data(n))
+
+    error = {"type": "'external_id' is required", "input_array": "events", "index": 1}
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/track", status_code=201, json={"message": "success", "errors": [error]})
+        track_buffer.flush()
+
+    failed = FailedTask.objects.get()
+    assert failed.task_id == "job-id"
+    assert failed.name == "basket.news.tasks.send_tx_message"
+    assert failed.args == ["test@example.com"]
+    assert "external_id" in failed.exc
+    assert get_redis_connection().llen(track_buffer.key) == 0
+    metricsmock.assert_incr_once("base.tasks.failed", tags=["task:basket.news.tasks.send_tx_message"])
+
+
+@pytest.mark.django_db
+def test_track_buffer_flush_bad_request(track_buffer):
+    for n in range(3):
+        track_buffer.add(track_data(n))
+
+    def reject_bad_item(request, context):
+        # Braze rejects the whole request if one item is invalid.
+        if "1" in [attributes["external_id"] for attributes in request.json()["attributes"]]:
+            context.status_code = 400
+        return {"message": "success"}
+
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/track", json=reject_bad_item)
+        track_buffer.flush()
+
+    assert m.call_count == 4
+    assert FailedTask.objects.count() == 1
+    assert get_redis_connection().llen(track_buffer.key) == 0
+
+
+def test_track_buffer_flush_server_error(track_buffer):
+    track_buffer.add(track_data(1))
+
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/track", status_code=500, json={})
+        with pytest.raises(braze.BrazeInternalServerError):
+            track_buffer.flush()
+
+    # The payloads stay buffered for the rescheduled flush job.
+    assert get_redis_connection().llen(track_buffer.key) == 1
+    assert get_redis_connection().get(track_buffer.lock_key) is None
+
+
+@pytest.fixture
+def alias_queue():
+    interface = braze.BrazeInterface("http://test.com", "test_api_key", name="test")
+    alias_queue = interface.alias_queue
+    redis = get_redis_connection()
+    keys = redis.keys(f"{alias_queue.key_prefix}:*")
+    if keys:
+        redis.delete(*keys)
+    with (
+        override_settings(BRAZE_ALIAS_BATCHING=True),
+        mock.patch("basket.news.backends.braze.flush_alias_bucket_task") as flush_task,
+    ):
+        alias_queue.flush_task = flush_task
+        yield alias_queue
+    keys = redis.keys(f"{alias_queue.key_prefix}:*")
+    if keys:
+        redis.delete(*keys)
+
+
+@freeze_time("2024-01-01 12:00:30")
+def test_alias_queue_add(alias_queue):
+    bucket = int(timezone.now().timestamp()) + 330
+    with requests_mock.mock() as m:
+        for n in range(3):
+            alias_queue.add(str(n), str(n), "basket_token")
+        assert m.call_count == 0
+
+    assert get_redis_connection().llen(alias_queue.bucket_key(bucket)) == 3
+    # One flush job per bucket, due at the start of the first minute at least 5 minutes away.
+    alias_queue.flush_task.delay.assert_called_once_with("test", bucket, enqueue_in=timedelta(seconds=330))
+
+
+@mock.patch("basket.news.backends.braze.add_fxa_id_alias_task.delay")
+@mock.patch("basket.news.backends.braze.add_basket_token_alias_task.delay")
+def test_braze_add_alias_later(add_basket_token_alias, add_fxa_id_alias, braze_client):
+    braze_instance = Braze(braze_client)
+    braze_instance.add_alias_later("123", "fxa123", "fxa_id")
+    add_fxa_id_alias.assert_called_once_with("123", "fxa123", enqueue_in=braze.BRAZE_OPTIMAL_DELAY)
+
+    with override_settings(BRAZE_ALIAS_BATCHING=True), mock.patch.object(braze_client.alias_queue, "add") as add:
+        braze_instance.add_alias_later("123", "123", "basket_token")
+        add.assert_called_once_with("123", "123", "basket_token")
+    add_basket_token_alias.assert_not_called()
+
+
+def queue_aliases(alias_queue, bucket, n):
+    get_redis_connection().rpush(
+        alias_queue.bucket_key(bucket),
+        *[json.dumps({"external_id": str(i), "alias_name": f"fxa{i}", "alias_label": "fxa_id"}) for i in range(n)],
+    )
+
+
+def test_alias_queue_flush(alias_queue, metricsmock):
+    queue_aliases(alias_queue, 60, 60)
+    get_redis_connection().set(f"{alias_queue.bucket_key(60)}:scheduled", 1)
+
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/alias/new", json={"message": "success"})
+        alias_queue.flush(60)
+
+    assert [len(request.json()["user_aliases"]) for request in m.request_history] == [50, 10]
+    assert m.request_history[1].json()["user_aliases"][0] == {"external_id": "50", "alias_name": "fxa50", "alias_label": "fxa_id"}
+    assert get_redis_connection().exists(alias_queue.bucket_key(60), f"{alias_queue.bucket_key(60)}:scheduled") == 0
+    sent = metricsmock.filter_records("incr", stat="news.backends.braze.alias_queue", tags=["queue:test", "action:sent"])
+    assert sum(record.value for record in sent) == 60
+
+
+@pytest.mark.django_db
+def test_alias_queue_flush_item_errors(alias_queue):
+    queue_aliases(alias_queue, 60, 3)
+
+    error = {"type": "'alias_name' is invalid", "input_array": "user_aliases", "index": 1}
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/alias/new", status_code=201, json={"message": "success", "errors": [error]})
+        alias_queue.flush(60)
+
+    failed = FailedTask.objects.get()
+    assert failed.name == "basket.news.backends.braze.add_fxa_id_alias_task"
+    assert failed.args == ["1", "fxa1"]
+    assert "alias_name" in failed.exc
+
+
+@pytest.mark.django_db
+def test_alias_queue_flush_bad_request(alias_queue):
+    queue_aliases(alias_queue, 60, 3)
+
+    def reject_bad_alias(request, context):
+        # Braze rejects the whole request if one alias is invalid.
+        if "fxa1" in [alias["alias_name"] for alias in request.json()["user_aliases"]]:
+            context.status_code = 400
+        return {"message": "success"}
+
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/alias/new", json=reject_bad_alias)
+        alias_queue.flush(60)
+
+    assert m.call_count == 4
+    assert FailedTask.objects.get().args == ["1", "fxa1"]
+    assert get_redis_connection().llen(alias_queue.bucket_key(60)) == 0
+
+
+def test_alias_queue_flush_server_error(alias_queue):
+    queue_aliases(alias_queue, 60, 1)
+
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/alias/new", status_code=500, json={})
+        with pytest.raises(braze.BrazeInternalServerError):
+            alias_queue.flush(60)
+
+    # The aliases stay queued for the rescheduled flush job.
+    assert get_redis_connection().llen(alias_queue.bucket_key(60)) == 1
 
 
 mock_basket_user_data = {
@@ -378,16 +743,16 @@ mock_braze_user_subscription_groups = [
     {"id": "78fe6671-9f94-48bd-aaf3-7e873536c3e6", "status": "Unsubscribed"},
 ]
 
-mock_newsletters = {
-    "by_vendor_id": {
+mock_newsletters = SimpleNamespace(
+    by_vendor_id={
         "234c9b4a-1785-4cd5-b839-5dbc134982eb": namedtuple("Newsletter", ["slug"])("foo-news"),
         "78fe6671-9f94-48bd-aaf3-7e873536c3e6": namedtuple("Newsletter", ["slug"])("bar-news"),
     },
-    "by_name": {
+    by_name={
         "foo-news": namedtuple("Newsletter", ["vendor_id", "title"])("234c9b4a-1785-4cd5-b839-5dbc134982eb", "Foo News"),
         "bar-news": namedtuple("Newsletter", ["vendor_id", "title"])("78fe6671-9f94-48bd-aaf3-7e873536c3e6", "Bar News"),
     },
-}
+)
 
 
 @mock.patch(
@@ -418,8 +783,8 @@ def test_from_vendor_alias_only_user_returns_none(braze_client):
     return_value=mock_newsletters,
 )
 @mock.patch(
-    "basket.news.newsletters.newsletter_languages",
-    return_value=["en"],
+    "basket.news.newsletters.newsletter_language_index",
+    return_value=LanguageIndex.from_languages(["en"]),
 )
 def test_to_vendor_with_user_data_and_no_updates(mock_newsletter_languages, mock_newsletters, braze_client):
     braze_instance = Braze(braze_client)
@@ -465,8 +830,8 @@ def test_to_vendor_with_user_data_and_no_updates(mock_newsletter_languages, mock
     return_value=mock_newsletters,
 )
 @mock.patch(
-    "basket.news.newsletters.newsletter_languages",
-    return_value=["en"],
+    "basket.news.newsletters.newsletter_language_index",
+    return_value=LanguageIndex.from_languages(["en"]),
 )
 def test_to_vendor_with_updates_and_no_user_data(mock_newsletter_languages, mock_newsletters, braze_client):
     braze_instance = Braze(braze_client)
@@ -527,8 +892,8 @@ def test_to_vendor_throws_exception_for_missing_external_id(braze_client):
     return_value=mock_newsletters,
 )
 @mock.patch(
-    "basket.news.newsletters.newsletter_languages",
-    return_value=["en"],
+    "basket.news.newsletters.newsletter_language_index",
+    return_value=LanguageIndex.from_languages(["en"]),
 )
 def test_to_vendor_with_both_user_data_and_updates(mock_newsletter_languages, mock_newsletters, braze_client):
     braze_instance = Braze(braze_client)
@@ -593,8 +958,8 @@ def test_to_vendor_with_both_user_data_and_updates(mock_newsletter_languages, mo
     return_value=mock_newsletters,
 )
 @mock.patch(
-    "basket.news.newsletters.newsletter_languages",
-    return_value=["en"],
+    "basket.news.newsletters.newsletter_language_index",
+    return_value=LanguageIndex.from_languages(["en"]),
 )
 def test_to_vendor_with_events(mock_newsletters, braze_client):
     braze_instance = Braze(braze_client)
@@ -797,8 +1162,8 @@ def test_braze_add_with_fxa_id(add_fxa_id, mock_newsletters, braze_client):
     return_value=mock_newsletters,
 )
 @mock.patch(
-    "basket.news.newsletters.newsletter_languages",
-    return_value=["en"],
+    "basket.news.newsletters.newsletter_language_index",
+    return_value=LanguageIndex.from_languages(["en"]),
 )
 def test_braze_update(mock_newsletter_languages, mock_newsletters, braze_client):
     braze_instance = Braze(braze_client)
@@ -810,13 +1175,103 @@ def test_braze_update(mock_newsletter_languages, mock_newsletters, braze_client)
             assert m.last_request.json() == braze_instance.to_vendor(mock_basket_user_data, update_data)
 
 
+@override_settings(SUPPRESS_NOOP_WRITES=True)
+@mock.patch(
+    "basket.news.newsletters._newsletters",
+    return_value=mock_newsletters,
+)
+@mock.patch(
+    "basket.news.newsletters.newsletter_language_index",
+    return_value=LanguageIndex.from_languages(["en"]),
+)
+def test_braze_update_no_changes(mock_newsletter_languages, mock_newsletters, braze_client, metricsmock):
+    braze_instance = Braze(braze_client)
+    with requests_mock.mock() as m:
+        braze_instance.update(mock_basket_user_data, {"optin": True, "first_name": "Test"})
+        assert not m.called
+        metricsmock.assert_incr_once("news.backends.braze.writes_suppressed", tags=["result:skipped"])
+
+        # Newsletter events are always sent, with only the subscription groups that change.
+        m.register_uri("POST", "http://test.com/users/track", json={})
+        update_data = {"newsletters": {"foo-news": True, "bar-news": True}}
+        with freeze_time():
+            braze_instance.update(mock_basket_user_data, update_data)
+            expected = braze_instance.to_vendor(mock_basket_user_data, update_data)
+        assert m.last_request.json() == {
+            "attributes": [
+                {
+                    "external_id": "123",
+                    "update_timestamp": expected["attributes"][0]["update_timestamp"],
+                    "_update_existing_only": True,
+                    "subscription_groups": [
+                        {"subscription_group_id": "78fe6671-9f94-48bd-aaf3-7e873536c3e6", "subscription_state": "subscribed"},
+                    ],
+                }
+            ],
+            "events": expected["events"],
+        }
+        metricsmock.assert_incr_once("news.backends.braze.writes_suppressed", tags=["result:trimmed"])
+
+
+@mock.patch(
+    "basket.news.newsletters._newsletters",
+    return_value=mock_newsletters,
+)
+@mock.patch(
+    "basket.news.newsletters.newsletter_language_index",
+    return_value=LanguageIndex.from_languages(["en"]),
+)
+def test_braze_update_no_changes_not_suppressed(mock_newsletter_languages, mock_newsletters, braze_client):
+    braze_instance = Braze(braze_client)
+    with requests_mock.mock() as m:
+        m.register_uri("POST", "http://test.com/users/track", json={})
+        with freeze_time():
+            braze_instance.update(mock_basket_user_data, {"optin": True})
+            assert m.last_request.json() == braze_instance.to_vendor(mock_basket_user_data, {"optin": True})
+
+
+@override_settings(CONTACT_CACHE_TTL=60)
+@mock.patch(
+    "basket.news.newsletters._newsletters",
+    return_value=mock_newsletters,
+)
+@mock.patch(
+    "basket.news.newsletters.newsletter_language_index",
+    return_value=LanguageIndex.from_languages(["en"]),
+)
+def test_braze_get_cached(mock_newsletter_languages, mock_newsletters, braze_client, metricsmock):
+    cache.clear()
+    email = mock_braze_user_data["email"]
+    braze_instance = Braze(braze_client)
+    with requests_mock.mock() as m:
+        export = m.register_uri("POST", "http://test.com/users/export/ids", json={"users": [mock_braze_user_data]})
+        m.register_uri(
+            "GET", "http://test.com/subscription/user/status", json={"users": [{"subscription_groups": mock_braze_user_subscription_groups}]}
+        )
+        m.register_uri("POST", "http://test.com/users/track", json={})
+        assert braze_instance.get(email=email) == mock_basket_user_data
+        assert braze_instance.get(token=mock_basket_user_data["token"]) == mock_basket_user_data
+        assert export.call_count == 1
+        metricsmock.assert_incr_once("news.backends.braze.contact_cache", tags=["status:hit"])
+
+        # Writes invalidate the cached contact.
+        with freeze_time():
+            braze_instance.update(mock_basket_user_data, {"country": "CA"})
+        braze_instance.get(email=email)
+        assert export.call_count == 2
+
+        # Lookups that don't use the cache always call Braze.
+        braze_instance.get(email=email, use_cache=False)
+        assert export.call_count == 3
+
+
 @mock.patch(
     "basket.news.newsletters._newsletters",
     return_value=mock_newsletters,
 )
 @mock.patch(
-    "basket.news.newsletters.newsletter_languages",
-    return_value=["en"],
+    "basket.news.newsletters.newsletter_language_index",
+    return_value=LanguageIndex.from_languages(["en"]),
 )
 @mock.patch(
     "basket.news.backends.braze.add_fxa_id_alias_task.delay",
@@ -864,8 +1319,8 @@ def test_braze_delete(braze_client):
     return_value=mock_newsletters,
 )
 @mock.patch(
-    "basket.news.newsletters.newsletter_languages",
-    return_value=["en"],
+    "basket.news.newsletters.newsletter_language_index",
+    return_value=LanguageIndex.from_languages(["en"]),
 )
 def test_braze_update_by_fxa_id_for_existing_user(mock_newsletter_languages, mock_newsletters, braze_client):
     braze_instance = Braze(braze_client)
@@ -905,8 +1360,8 @@ def test_braze_update_by_fxa_id_user_not_found(braze_client):
     return_value=mock_newsletters,
 )
 @mock.patch(
-    "basket.news.newsletters.newsletter_languages",
-    return_value=["en"],
+    "basket.news.newsletters.newsletter_language_index",
+    return_value=LanguageIndex.from_languages(["en"]),
 )
 def test_braze_update_by_token_for_existing_user(mock_newsletter_languages, mock_newsletters, braze_client):
     braze_instance = Braze(braze_client)
@@ -22,6 +22,8 @@ class TestConfirmTask(TestCase):
         }
         get_user_data.return_value = user_data
         confirm_user(token)
+        # The contact is read from CTMS, not the contact cache, since it's written back.
+        get_user_data.assert_called_once_with(token=token, extra_fields=["email_id"], use_braze_backend=False, use_cache=False)
         ctms_mock.update.assert_called_with(user_data, {"optin": True})
 
     def test_already_confirmed(self, get_user_data, ctms_mock):
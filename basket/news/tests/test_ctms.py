@@ -1,8 +1,10 @@
 import json
 from copy import deepcopy
+from time import time
 from unittest.mock import ANY, DEFAULT, Mock, call, patch
 from uuid import uuid4
 
+from django.core.cache import cache
 from django.test import TestCase
 from django.test.utils import override_settings
 
@@ -24,6 +26,7 @@ from basket.news.backends.ctms import (
     from_vendor,
     to_vendor,
 )
+from basket.news.newsletters import LanguageIndex
 from basket.news.tests import mock_metrics
 
 # Sample CTMS response from documentation, April 2021
@@ -292,8 +295,8 @@ class ToVendorTests(TestCase):
 
     @override_settings(EXTRA_SUPPORTED_LANGS=["zh-hans", "zh-hant"])
     @patch(
-        "basket.news.newsletters.newsletter_languages",
-        return_value=["de", "en", "es", "fr", "zh-TW"],
+        "basket.news.newsletters.newsletter_language_index",
+        return_value=LanguageIndex.from_languages(["de", "en", "es", "fr", "zh-TW"]),
     )
     def test_lang(self, mock_languages):
         """lang is validated and added as email.email_lang"""
@@ -402,7 +405,7 @@ class ToVendorTests(TestCase):
             ],
         }
 
-    @patch("basket.news.newsletters.newsletter_languages", return_value=["en", "es"])
+    @patch("basket.news.newsletters.newsletter_language_index", return_value=LanguageIndex.from_languages(["en", "es"]))
     @patch(
         "basket.news.backends.ctms.newsletter_slugs",
         return_value=["slug1", "slug2", "slug3", "slug4"],
@@ -439,7 +442,7 @@ class ToVendorTests(TestCase):
             ],
         }
 
-    @patch("basket.news.newsletters.newsletter_languages", return_value=["en", "fr"])
+    @patch("basket.news.newsletters.newsletter_language_index", return_value=LanguageIndex.from_languages(["en", "fr"]))
     @patch("basket.news.backends.ctms.newsletter_slugs", return_value=["slug1"])
     def test_newsletter_list_with_defaults(self, mock_nl_slugs, mock_langs):
         """A newsletter list uses the default language"""
@@ -452,7 +455,7 @@ class ToVendorTests(TestCase):
             ],
         }
 
-    @patch("basket.news.newsletters.newsletter_languages", return_value=["en", "fr"])
+    @patch("basket.news.newsletters.newsletter_language_index", return_value=LanguageIndex.from_languages(["en", "fr"]))
     @patch("basket.news.backends.ctms.newsletter_slugs", return_value=["slug1"])
     def test_newsletter_list_with_defaults_override(self, mock_nl_slugs, mock_langs):
         """A newsletter list uses the updated data rather than the defaults"""
@@ -505,7 +508,7 @@ class ToVendorTests(TestCase):
             ],
         }
 
-    @patch("basket.news.newsletters.newsletter_languages", return_value=["en", "es"])
+    @patch("basket.news.newsletters.newsletter_language_index", return_value=LanguageIndex.from_languages(["en", "es"]))
     @patch(
         "basket.news.backends.ctms.newsletter_slugs",
         return_value=["slug1", "slug2", "slug3", "slug4"],
@@ -845,10 +848,21 @@ class CTMSSessionTests(TestCase):
         "access_token": "a.long.base64.string",
         "token_type": "bearer",
         "expires_in": 3600,
-        "expires_at": 1617144323.2891595,
+        "expires_at": 4102444800.0,
     }
 
-    @patch("basket.news.backends.ctms.cache", spec_set=("get", "set"))
+    @staticmethod
+    def cache_get(mock_cache, token):
+        """Make the mock cache return `token`, and the lock's current owner."""
+
+        def get(key):
+            if key == "ctms_token:lock":
+                return mock_cache.add.call_args.args[1]
+            return token
+
+        mock_cache.get.side_effect = get
+
+    @patch("basket.news.backends.ctms.cache", spec_set=("get", "set", "add", "delete"))
     @patch("basket.news.backends.ctms.OAuth2Session")
     @mock_metrics
     def test_get_with_new_auth(self, metricsmock, mock_oauth2_session, mock_cache):
@@ -860,15 +874,18 @@ class CTMSSessionTests(TestCase):
                 "mount",
                 "request",
                 "register_compliance_hook",
+                "token",
             ),
         )
         mock_session.authorized = False
         mock_session.fetch_token.return_value = self.EXAMPLE_TOKEN
+        mock_session.token = self.EXAMPLE_TOKEN
         mock_response = Mock(spec_set=("status_code",))
         mock_response.status_code = 200
         mock_session.request.return_value = mock_response
         mock_oauth2_session.return_value = mock_session
-        mock_cache.get.return_value = None
+        self.cache_get(mock_cache, None)
+        mock_cache.add.return_value = True
 
         session = CTMSSession("https://ctms.example.com", "id", "secret")
         resp = session.get("/ctms", params={"primary_email": "test@example.com"})
@@ -882,7 +899,8 @@ class CTMSSessionTests(TestCase):
             token_updater=ANY,
         )
         assert mock_session.register_compliance_hook.call_count == 2
-        mock_cache.get.assert_called_once_with("ctms_token")
+        mock_cache.get.assert_any_call("ctms_token")
+        mock_cache.add.assert_called_once_with("ctms_token:lock", ANY, timeout=60)
         mock_session.fetch_token.assert_called_once_with(
             client_id="id",
             client_secret="secret",
@@ -893,6 +911,7 @@ class CTMSSessionTests(TestCase):
             self.EXAMPLE_TOKEN,
             timeout=3420,
         )
+        mock_cache.delete.assert_called_once_with("ctms_token:lock")
         mock_session.request.assert_called_once_with(
             "GET",
             "https://ctms.example.com/ctms",
@@ -900,15 +919,17 @@ class CTMSSessionTests(TestCase):
         )
 
         metricsmock.assert_incr_once("news.backends.ctms.request", tags=["method:GET", "status_code:200"])
+        metricsmock.assert_incr_once("news.backends.ctms.token", tags=["action:fetched"])
 
     @patch("basket.news.backends.ctms.cache", spec_set=("get",))
     @patch("basket.news.backends.ctms.OAuth2Session")
     def test_get_with_existing_auth(self, mock_oauth2_session, mock_cache):
         """An existing OAuth2 token is reused without calling fetch_token."""
         mock_session = Mock(
-            spec_set=("authorized", "mount", "request", "register_compliance_hook"),
+            spec_set=("authorized", "mount", "request", "register_compliance_hook", "token"),
         )
         mock_session.authorized = True
+        mock_session.token = self.EXAMPLE_TOKEN
         mock_response = Mock(spec_set=("status_code",))
         mock_response.status_code = 200
         mock_session.request.return_value = mock_response
@@ -934,7 +955,7 @@ class CTMSSessionTests(TestCase):
             params={"primary_email": "test@example.com"},
         )
 
-    @patch("basket.news.backends.ctms.cache", spec_set=("get", "set"))
+    @patch("basket.news.backends.ctms.cache", spec_set=("get", "set", "add", "delete"))
     @patch("basket.news.backends.ctms.OAuth2Session")
     @mock_metrics
     def test_get_with_re_auth(self, metricsmock, mock_oauth2_session, mock_cache):
@@ -946,9 +967,11 @@ class CTMSSessionTests(TestCase):
                 "mount",
                 "request",
                 "register_compliance_hook",
+                "token",
             ),
         )
         mock_session.authorized = True
+        mock_session.token = self.EXAMPLE_TOKEN
         new_token = {
             "access_token": "a.different.base64.string",
             "token_type": "bearer",
@@ -962,7 +985,8 @@ class CTMSSessionTests(TestCase):
         mock_response_2.status_code = 200
         mock_session.request.side_effect = [mock_response_1, mock_response_2]
         mock_oauth2_session.return_value = mock_session
-        mock_cache.get.return_value = self.EXAMPLE_TOKEN
+        self.cache_get(mock_cache, self.EXAMPLE_TOKEN)
+        mock_cache.add.return_value = True
 
         session = CTMSSession("https://ctms.example.com", "id", "secret")
         resp = session.get("/ctms", params={"primary_email": "test@example.com"})
@@ -970,7 +994,7 @@ class CTMSSessionTests(TestCase):
 
         mock_oauth2_session.assert_called_once()
         assert mock_session.register_compliance_hook.call_count == 2
-        mock_cache.get.assert_called_once_with("ctms_token")
+        mock_cache.get.assert_any_call("ctms_token")
         mock_session.fetch_token.assert_called_once_with(
             client_id="id",
             client_secret="secret",
@@ -985,10 +1009,10 @@ class CTMSSessionTests(TestCase):
         assert mock_session.request.call_count == 2
 
         metricsmock.assert_incr_once("news.backends.ctms.request", tags=["method:GET", "status_code:401"])
-        metricsmock.assert_incr_once("news.backends.ctms.session_refresh")
+        metricsmock.assert_incr_once("news.backends.ctms.session_refresh", tags=["reason:unauthorized"])
         metricsmock.assert_incr_once("news.backends.ctms.request", tags=["method:GET", "status_code:200"])
 
-    @patch("basket.news.backends.ctms.cache", spec_set=("get",))
+    @patch("basket.news.backends.ctms.cache", spec_set=("get", "add", "delete"))
     @patch("basket.news.backends.ctms.OAuth2Session")
     def test_get_with_failed_auth(self, mock_oauth2_session, mock_cache):
         """A new OAuth2 token is fetched on an auth error."""
@@ -1002,7 +1026,8 @@ class CTMSSessionTests(TestCase):
         err = HTTPError(response=err_resp)
         mock_session.fetch_token.side_effect = err
         mock_oauth2_session.return_value = mock_session
-        mock_cache.get.return_value = None
+        self.cache_get(mock_cache, None)
+        mock_cache.add.return_value = True
 
         session = CTMSSession("https://ctms.example.com", "id", "secret")
         with self.assertRaises(HTTPError) as context:
@@ -1011,12 +1036,122 @@ class CTMSSessionTests(TestCase):
 
         mock_oauth2_session.assert_called_once()
         assert mock_session.register_compliance_hook.call_count == 2
-        mock_cache.get.assert_called_once_with("ctms_token")
+        mock_cache.get.assert_any_call("ctms_token")
         mock_session.fetch_token.assert_called_once_with(
             client_id="id",
             client_secret="secret",
             token_url="https://ctms.example.com/token",
         )
+        # The lock is released even when fetching the token fails.
+        mock_cache.delete.assert_called_once_with("ctms_token:lock")
+
+    @patch("basket.news.backends.ctms.sleep")
+    @patch("basket.news.backends.ctms.cache", spec_set=("get", "add"))
+    @patch("basket.news.backends.ctms.OAuth2Session")
+    @mock_metrics
+    def test_get_with_token_from_other_process(self, metricsmock, mock_oauth2_session, mock_cache, mock_sleep):
+        """While another process holds the lock, we wait and reuse the token it saves."""
+        mock_session = Mock(
+            spec_set=("authorized", "fetch_token", "mount", "request", "register_compliance_hook", "token"),
+        )
+        mock_session.authorized = False
+        mock_session.token = self.EXAMPLE_TOKEN
+        mock_response = Mock(spec_set=("status_code",))
+        mock_response.status_code = 200
+        mock_session.request.return_value = mock_response
+        mock_oauth2_session.return_value = mock_session
+        mock_cache.get.side_effect = [None, None, None, self.EXAMPLE_TOKEN]
+        mock_cache.add.return_value = False
+
+        session = CTMSSession("https://ctms.example.com", "id", "secret")
+        assert session.get("/ctms", params={"primary_email": "test@example.com"}) == mock_response
+
+        mock_session.fetch_token.assert_not_called()
+        assert mock_cache.add.call_count == 2
+        assert mock_sleep.call_count == 2
+        metricsmock.assert_incr_once("news.backends.ctms.token", tags=["action:reused"])
+
+    @override_settings(CTMS_TOKEN_LOCK_WAIT=0)
+    @patch("basket.news.backends.ctms.cache", spec_set=("get", "set", "add"))
+    @patch("basket.news.backends.ctms.OAuth2Session")
+    @mock_metrics
+    def test_get_with_lock_timeout(self, metricsmock, mock_oauth2_session, mock_cache):
+        """If the lock holder doesn't save a token in time, we fetch our own."""
+        mock_session = Mock(
+            spec_set=("authorized", "fetch_token", "mount", "request", "register_compliance_hook", "token"),
+        )
+        mock_session.authorized = False
+        mock_session.fetch_token.return_value = self.EXAMPLE_TOKEN
+        mock_session.token = self.EXAMPLE_TOKEN
+        mock_session.request.return_value = Mock(status_code=200)
+        mock_oauth2_session.return_value = mock_session
+        mock_cache.get.return_value = None
+        mock_cache.add.return_value = False
+
+        session = CTMSSession("https://ctms.example.com", "id", "secret")
+        session.get("/ctms", params={"primary_email": "test@example.com"})
+
+        mock_session.fetch_token.assert_called_once()
+        metricsmock.assert_incr_once("news.backends.ctms.token", tags=["action:lock_timeout"])
+        metricsmock.assert_incr_once("news.backends.ctms.token", tags=["action:fetched"])
+
+    @patch("basket.news.backends.ctms.cache", spec_set=("get", "set", "add", "delete"))
+    @patch("basket.news.backends.ctms.OAuth2Session")
+    @mock_metrics
+    def test_get_with_expiring_token(self, metricsmock, mock_oauth2_session, mock_cache):
+        """A token about to expire is refreshed before the request is sent."""
+        expiring_token = self.EXAMPLE_TOKEN | {"expires_at": time() + 10}
+        mock_session = Mock(
+            spec_set=("authorized", "fetch_token", "mount", "request", "register_compliance_hook", "token"),
+        )
+        mock_session.authorized = True
+        mock_session.fetch_token.return_value = self.EXAMPLE_TOKEN
+        mock_session.token = expiring_token
+        mock_response = Mock(spec_set=("status_code",))
+        mock_response.status_code = 200
+        mock_session.request.return_value = mock_response
+        mock_oauth2_session.return_value = mock_session
+        self.cache_get(mock_cache, expiring_token)
+        mock_cache.add.return_value = True
+
+        session = CTMSSession("https://ctms.example.com", "id", "secret")
+        assert session.get("/ctms", params={"primary_email": "test@example.com"}) == mock_response
+
+        mock_session.fetch_token.assert_called_once()
+        mock_session.request.assert_called_once()
+        metricsmock.assert_incr_once("news.backends.ctms.session_refresh", tags=["reason:expiring"])
+
+    @patch("basket.news.backends.ctms.cache", spec_set=("get", "set", "add", "delete"))
+    @patch("basket.news.backends.ctms.OAuth2Session")
+    def test_get_with_lock_taken_over(self, mock_oauth2_session, mock_cache):
+        """The lock isn't released if it timed out and another process holds it now."""
+        mock_session = Mock(
+            spec_set=("authorized", "fetch_token", "mount", "request", "register_compliance_hook", "token"),
+        )
+        mock_session.authorized = False
+        mock_session.fetch_token.return_value = self.EXAMPLE_TOKEN
+        mock_session.token = self.EXAMPLE_TOKEN
+        mock_session.request.return_value = Mock(status_code=200)
+        mock_oauth2_session.return_value = mock_session
+        mock_cache.get.side_effect = lambda key: "other-owner" if key == "ctms_token:lock" else None
+        mock_cache.add.return_value = True
+
+        session = CTMSSession("https://ctms.example.com", "id", "secret")
+        session.get("/ctms", params={"primary_email": "test@example.com"})
+
+        mock_session.fetch_token.assert_called_once()
+        mock_cache.delete.assert_not_called()
+
+    def test_expires_soon(self):
+        """A token is refreshed CTMS_TOKEN_REFRESH_MARGIN seconds, or half its lifetime, before it expires."""
+        now = time()
+        assert not CTMSSession._expires_soon(None)
+        assert not CTMSSession._expires_soon(self.EXAMPLE_TOKEN | {"expires_at": now + 300})
+        assert CTMSSession._expires_soon(self.EXAMPLE_TOKEN | {"expires_at": now + 100})
+        # A freshly fetched short-lived token isn't expiring soon.
+        short_token = {"access_token": "a.short.lived.token", "expires_in": 60, "expires_at": now + 60}
+        assert not CTMSSession._expires_soon(short_token)
+        assert CTMSSession._expires_soon(short_token | {"expires_at": now + 20})
 
     def test_init_bad_parameter(self):
         """CTMSSession() fails if parameters are bad."""
@@ -1447,6 +1582,76 @@ class CTMSTests(TestCase):
             [call(amo_user_id="amo-456"), call(sfdc_id="sfdc-456")],
         )
 
+    @override_settings(CTMS_CONCURRENT_LOOKUPS=True)
+    def test_get_by_several_ids_concurrent_none_then_one(self):
+        """With concurrent lookups, all alt IDs are looked up and the hit is returned."""
+        results = {
+            "basket_token": [],
+            "email_id": [],
+            "primary_email": [self.TEST_CTMS_CONTACT],
+        }
+        interface = Mock(spec_set=["get_by_alternate_id"])
+        interface.get_by_alternate_id.side_effect = lambda **params: results[next(iter(params))]
+        ctms = CTMS(interface)
+        user_data = ctms.get(token="some-token", email="some-email@example.com")
+        assert user_data == self.TEST_BASKET_FORMAT
+        interface.get_by_alternate_id.assert_has_calls(
+            [
+                call(basket_token="some-token"),
+                call(email_id="some-token"),
+                call(primary_email="some-email@example.com"),
+            ],
+            any_order=True,
+        )
+
+    @override_settings(CTMS_CONCURRENT_LOOKUPS=True)
+    def test_get_by_several_ids_concurrent_precedence(self):
+        """With concurrent lookups, the first alt ID with one contact wins."""
+        other_contact = deepcopy(self.TEST_CTMS_CONTACT)
+        other_contact["email"]["email_id"] = "other-ctms-uuid"
+        results = {
+            "fxa_id": [{"contact": 1}, {"contact": 2}],
+            "amo_user_id": [self.TEST_CTMS_CONTACT],
+            "sfdc_id": [other_contact],
+        }
+        interface = Mock(spec_set=["get_by_alternate_id"])
+        interface.get_by_alternate_id.side_effect = lambda **params: results[next(iter(params))]
+        ctms = CTMS(interface)
+        user_data = ctms.get(fxa_id="fxa-123", sfdc_id="sfdc-123", amo_id="amo-123")
+        assert user_data == self.TEST_BASKET_FORMAT
+
+    @override_settings(CTMS_CONCURRENT_LOOKUPS=True)
+    def test_get_by_several_ids_concurrent_mult_then_none(self):
+        """With concurrent lookups, multiple contacts for the first alt ID still raise."""
+        results = {
+            "amo_user_id": [{"contact": 1}, {"contact": 2}],
+            "sfdc_id": [],
+        }
+        interface = Mock(spec_set=["get_by_alternate_id"])
+        interface.get_by_alternate_id.side_effect = lambda **params: results[next(iter(params))]
+        ctms = CTMS(interface)
+        self.assertRaises(
+            CTMSMultipleContactsError,
+            ctms.get,
+            sfdc_id="sfdc-456",
+            amo_id="amo-456",
+        )
+
+    @override_settings(CTMS_CONCURRENT_LOOKUPS=True)
+    def test_get_by_several_ids_concurrent_later_error(self):
+        """With concurrent lookups, errors from lower precedence alt IDs are ignored after a hit."""
+
+        def get_by_alternate_id(**params):
+            if "primary_email" in params:
+                raise HTTPError("boom")
+            return [self.TEST_CTMS_CONTACT] if "basket_token" in params else []
+
+        interface = Mock(spec_set=["get_by_alternate_id"])
+        interface.get_by_alternate_id.side_effect = get_by_alternate_id
+        ctms = CTMS(interface)
+        user_data = ctms.get(token="some-token", email="some-email@example.com")
+        assert user_data == self.TEST_BASKET_FORMAT
+
     def test_get_no_ids(self):
         """RuntimeError is raised if all IDs are None."""
         ctms = CTMS("interface should not be called")
@@ -1499,6 +1704,90 @@ class CTMSTests(TestCase):
         )
         metricsmock.assert_timing_once("news.backends.ctms.timing", tags=["fn:patch_by_email_id"])
 
+    @override_settings(SUPPRESS_NOOP_WRITES=True)
+    @patch("basket.news.backends.ctms.newsletter_slugs", return_value=["mozilla-foundation"])
+    @patch("basket.news.backends.ctms.newsletter_waitlist_slugs", return_value=[])
+    @mock_metrics
+    def test_update_no_changes(self, metricsmock, mock_waitlist_slugs, mock_slugs):
+        """CTMS.update skips the PATCH when nothing would change."""
+        interface = Mock(spec_set=["patch_by_email_id"])
+        ctms = CTMS(interface)
+        user_data = {
+            "email_id": "an-existing-id",
+            "first_name": "Jane",
+            "optin": True,
+            "newsletters": ["mozilla-foundation"],
+        }
+        update_data = {"first_name": "Jane", "optin": True, "newsletters": {"mozilla-foundation": True}}
+        assert ctms.update(user_data, update_data) is None
+        interface.patch_by_email_id.assert_not_called()
+        metricsmock.assert_incr_once("news.backends.ctms.writes_suppressed", tags=["result:skipped"])
+
+    @override_settings(SUPPRESS_NOOP_WRITES=True)
+    @patch(
+        "basket.news.backends.ctms.newsletter_slugs",
+        return_value=["mozilla-foundation", "common-voice", "firefox-welcome"],
+    )
+    @patch("basket.news.backends.ctms.newsletter_waitlist_slugs", return_value=[])
+    @mock_metrics
+    def test_update_trims_unchanged(self, metricsmock, mock_waitlist_slugs, mock_slugs):
+        """CTMS.update only sends the fields that change."""
+        interface = Mock(spec_set=["patch_by_email_id"])
+        ctms = CTMS(interface)
+        user_data = {
+            "email_id": "an-existing-id",
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "newsletters": ["mozilla-foundation"],
+        }
+        update_data = {
+            "first_name": "Jane",
+            "last_name": "Smith",
+            "newsletters": {"mozilla-foundation": True, "common-voice": False, "firefox-welcome": True},
+        }
+        ctms.update(user_data, update_data)
+        interface.patch_by_email_id.assert_called_once_with(
+            "an-existing-id",
+            {
+                "email": {"last_name": "Smith"},
+                "newsletters": [{"name": "firefox-welcome", "subscribed": True}],
+            },
+        )
+        metricsmock.assert_incr_once("news.backends.ctms.writes_suppressed", tags=["result:trimmed"])
+
+    @override_settings(SUPPRESS_NOOP_WRITES=True)
+    @patch("basket.news.newsletters.newsletter_language_index", return_value=LanguageIndex.from_languages(["en", "fr"]))
+    @patch("basket.news.backends.ctms.newsletter_slugs", return_value=["mozilla-foundation"])
+    @patch("basket.news.backends.ctms.newsletter_waitlist_slugs", return_value=[])
+    def test_update_resubscribe_with_lang_not_trimmed(self, mock_waitlist_slugs, mock_slugs, mock_langs):
+        """CTMS.update sends re-subscriptions that carry per-newsletter data it can't compare."""
+        interface = Mock(spec_set=["patch_by_email_id"])
+        ctms = CTMS(interface)
+        user_data = {"email_id": "an-existing-id", "lang": "en", "newsletters": ["mozilla-foundation"]}
+        update_data = {"lang": "en", "source_url": "https://example.com", "newsletters": {"mozilla-foundation": True}}
+        ctms.update(user_data, update_data)
+        interface.patch_by_email_id.assert_called_once_with(
+            "an-existing-id",
+            {"newsletters": [{"name": "mozilla-foundation", "subscribed": True, "lang": "en", "source": "https://example.com"}]},
+        )
+
+    @override_settings(SUPPRESS_NOOP_WRITES=True, CONTACT_CACHE_TTL=60)
+    def test_update_no_changes_not_suppressed_with_cache(self):
+        """CTMS.update doesn't trust existing data that may come from the contact cache."""
+        interface = Mock(spec_set=["patch_by_email_id"])
+        ctms = CTMS(interface)
+        user_data = {"email_id": "an-existing-id", "first_name": "Jane"}
+        ctms.update(user_data, {"first_name": "Jane"})
+        interface.patch_by_email_id.assert_called_once_with("an-existing-id", {"email": {"first_name": "Jane"}})
+
+    def test_update_no_changes_not_suppressed(self):
+        """CTMS.update sends every update unless SUPPRESS_NOOP_WRITES is on."""
+        interface = Mock(spec_set=["patch_by_email_id"])
+        ctms = CTMS(interface)
+        user_data = {"email_id": "an-existing-id", "first_name": "Jane"}
+        ctms.update(user_data, {"first_name": "Jane"})
+        interface.patch_by_email_id.assert_called_once_with("an-existing-id", {"email": {"first_name": "Jane"}})
+
     def test_update_email_id_not_in_existing_data(self):
         """
         CTMS.update requires an email_id in existing data.
@@ -1509,7 +1798,7 @@ class CTMSTests(TestCase):
         with self.assertRaises(CTMSNotFoundByEmailIDError):
             ctms.update(user_data, update_data)
 
-    @patch("basket.news.newsletters.newsletter_languages", return_value=["en", "fr"])
+    @patch("basket.news.newsletters.newsletter_language_index", return_value=LanguageIndex.from_languages(["en", "fr"]))
     @patch("basket.news.backends.ctms.newsletter_slugs", return_value=["slug1"])
     def test_update_use_existing_lang(self, mock_slugs, mock_langs):
         """CTMS.update uses the existing language"""
@@ -1592,3 +1881,73 @@ class CTMSTests(TestCase):
         resp = ctms.delete(email=email)
         assert resp == identity
         interface.delete_by_email.assert_called_once_with(email)
+
+
+@override_settings(CONTACT_CACHE_TTL=60)
+class CTMSContactCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.interface = Mock(spec_set=["get_by_alternate_id", "patch_by_email_id"])
+        self.interface.get_by_alternate_id.return_value = [CTMSTests.TEST_CTMS_CONTACT]
+        self.ctms = CTMS(self.interface)
+
+    @mock_metrics
+    def test_get_cached(self, metricsmock):
+        """A contact is cached under each of its IDs."""
+        assert self.ctms.get(token="token") == CTMSTests.TEST_BASKET_FORMAT
+        assert self.ctms.get(token="token") == CTMSTests.TEST_BASKET_FORMAT
+        assert self.ctms.get(email="basket@example.com") == CTMSTests.TEST_BASKET_FORMAT
+        assert self.ctms.get(fxa_id="fxa-id") == CTMSTests.TEST_BASKET_FORMAT
+        self.interface.get_by_alternate_id.assert_called_once_with(basket_token="token")
+        metricsmock.assert_incr_once("news.backends.ctms.contact_cache", tags=["status:miss"])
+        assert len(metricsmock.filter_records("incr", stat="news.backends.ctms.contact_cache", tags=["status:hit"])) == 3
+
+    def test_get_uncacheable_ids(self):
+        """Lookups by IDs that are not cached always call CTMS."""
+        self.ctms.get(token="token")
+        self.ctms.get(token="token", amo_id="amo-id")
+        assert self.interface.get_by_alternate_id.call_count == 2
+
+    def test_get_no_cache(self):
+        """Lookups with use_cache=False neither read nor populate the cache."""
+        self.ctms.get(token="token", use_cache=False)
+        self.ctms.get(token="token")
+        self.ctms.get(token="token", use_cache=False)
+        assert self.interface.get_by_alternate_id.call_count == 3
+
+    @mock_metrics
+    def test_get_invalidated_during_read(self, metricsmock):
+        """A contact read while a write invalidates it isn't kept in the cache."""
+
+        def read_then_write(**alt_id):
+            self.ctms.contact_cache.invalidate(CTMSTests.TEST_BASKET_FORMAT)
+            return [CTMSTests.TEST_CTMS_CONTACT]
+
+        self.interface.get_by_alternate_id.side_effect = read_then_write
+        self.ctms.get(token="token")
+        self.interface.get_by_alternate_id.side_effect = None
+        self.ctms.get(token="token")
+        self.ctms.get(token="token")
+        assert self.interface.get_by_alternate_id.call_count == 2
+        metricsmock.assert_incr_once("news.backends.ctms.contact_cache", tags=["status:discarded"])
+
+    @override_settings(CONTACT_CACHE_TTL=0)
+    def test_get_disabled(self):
+        self.ctms.get(token="token")
+        self.ctms.get(token="token")
+        assert self.interface.get_by_alternate_id.call_count == 2
+
+    def test_update_invalidates(self):
+        """Updating a contact removes it from the cache under all of its IDs."""
+        existing = self.ctms.get(token="token")
+        self.ctms.update(existing, {"first_name": "Jane"})
+        self.ctms.get(token="token")
+        self.ctms.get(email="basket@example.com")
+        assert self.interface.get_by_alternate_id.call_count == 2
+
+    def test_update_by_alt_id_reads_backend(self):
+        """Updates by alternate ID start from the contact in CTMS, not the cached copy."""
+        self.ctms.get(token="token")
+        self.ctms.update_by_alt_id("token", "token", {"first_name": "Jane"})
+        assert self.interface.get_by_alternate_id.call_count == 2
+        self.interface.patch_by_email_id.assert_called_once()
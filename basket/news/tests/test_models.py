@@ -1,12 +1,19 @@
+import json
 from unittest.mock import patch
 
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.db.models import QuerySet
 from django.test import TestCase
 from django.test.utils import override_settings
 
 import pytest
 
+from basket.base.maintenance import STREAM_KEY, capture_task
+from basket.base.rq import get_redis_connection
 from basket.base.utils import is_valid_uuid
 from basket.news import models
+from basket.news.management.commands.process_maintenance_queue import CHECKPOINT_KEY
 
 
 class BrazeTxEmailTests(TestCase):
@@ -48,6 +55,32 @@ class BrazeTxEmailTests(TestCase):
             "en",
         )
 
+    def test_get_message_exact_match(self):
+        assert self.message2 == models.BrazeTxEmailMessage.objects.get_message("the-dude", "es-ES")
+        assert self.message1 == models.BrazeTxEmailMessage.objects.get_message("the-dude", " ")
+
+    @patch("basket.news.models.sentry_sdk")
+    def test_get_message_not_found(self, mock_sentry):
+        assert models.BrazeTxEmailMessage.objects.get_message("walter", "en-US") is None
+        mock_sentry.capture_message.assert_called_once()
+
+    @override_settings(BRAZE_MESSAGE_ID_MAP={})
+    def test_get_message_no_queries(self):
+        models.BrazeTxEmailMessage.objects.get_message("the-dude", "de")
+        with self.assertNumQueries(0):
+            assert self.message3 == models.BrazeTxEmailMessage.objects.get_message("the-dude", "fr-CA")
+            assert ["the-dude"] == models.BrazeTxEmailMessage.objects.get_tx_message_ids()
+
+    def test_get_message_sees_new_messages(self):
+        assert self.message1 == models.BrazeTxEmailMessage.objects.get_message("the-dude", "de")
+        message = models.BrazeTxEmailMessage.objects.create(message_id="the-dude", language="de")
+        assert message == models.BrazeTxEmailMessage.objects.get_message("the-dude", "de")
+
+    @override_settings(BRAZE_MESSAGE_ID_MAP={})
+    def test_get_tx_message_ids_excludes_private(self):
+        models.BrazeTxEmailMessage.objects.create(message_id="donny", language="en-US", private=True)
+        assert ["the-dude"] == models.BrazeTxEmailMessage.objects.get_tx_message_ids()
+
     @override_settings(BRAZE_MESSAGE_ID_MAP={})
     def test_get_tx_message_ids(self):
         assert ["the-dude"] == models.BrazeTxEmailMessage.objects.get_tx_message_ids()
@@ -83,6 +116,71 @@ class FailedTaskTest(TestCase):
         assert mock_enqueue.call_args.kwargs["retry"].intervals == [60, 90]
 
 
+@override_settings(RQ_IS_ASYNC=True)
+@patch("basket.base.rq.Queue.enqueue_call")
+@patch("basket.base.rq.Queue.enqueue")
+class QueuedTaskTest(TestCase):
+    def setUp(self):
+        get_redis_connection().delete(CHECKPOINT_KEY, STREAM_KEY)
+        self.tasks = [models.QueuedTask.objects.create(name="basket.news.tasks.fxa_login", args=[n]) for n in range(5)]
+
+    def tearDown(self):
+        get_redis_connection().delete(CHECKPOINT_KEY, STREAM_KEY)
+
+    def test_process_maintenance_queue(self, mock_enqueue, mock_enqueue_call):
+        """Test queued tasks are enqueued in one batch, and only then deleted."""
+        call_command("process_maintenance_queue", num_tasks=2)
+
+        mock_enqueue.assert_not_called()
+        assert [call.kwargs["args"] for call in mock_enqueue_call.call_args_list] == [[0], [1]]
+        assert "pipeline" in mock_enqueue_call.call_args.kwargs
+        assert list(models.QueuedTask.objects.values_list("args", flat=True)) == [[2], [3], [4]]
+        assert get_redis_connection().get(CHECKPOINT_KEY) is None
+
+    def test_process_maintenance_queue_delete_error(self, mock_enqueue, mock_enqueue_call):
+        """Test the pks of a chunk that was enqueued but not deleted are kept for the next run."""
+        with patch.object(QuerySet, "delete", side_effect=DatabaseError), pytest.raises(DatabaseError):
+            call_command("process_maintenance_queue", num_tasks=2)
+
+        assert json.loads(get_redis_connection().get(CHECKPOINT_KEY)) == [self.tasks[0].pk, self.tasks[1].pk]
+
+    @patch("basket.news.management.commands.process_maintenance_queue.sleep")
+    def test_process_maintenance_queue_drain(self, mock_sleep, mock_enqueue, mock_enqueue_call):
+        """Test draining goes through every chunk, under the rate cap."""
+        call_command("process_maintenance_queue", num_tasks=2, drain=True, rate=1)
+
+        assert [call.kwargs["args"] for call in mock_enqueue_call.call_args_list] == [[0], [1], [2], [3], [4]]
+        assert not models.QueuedTask.objects.exists()
+        assert mock_sleep.call_count == 3
+        # The average rate is kept under 1 task per second.
+        assert mock_sleep.call_args.args[0] == pytest.approx(5, abs=0.5)
+        assert get_redis_connection().get(CHECKPOINT_KEY) is None
+
+    def test_process_maintenance_queue_resume(self, mock_enqueue, mock_enqueue_call):
+        """
+        Test tasks enqueued before a crash aren't enqueued again, and tasks
+        committed out of pk order since aren't lost.
+        """
+        get_redis_connection().set(CHECKPOINT_KEY, json.dumps([self.tasks[0].pk, self.tasks[2].pk]))
+
+        call_command("process_maintenance_queue", drain=True, rate=0)
+
+        assert [call.kwargs["args"] for call in mock_enqueue_call.call_args_list] == [[1], [3], [4]]
+        assert not models.QueuedTask.objects.exists()
+
+    @override_settings(MAINTENANCE_QUEUE_BACKEND="redis")
+    def test_process_maintenance_queue_stream(self, mock_enqueue, mock_enqueue_call):
+        """Test tasks captured in the Redis stream are enqueued in order after those in the database."""
+        for n in range(5, 8):
+            capture_task("basket.news.tasks.fxa_login", [n], {})
+
+        call_command("process_maintenance_queue", num_tasks=2, drain=True, rate=0)
+
+        assert [call.kwargs["args"] for call in mock_enqueue_call.call_args_list] == [[n] for n in range(8)]
+        assert not models.QueuedTask.objects.exists()
+        assert get_redis_connection().xlen(STREAM_KEY) == 0
+
+
 @pytest.mark.django_db
 class TestNewsletter:
     def test_newsletter_strips_languages(self):
@@ -1,7 +1,13 @@
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
 from django.test import TestCase
 
+from basket.base.signals import task_started
 from basket.news import newsletters, utils
-from basket.news.models import Newsletter, NewsletterGroup
+from basket.news.models import BrazeTxEmailMessage, Newsletter, NewsletterGroup
 
 
 class TestNewsletterUtils(TestCase):
@@ -111,3 +117,99 @@ class TestNewsletterUtils(TestCase):
         """If newsletter is private for SET mode, that newsletter should be removed."""
         subs = utils.parse_newsletters(utils.SET, ["bowling", "papers"], [])
         self.assertDictEqual(subs, {"bowling": True})
+
+
+class TestNewsletterRegistry(TestCase):
+    def setUp(self):
+        Newsletter.objects.create(
+            slug="bowling",
+            title="Bowling, Man",
+            vendor_id="BOWLING",
+            languages="en",
+        )
+        request_started.send(sender=self.__class__)
+
+    def test_version_checked_once_per_request(self):
+        newsletters.newsletter_slugs()
+        with patch("basket.news.newsletters.cache") as mock_cache:
+            newsletters.newsletter_obj("bowling")
+            newsletters.slug_to_vendor_id("bowling")
+            newsletters.vendor_id_to_slug("BOWLING")
+        mock_cache.get.assert_not_called()
+
+    def test_save_invalidates_local_registry(self):
+        registry = newsletters._newsletters()
+        Newsletter.objects.create(
+            slug="surfing",
+            title="Surfing, Man",
+            vendor_id="SURFING",
+            languages="en",
+        )
+        self.assertIsNot(registry, newsletters._newsletters())
+        self.assertEqual(newsletters.newsletter_name("SURFING"), "surfing")
+
+    def test_version_bump_from_other_process(self):
+        registry = newsletters._newsletters()
+        # Simulate another process saving a newsletter.
+        cache.incr(newsletters.VERSION_CACHE_KEY)
+        # Same request, no re-check.
+        self.assertIs(registry, newsletters._newsletters())
+        # A new job picks up the new version.
+        task_started.send(sender=self.__class__, task_name="test")
+        self.assertIsNot(registry, newsletters._newsletters())
+
+    def test_version_rechecked_after_interval(self):
+        """Long-running loops outside of requests and jobs pick up new versions too."""
+        with patch("basket.news.newsletters.monotonic", return_value=1000):
+            registry = newsletters._newsletters()
+        cache.incr(newsletters.VERSION_CACHE_KEY)
+        with patch("basket.news.newsletters.monotonic", return_value=1000 + settings.NEWSLETTER_REGISTRY_CHECK_INTERVAL - 1):
+            self.assertIs(registry, newsletters._newsletters())
+        with patch("basket.news.newsletters.monotonic", return_value=1000 + settings.NEWSLETTER_REGISTRY_CHECK_INTERVAL):
+            self.assertIsNot(registry, newsletters._newsletters())
+
+    def test_unchanged_version_keeps_registry(self):
+        registry = newsletters._newsletters()
+        request_started.send(sender=self.__class__)
+        with patch("basket.news.newsletters._build_registry") as build:
+            self.assertIs(registry, newsletters._newsletters())
+        build.assert_not_called()
+
+    def test_missing_version_key(self):
+        registry = newsletters._newsletters()
+        cache.delete(newsletters.VERSION_CACHE_KEY)
+        request_started.send(sender=self.__class__)
+        self.assertIsNot(registry, newsletters._newsletters())
+        self.assertIsNotNone(cache.get(newsletters.VERSION_CACHE_KEY))
+
+
+class TestLanguageIndex(TestCase):
+    def setUp(self):
+        Newsletter.objects.create(
+            slug="bowling",
+            title="Bowling, Man",
+            vendor_id="BOWLING",
+            languages="en,pt-BR,pt",
+        )
+        BrazeTxEmailMessage.objects.create(message_id="the-dude", language="zh-TW")
+        request_started.send(sender=self.__class__)
+
+    def test_from_languages(self):
+        index = newsletters.LanguageIndex.from_languages(["pt-BR", "en", "pt", "zh-TW"])
+        self.assertEqual(index.exact, {"pt-BR", "en", "pt", "zh-TW"})
+        self.assertEqual(index.lower, {"pt-br", "en", "pt", "zh-tw"})
+        self.assertEqual(dict(index.prefixes), {"en": "en", "pt": "pt", "zh": "zh-tw"})
+
+    def test_lookups_use_no_queries(self):
+        newsletters.newsletter_languages()
+        with self.assertNumQueries(0):
+            self.assertEqual(newsletters.newsletter_languages(), {"en", "pt-BR", "pt", "zh-TW"})
+            self.assertTrue(newsletters.is_supported_newsletter_language("ZH-CN"))
+            self.assertFalse(newsletters.is_supported_newsletter_language("fr"))
+            self.assertEqual(utils.get_best_supported_lang("zh"), "zh-TW")
+            self.assertEqual(utils.get_best_language(["fr", "pt-PT"]), "pt")
+
+    def test_tx_message_save_invalidates(self):
+        self.assertFalse(newsletters.is_supported_newsletter_language("fr"))
+        BrazeTxEmailMessage.objects.create(message_id="the-dude", language="fr")
+        self.assertTrue(newsletters.is_supported_newsletter_language("fr"))
@@ -0,0 +1,98 @@
+import json
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from basket.news.management.commands.process_fxa_queue import Command, Throughput
+
+
+def sqs_message(event, receipt_handle):
+    return Mock(body=json.dumps({"Message": json.dumps(event)}), receipt_handle=receipt_handle)
+
+
+@override_settings(BRAZE_PARALLEL_WRITE_ENABLE=False, BRAZE_ONLY_WRITE_ENABLE=False)
+class ProcessBatchTests(TestCase):
+    def setUp(self):
+        self.queue = Mock()
+        self.queue.delete_messages.return_value = {"Successful": [], "Failed": []}
+        self.mock_login = Mock()
+        patcher = patch.dict(
+            "basket.news.management.commands.process_fxa_queue.FXA_EVENT_TYPES",
+            {"login": self.mock_login},
+            clear=True,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.msgs = [
+            sqs_message({"event": "login", "uid": "abc", "ts": 1002}, "handle-0"),
+            Mock(body="not json", receipt_handle="handle-1"),
+            sqs_message({"event": "passwordChange", "uid": "abc"}, "handle-2"),
+            sqs_message({"event": "login", "uid": "abc", "ts": 1001}, "handle-3"),
+        ]
+
+    def test_process_batch(self):
+        """Events are enqueued in the order they happened, and all messages are deleted at once."""
+        Command().process_batch(self.queue, self.msgs)
+
+        assert [call.args[0]["ts"] for call in self.mock_login.delay.call_args_list] == [1001, 1002]
+        self.queue.delete_messages.assert_called_once()
+        entries = self.queue.delete_messages.call_args.kwargs["Entries"]
+        assert sorted(entry["ReceiptHandle"] for entry in entries) == ["handle-0", "handle-1", "handle-2", "handle-3"]
+        assert len({entry["Id"] for entry in entries}) == 4
+
+    def test_process_batch_enqueue_error(self):
+        """If enqueueing fails, the events are left in SQS, and only the other messages are deleted."""
+        with patch("basket.news.management.commands.process_fxa_queue.enqueue_batch", side_effect=ValueError):
+            Command().process_batch(self.queue, self.msgs)
+
+        entries = self.queue.delete_messages.call_args.kwargs["Entries"]
+        assert sorted(entry["ReceiptHandle"] for entry in entries) == ["handle-1", "handle-2"]
+
+    def test_delete_failed(self):
+        self.queue.delete_messages.return_value = {"Successful": [], "Failed": [{"Id": "0", "Code": "ReceiptHandleIsInvalid"}]}
+
+        with patch("basket.news.management.commands.process_fxa_queue.metrics") as mock_metrics:
+            Command().process_batch(self.queue, self.msgs[:1])
+
+        mock_metrics.incr.assert_called_with("fxa.events.delete_failed", value=1)
+
+
+@override_settings(BRAZE_PARALLEL_WRITE_ENABLE=False, BRAZE_ONLY_WRITE_ENABLE=False)
+def test_replay(tmp_path):
+    """Events in an NDJSON file run through the same dispatch as SQS messages, and dispatch throughput is reported."""
+    replay_file = tmp_path / "events.ndjson"
+    replay_file.write_text("".join(json.dumps({"Message": json.dumps({"event": "login", "uid": f"uid-{n}", "ts": n})}) + "\n" for n in range(25)))
+    mock_login = Mock()
+    out = StringIO()
+
+    with patch.dict("basket.news.management.commands.process_fxa_queue.FXA_EVENT_TYPES", {"login": mock_login}, clear=True):
+        call_command("process_fxa_queue", replay=str(replay_file), stdout=out)
+
+    assert mock_login.delay.call_count == 25
+    assert "Dispatched 25 events in" in out.getvalue()
+    assert "Batch dispatch latency: p50" in out.getvalue()
+    assert "task.timings" in out.getvalue()
+
+
+@override_settings(FXA_EVENTS_ACCESS_KEY_ID="key", FXA_EVENTS_QUEUE_ENABLE=True, FXA_EVENTS_QUEUE_CONCURRENCY=3)
+def test_concurrency_needs_partitions():
+    """Concurrent pollers only run when FxA event jobs go to per-uid ordered partitions."""
+    with patch.object(Command, "poll") as mock_poll, override_settings(RQ_PARTITIONS=0):
+        call_command("process_fxa_queue", burst=True, stdout=StringIO())
+    assert mock_poll.call_count == 1
+
+    with patch.object(Command, "poll") as mock_poll, override_settings(RQ_PARTITIONS=4):
+        call_command("process_fxa_queue", burst=True, stdout=StringIO())
+    assert mock_poll.call_count == 3
+
+
+def test_throughput_throttle():
+    throughput = Throughput(rate=10)
+    throughput.record(20, 0.01)
+    with patch("basket.news.management.commands.process_fxa_queue.sleep") as mock_sleep:
+        throughput.throttle()
+    # 20 events at 10 per second take at least 2 seconds.
+    assert mock_sleep.call_args.args[0] > 1.9
@@ -6,17 +6,24 @@ from django.conf import settings
 from django.test import TestCase
 from django.test.utils import override_settings
 
+import pytest
+
+from basket.base.rq import get_queue, get_redis_connection, get_worker
 from basket.news.backends.braze import BRAZE_OPTIMAL_DELAY
 from basket.news.backends.ctms import CTMSNotFoundByAltIDError
 from basket.news.models import BrazeTxEmailMessage, FailedTask
 from basket.news.tasks import (
     SUBSCRIBE,
     braze_assign_external_id,
+    coalesce_identical,
     fxa_delete,
     fxa_email_changed,
     fxa_login,
+    fxa_newsletters_update,
     fxa_verified,
     get_fxa_user_data,
+    latest_fxa_event,
+    merge_updates,
     record_common_voice_update,
     send_confirm_message,
     send_recovery_message,
@@ -25,6 +32,7 @@ from basket.news.tasks import (
     update_custom_unsub,
     update_user_meta,
     upsert_contact,
+    upsert_user,
 )
 from basket.news.utils import iso_format_unix_timestamp
 
@@ -181,7 +189,8 @@ class FxAVerifiedTests(TestCase):
         )
 
 
-@patch("basket.news.tasks.upsert_user")
+@patch("basket.news.tasks.upsert_contact", return_value=("the-token", False))
+@patch("basket.news.tasks.get_user_data", return_value=None)
 class FxALoginTests(TestCase):
     # based on real data pulled from the queue
     base_data = {
@@ -211,17 +220,21 @@ class FxALoginTests(TestCase):
     def get_data(self):
         return deepcopy(self.base_data)
 
-    def test_fxa_login_task_with_no_utm(self, upsert_mock):
+    def test_fxa_login_task_with_no_utm(self, user_data_mock, upsert_mock):
         data = self.get_data()
         del data["metricsContext"]
         data["deviceCount"] = 1
         fxa_login(data)
-        upsert_mock.delay.assert_not_called()
+        upsert_mock.assert_not_called()
 
-    def test_fxa_login_task_with_utm_data(self, upsert_mock):
+    def test_fxa_login_task_with_utm_data(self, user_data_mock, upsert_mock):
         data = self.get_data()
         fxa_login(data)
-        upsert_mock.delay.assert_called_with_subset(
+        # The contact is found by email, and subscribed in this job without enqueueing another one.
+        user_data_mock.assert_called_once_with(
+            email="the.dude@example.com", extra_fields=["id", "email_id"], use_braze_backend=False, use_cache=False
+        )
+        upsert_mock.assert_called_with_subset(
             SUBSCRIBE,
             {
                 "email": "the.dude@example.com",
@@ -229,19 +242,22 @@ class FxALoginTests(TestCase):
                 "source_url": ANY,
                 "country": "US",
             },
+            None,
         )
-        source_url = upsert_mock.delay.call_args[0][1]["source_url"]
+        source_url = upsert_mock.call_args[0][1]["source_url"]
         assert "utm_campaign=fxa-embedded-form-fx" in source_url
         assert "utm_content=fx-56.0.1" in source_url
         assert "utm_medium=referral" in source_url
         assert "utm_source=firstrun_f131" in source_url
+        # A login doesn't touch the contact's FxA email.
+        assert "fxa_primary_email" not in upsert_mock.call_args[0][1]
 
-    def test_fxa_login_task_with_utm_data_no_subscribe(self, upsert_mock):
+    def test_fxa_login_task_with_utm_data_no_subscribe(self, user_data_mock, upsert_mock):
         data = self.get_data()
         # not in the FXA_LOGIN_CAMPAIGNS setting
         data["metricsContext"]["utm_campaign"] = "nonesense"
         fxa_login(data)
-        upsert_mock.delay.assert_not_called()
+        upsert_mock.assert_not_called()
 
 
 @patch("basket.news.tasks.ctms", spec_set=["update", "add"])
@@ -297,8 +313,8 @@ class FxAEmailChangedTests(TestCase):
         fxa_email_changed(data)
         gud_mock.assert_has_calls(
             [
-                call(fxa_id=data["uid"], extra_fields=["id", "email_id"], use_braze_backend=False),
-                call(email=data["email"], extra_fields=["id", "email_id"], use_braze_backend=False),
+                call(fxa_id=data["uid"], extra_fields=["id", "email_id"], use_braze_backend=False, use_cache=False),
+                call(email=data["email"], extra_fields=["id", "email_id"], use_braze_backend=False, use_cache=False),
             ],
         )
         ctms_mock.update.assert_called_with(
@@ -319,8 +335,8 @@ class FxAEmailChangedTests(TestCase):
         fxa_email_changed(data)
         gud_mock.assert_has_calls(
             [
-                call(fxa_id=data["uid"], extra_fields=["id", "email_id"], use_braze_backend=False),
-                call(email=data["email"], extra_fields=["id", "email_id"], use_braze_backend=False),
+                call(fxa_id=data["uid"], extra_fields=["id", "email_id"], use_braze_backend=False, use_cache=False),
+                call(email=data["email"], extra_fields=["id", "email_id"], use_braze_backend=False, use_cache=False),
             ],
         )
         ctms_mock.update.assert_not_called()
@@ -350,8 +366,8 @@ class FxAEmailChangedTests(TestCase):
         fxa_email_changed(data)
         gud_mock.assert_has_calls(
             [
-                call(fxa_id=data["uid"], extra_fields=["id", "email_id"], use_braze_backend=False),
-                call(email=data["email"], extra_fields=["id", "email_id"], use_braze_backend=False),
+                call(fxa_id=data["uid"], extra_fields=["id", "email_id"], use_braze_backend=False, use_cache=False),
+                call(email=data["email"], extra_fields=["id", "email_id"], use_braze_backend=False, use_cache=False),
             ],
         )
         ctms_mock.update.assert_not_called()
@@ -572,6 +588,67 @@ class TestUpdateUserMeta(TestCase):
         )
 
 
+def test_merge_updates():
+    calls = [
+        (["the-token", {"first_name": "Edmund", "country": "us"}], {"use_braze_backend": True}),
+        (["the-token", {"first_name": "Ed", "lang": "en"}], {"use_braze_backend": True}),
+    ]
+    assert merge_updates(calls) == (
+        ["the-token", {"first_name": "Ed", "country": "us", "lang": "en"}],
+        {"use_braze_backend": True},
+    )
+
+
+def test_coalesce_identical():
+    data = {"email": "a@b.com", "newsletters": "mozilla-foundation"}
+    key = coalesce_identical(SUBSCRIBE, data, use_braze_backend=False, should_send_tx_messages=True, pre_generated_token=None)
+    assert key == coalesce_identical(SUBSCRIBE, dict(data))
+    # Each post of a form gets a new token, which doesn't keep it from being coalesced.
+    assert key == coalesce_identical(SUBSCRIBE, data, pre_generated_token="a-token")
+    # Calls that would send different messages or write to another backend aren't.
+    assert key != coalesce_identical(SUBSCRIBE, data, should_send_tx_messages=False)
+    assert key != coalesce_identical(SUBSCRIBE, data, use_braze_backend=True)
+
+
+@pytest.mark.django_db
+@override_settings(RQ_IS_ASYNC=True)
+@patch("basket.news.tasks.get_user_data", return_value=None)
+@patch("basket.news.tasks.upsert_contact")
+def test_upsert_user_form_posted_twice(mock_upsert_contact, mock_get_user_data):
+    """A form posted twice writes the contact once, with the token from the first post."""
+    data = {"email": "dude@example.com", "newsletters": "mozilla-foundation"}
+    key = coalesce_identical(SUBSCRIBE, data)
+    redis = get_redis_connection()
+    redis.delete(f"coalesce:basket.news.tasks.upsert_user:{key}")
+    queue = get_queue()
+    queue.empty()
+
+    # Like the subscribe view, each post generates its own token.
+    upsert_user.delay(SUBSCRIBE, data, use_braze_backend=False, should_send_tx_messages=True, pre_generated_token="first-token")
+    upsert_user.delay(SUBSCRIBE, dict(data), use_braze_backend=False, should_send_tx_messages=True, pre_generated_token="second-token")
+    assert queue.count == 1
+
+    mock_upsert_contact.return_value = ("first-token", True)
+    get_worker().work(burst=True)
+    mock_upsert_contact.assert_called_once_with(
+        SUBSCRIBE,
+        data,
+        None,
+        use_braze_backend=False,
+        should_send_tx_messages=True,
+        pre_generated_token="first-token",
+    )
+    redis.delete(f"coalesce:basket.news.tasks.upsert_user:{key}")
+
+
+def test_latest_fxa_event():
+    calls = [
+        ([{"uid": "abc", "email": "new@example.com", "ts": 1002}], {}),
+        ([{"uid": "abc", "email": "old@example.com", "ts": 1001}], {}),
+    ]
+    assert latest_fxa_event(calls) == calls[0]
+
+
 @patch("basket.news.tasks.ctms", spec_set=["update"])
 @patch("basket.news.tasks.get_user_data")
 class TestGetFxaUserData(TestCase):
@@ -592,6 +669,7 @@ class TestGetFxaUserData(TestCase):
             fxa_id="123",
             extra_fields=["id", "email_id"],
             use_braze_backend=False,
+            use_cache=False,
         )
         mock_ctms.update.assert_not_called()
 
@@ -612,6 +690,7 @@ class TestGetFxaUserData(TestCase):
             fxa_id="123",
             extra_fields=["id", "email_id"],
             use_braze_backend=False,
+            use_cache=False,
         )
         mock_ctms.update.assert_called_once_with(
             user_data,
@@ -635,11 +714,13 @@ class TestGetFxaUserData(TestCase):
             fxa_id="123",
             extra_fields=["id", "email_id"],
             use_braze_backend=False,
+            use_cache=False,
         )
         mock_gud.assert_called_with(
             email="test@example.com",
             extra_fields=["id", "email_id"],
             use_braze_backend=False,
+            use_cache=False,
         )
         mock_ctms.update.assert_not_called()
 
@@ -668,6 +749,36 @@ class TestFxaDelete(TestCase):
         )
 
 
+@patch("basket.news.tasks.upsert_contact", return_value=("the-token", False))
+@patch("basket.news.tasks.get_fxa_user_data", return_value=None)
+@patch("basket.news.tasks.ctms", spec_set=["update_by_alt_id"])
+class FxAEventOrderTests(TestCase):
+    def setUp(self):
+        self.uid = uuid4().hex
+        self.data = {"uid": self.uid, "email": "thedude@example.com", "newsletters": ["test-pilot"]}
+
+    def test_older_event_skipped(self, mock_ctms, fxa_data_mock, upsert_mock):
+        """An event that ran after a later one of the same kind, e.g. once rescheduled, is skipped."""
+        fxa_newsletters_update({**self.data, "ts": 1002})
+        fxa_newsletters_update({**self.data, "ts": 1001})
+        upsert_mock.assert_called_once()
+
+    def test_other_events_not_skipped(self, mock_ctms, fxa_data_mock, upsert_mock):
+        """Events of other kinds don't skip each other."""
+        fxa_newsletters_update({**self.data, "ts": 1002})
+        with patch("basket.news.tasks.newsletter_languages", return_value=["en"]):
+            fxa_verified({**self.data, "ts": 1001})
+        assert upsert_mock.call_count == 2
+
+    def test_events_before_delete_skipped(self, mock_ctms, fxa_data_mock, upsert_mock):
+        """Events from before the account was deleted are skipped once the deletion ran."""
+        fxa_delete({"uid": self.uid, "ts": 1002})
+        fxa_newsletters_update({**self.data, "ts": 1001})
+        fxa_delete({"uid": self.uid, "ts": 1001})
+        upsert_mock.assert_not_called()
+        mock_ctms.update_by_alt_id.assert_called_once()
+
+
 @patch("basket.news.tasks.braze_tx")
 def test_send_tx_message(mock_braze, metricsmock):
     send_tx_message("test@example.com", "download-foo", "en-US")
@@ -790,6 +901,7 @@ class BrazeAssignExternalIdTests(TestCase):
     @patch("basket.news.tasks.assign_basket_token_alias_task")
     def test_fxa_id_only_assigns_and_enqueues_basket_token(self, mock_assign_task, mock_braze):
         mock_braze.get.return_value = None
+        mock_braze.interface.alias_queue.enabled = False
         braze_assign_external_id({"fxa_id": "fxa-123"})
         kwargs = mock_braze.interface.identify_user.call_args.kwargs
         alias = kwargs["aliases_to_identify"][0]
@@ -804,6 +916,7 @@ class BrazeAssignExternalIdTests(TestCase):
     @patch("basket.news.tasks.assign_basket_token_alias_task")
     def test_email_only_assigns_and_enqueues_basket_token(self, mock_assign_task, mock_braze):
         mock_braze.get.return_value = None
+        mock_braze.interface.alias_queue.enabled = False
         braze_assign_external_id({"email": "a@b.com"})
         kwargs = mock_braze.interface.identify_user.call_args.kwargs
         entry = kwargs["emails_to_identify"][0]
@@ -813,6 +926,17 @@ class BrazeAssignExternalIdTests(TestCase):
         mock_assign_task.delay.assert_called_once_with(external_id, enqueue_in=BRAZE_OPTIMAL_DELAY)
         mock_braze.interface.add_basket_token_alias.assert_not_called()
 
+    @patch("basket.news.tasks.assign_basket_token_alias_task")
+    def test_fxa_id_only_queues_basket_token_alias(self, mock_assign_task, mock_braze):
+        # With alias batching, the basket_token alias goes to the alias queue instead of its own job.
+        mock_braze.get.return_value = None
+        mock_braze.interface.alias_queue.enabled = True
+        braze_assign_external_id({"fxa_id": "fxa-123"})
+        external_id = mock_braze.interface.identify_user.call_args.kwargs["aliases_to_identify"][0]["external_id"]
+        mock_braze.interface.alias_queue.add.assert_called_once_with(external_id, external_id, "basket_token")
+        mock_assign_task.delay.assert_not_called()
+        mock_braze.interface.add_basket_token_alias.assert_not_called()
+
     def test_basket_token_wins_when_all_identifiers_present(self, mock_braze):
         # Precedence guard: basket_token > fxa_id > email.
         mock_braze.get.return_value = None
@@ -9,6 +9,7 @@ from django_ratelimit.exceptions import Ratelimited
 
 from basket import errors
 from basket.news import views
+from basket.news.newsletters import LanguageIndex
 from basket.news.tests import TasksPatcherMixin
 from basket.news.utils import SET, SUBSCRIBE, UNSUBSCRIBE
 
@@ -50,11 +51,11 @@ class UpdateUserTaskTests(TestCase, TasksPatcherMixin):
             self.assert_response_error(response, 400, errors.BASKET_INVALID_NEWSLETTER)
 
     @patch("basket.news.views.get_best_language")
-    @patch("basket.news.utils.newsletter_languages")
+    @patch("basket.news.utils.newsletter_language_index")
     def test_accept_lang(self, nl_mock, get_best_language_mock):
         """If accept_lang param is provided, should set the lang in data."""
         get_best_language_mock.return_value = "pt"
-        nl_mock.return_value = ["pt", "en", "de"]
+        nl_mock.return_value = LanguageIndex.from_languages(["pt", "en", "de"])
         request = self.factory.post("/")
         data = {"email": "dude@example.com", "accept_lang": "pt-pt,fr;q=0.8"}
         after_data = {"email": "dude@example.com", "lang": "pt"}
@@ -64,11 +65,11 @@ class UpdateUserTaskTests(TestCase, TasksPatcherMixin):
         self.upsert_user.delay.assert_called_with_subset(SUBSCRIBE, after_data)
 
     @patch("basket.news.utils.get_best_language")
-    @patch("basket.news.utils.newsletter_languages")
+    @patch("basket.news.utils.newsletter_language_index")
     def test_accept_lang_header(self, nl_mock, get_best_language_mock):
         """If accept-language header is provided, should set the lang in data."""
         get_best_language_mock.return_value = "pt"
-        nl_mock.return_value = ["pt", "en", "de"]
+        nl_mock.return_value = LanguageIndex.from_languages(["pt", "en", "de"])
         request = self.factory.post("/", HTTP_ACCEPT_LANGUAGE="pt-pt,fr;q=0.8")
         data = {"email": "dude@example.com"}
         after_data = {"email": "dude@example.com", "lang": "pt"}
@@ -78,14 +79,14 @@ class UpdateUserTaskTests(TestCase, TasksPatcherMixin):
         self.upsert_user.delay.assert_called_with_subset(SUBSCRIBE, after_data)
 
     @patch("basket.news.utils.get_best_language")
-    @patch("basket.news.utils.newsletter_languages")
+    @patch("basket.news.utils.newsletter_language_index")
     def test_lang_overrides_accept_lang(self, nl_mock, get_best_language_mock):
         """
         If lang is provided it was from the user, and accept_lang isn't as
         reliable, so we should prefer lang.
         """
         get_best_language_mock.return_value = "pt-BR"
-        nl_mock.return_value = ["pt", "en", "de"]
+        nl_mock.return_value = LanguageIndex.from_languages(["pt", "en", "de"])
         request = self.factory.post("/")
         data = {"email": "a@example.com", "lang": "de", "accept_lang": "pt-BR"}
 
@@ -95,14 +96,14 @@ class UpdateUserTaskTests(TestCase, TasksPatcherMixin):
         self.upsert_user.delay.assert_called_with_subset(SUBSCRIBE, data)
 
     @patch("basket.news.utils.get_best_language")
-    @patch("basket.news.utils.newsletter_languages")
+    @patch("basket.news.utils.newsletter_language_index")
     def test_lang_default_if_not_in_list(self, nl_mock, get_best_language_mock):
         """
         If lang is provided it was from the user, and accept_lang isn't as
         reliable, so we should prefer lang.
         """
         get_best_language_mock.return_value = "pt-BR"
-        nl_mock.return_value = ["pt", "en", "de"]
+        nl_mock.return_value = LanguageIndex.from_languages(["pt", "en", "de"])
         request = self.factory.post("/")
         data = {"email": "a@example.com", "lang": "hi"}
         after_data = {"email": "a@example.com", "lang": "en"}
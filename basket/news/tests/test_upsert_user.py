@@ -53,6 +53,7 @@ class UpsertUserTests(TestCase):
             "email": self.email,
         }
         upsert_user(SUBSCRIBE, data)
+        get_user_mock.assert_called_once_with(token=None, email=self.email, extra_fields=["id", "email_id"], use_braze_backend=False, use_cache=False)
         update_data = data.copy()
         update_data["newsletters"] = {"slug": True}
         update_data["token"] = ANY
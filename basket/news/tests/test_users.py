@@ -133,6 +133,7 @@ class TestLookupUser(TestCase):
             email=None,
             fxa_id=None,
             token="dummy",
+            use_cache=False,
         )
 
     @patch("basket.news.utils.ctms", spec_set=["get"])
@@ -154,6 +155,7 @@ class TestLookupUser(TestCase):
             email=None,
             fxa_id=None,
             token="dummy",
+            use_cache=True,
         )
 
     @patch("basket.news.utils.ctms", spec_set=["get"])
@@ -608,7 +608,7 @@ class TestNewslettersAPI(TestCase):
         newsletter_fields()
         # Now request it again and it shouldn't have to generate the
         # data from scratch.
-        with patch("basket.news.newsletters._get_newsletters_data") as get:
+        with patch("basket.news.newsletters._build_registry") as get:
             newsletter_fields()
         self.assertFalse(get.called)
 
@@ -21,6 +21,9 @@ from email_validator import EmailNotValidError, validate_email
 
 # Get error codes from basket-client so users see the same definitions
 from basket import errors, metrics
+from basket.base.deadline import DeadlineHTTPAdapter
+from basket.base.exceptions import CircuitOpenError, DeadlineExceeded, RateLimitExceeded
+from basket.base.rq import WorkerRetry
 from basket.news.backends.braze import braze
 from basket.news.backends.common import NewsletterException
 from basket.news.backends.ctms import (
@@ -33,7 +36,7 @@ from basket.news.models import APIUser, BlockedEmail
 from basket.news.newsletters import (
     newsletter_group_newsletter_slugs,
     newsletter_inactive_slugs,
-    newsletter_languages,
+    newsletter_language_index,
     newsletter_private_slugs,
 )
 
@@ -144,6 +147,10 @@ def get_fxa_clients():
             client_secret=settings.FXA_CLIENT_SECRET,
         )
         FXA_CLIENTS["profile"] = fxa.profile.Client(server_url=server_urls["profile"])
+        # Bound FxA calls by the deadline, keeping the retries the clients mount by default.
+        for client in FXA_CLIENTS.values():
+            retries = WorkerRetry(total=3, backoff_factor=0.5, allowed_methods={"DELETE", "GET", "POST", "PUT"})
+            client.apiclient._session.mount(client.apiclient.server_url, DeadlineHTTPAdapter(max_retries=retries))
 
     return FXA_CLIENTS["oauth"], FXA_CLIENTS["profile"]
 
@@ -253,6 +260,7 @@ def get_user_data(
     masked=False,
     use_braze_backend=False,
     omit_extra_braze_fields=False,
+    use_cache=True,
 ):
     """
     Return a dictionary of the user's data.
@@ -269,6 +277,8 @@ def get_user_data(
 
     When `masked` is True, we return masked emails. We should only set
     `masked=False` when a valid API key is being used. This defaults to False.
+    Masked lookups skip the contact cache unless CONTACT_CACHE_MASKED_READS is set.
+    Pass `use_cache=False` to read the backend when the data will be written back.
 
     Review of results:
 
@@ -299,21 +309,30 @@ def get_user_data(
         extra_fields = []
 
     backend_user = None
+    use_cache = use_cache and (not masked or settings.CONTACT_CACHE_MASKED_READS)
     try:
         if use_braze_backend:
             backend_user = braze.get(
                 token=token,
                 email=email,
                 fxa_id=fxa_id,
+                use_cache=use_cache,
             )
         else:
             backend_user = ctms.get(
                 token=token,
                 email=email,
                 fxa_id=fxa_id,
+                use_cache=use_cache,
             )
     except CTMSNotFoundByAltIDError:
         return None
+    except (CircuitOpenError, DeadlineExceeded, RateLimitExceeded) as exc:
+        raise NewsletterException(
+            str(exc),
+            error_code=errors.BASKET_NETWORK_FAILURE,
+            status_code=400,
+        ) from exc
     except requests.exceptions.HTTPError as exc:
         if exc.response.status_code == 401:
             raise NewsletterException(
@@ -412,6 +431,7 @@ def get_accept_languages(header_value):
     except ValueError:  # see https://code.djangoproject.com/ticket/21078
         return languages
 
+    supported_langs = newsletter_language_index().exact
     for lang, _priority in parsed:
         m = pattern.match(lang)
 
@@ -422,7 +442,7 @@ def get_accept_languages(header_value):
 
         # Check if the shorter code is supported. This covers obsolete long
         # codes like fr-FR (should match fr) or ja-JP (should match ja)
-        if m.group(2) and lang not in newsletter_languages():
+        if m.group(2) and lang not in supported_langs:
             lang += "-" + m.group(2).upper()
 
         if lang not in languages:
@@ -444,7 +464,7 @@ def get_best_language(languages):
 
     # try again with 2 letter languages
     languages_2l = [lang[:2] for lang in languages]
-    supported_langs = newsletter_languages()
+    supported_langs = newsletter_language_index().exact
 
     for lang in chain(languages, languages_2l):
         if lang in supported_langs:
@@ -480,14 +500,13 @@ def get_best_supported_lang(code):
     we support for newsletters.
     """
     code = str(code).lower()
-    all_langs = [lang.lower() for lang in newsletter_languages()]
-    if code in all_langs:
+    index = newsletter_language_index()
+    if code in index.lower:
         return _fix_supported_lang(code)
 
-    all_langs_2char = {c[:2]: c for c in all_langs}
     code2 = code[:2]
-    if code2 in all_langs_2char:
-        return _fix_supported_lang(all_langs_2char[code2])
+    if code2 in index.prefixes:
+        return _fix_supported_lang(index.prefixes[code2])
 
     return "en"
 
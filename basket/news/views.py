@@ -16,6 +16,7 @@ from django_ratelimit.core import is_ratelimited
 from django_ratelimit.exceptions import Ratelimited
 
 from basket import errors, metrics
+from basket.base.rq import enqueue_batch
 from basket.news import tasks
 from basket.news.forms import (
     CommonVoiceForm,
@@ -252,15 +253,16 @@ def confirm(request, token):
         raise Ratelimited()
 
     if settings.BRAZE_PARALLEL_WRITE_ENABLE:
-        tasks.confirm_user.delay(
-            token,
-            use_braze_backend=True,
-            extra_metrics_tags=["backend:braze"],
-        )
-        tasks.confirm_user.delay(
-            token,
-            use_braze_backend=False,
-        )
+        with enqueue_batch():
+            tasks.confirm_user.delay(
+                token,
+                use_braze_backend=True,
+                extra_metrics_tags=["backend:braze"],
+            )
+            tasks.confirm_user.delay(
+                token,
+                use_braze_backend=False,
+            )
     elif settings.BRAZE_ONLY_WRITE_ENABLE:
         tasks.confirm_user.delay(
             token,
@@ -604,8 +606,9 @@ def user_meta(request, token):
         # don't send empty values
         data = {k: v for k, v in form.cleaned_data.items() if v}
         if settings.BRAZE_PARALLEL_WRITE_ENABLE:
-            tasks.update_user_meta.delay(token, data, use_braze_backend=True)
-            tasks.update_user_meta.delay(token, data, use_braze_backend=False)
+            with enqueue_batch():
+                tasks.update_user_meta.delay(token, data, use_braze_backend=True)
+                tasks.update_user_meta.delay(token, data, use_braze_backend=False)
         elif settings.BRAZE_ONLY_WRITE_ENABLE:
             tasks.update_user_meta.delay(token, data, use_braze_backend=True)
         else:
@@ -776,16 +779,17 @@ def custom_unsub_reason(request):
         )
 
     if settings.BRAZE_PARALLEL_WRITE_ENABLE:
-        tasks.update_custom_unsub.delay(
-            request.POST["token"],
-            request.POST["reason"],
-            use_braze_backend=True,
-        )
-        tasks.update_custom_unsub.delay(
-            request.POST["token"],
-            request.POST["reason"],
-            use_braze_backend=False,
-        )
+        with enqueue_batch():
+            tasks.update_custom_unsub.delay(
+                request.POST["token"],
+                request.POST["reason"],
+                use_braze_backend=True,
+            )
+            tasks.update_custom_unsub.delay(
+                request.POST["token"],
+                request.POST["reason"],
+                use_braze_backend=False,
+            )
     elif settings.BRAZE_ONLY_WRITE_ENABLE:
         tasks.update_custom_unsub.delay(
             request.POST["token"],
@@ -160,6 +160,7 @@ MIDDLEWARE = (
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "basket.base.middleware.HostnameMiddleware",
+    "basket.base.middleware.DeadlineMiddleware",
     "django.middleware.common.CommonMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -229,6 +230,69 @@ BRAZE_ONLY_WRITE_ENABLE = config("BRAZE_ONLY_WRITE_ENABLE", parser=bool, default
 BRAZE_READ_WITH_FALLBACK_ENABLE = config("BRAZE_READ_WITH_FALLBACK_ENABLE", parser=bool, default="false")
 BRAZE_ONLY_READ_ENABLE = config("BRAZE_ONLY_READ_ENABLE", parser=bool, default="false")
 BRAZE_CTMS_SHIM_ENABLE = config("BRAZE_CTMS_SHIM_ENABLE", parser=bool, default="false")
+# Connection pool for the long-lived Braze HTTP session. The pool size should be at least
+# the number of threads that may talk to Braze concurrently from one process.
+BRAZE_HTTP_POOL_MAXSIZE = config("BRAZE_HTTP_POOL_MAXSIZE", parser=int, default="10")
+# Seconds a pooled connection may sit idle before TCP keep-alive probes are sent.
+BRAZE_HTTP_KEEPALIVE_IDLE = config("BRAZE_HTTP_KEEPALIVE_IDLE", parser=int, default="60")
+# Buffer /users/track writes made by worker jobs in Redis and send them to Braze in batches
+# of up to BRAZE_TRACK_BATCH_SIZE objects (Braze allows 75 per request), at least every
+# BRAZE_TRACK_FLUSH_INTERVAL seconds.
+BRAZE_TRACK_BATCHING = config("BRAZE_TRACK_BATCHING", parser=bool, default="false")
+BRAZE_TRACK_BATCH_SIZE = config("BRAZE_TRACK_BATCH_SIZE", parser=int, default="75")
+BRAZE_TRACK_FLUSH_INTERVAL = config("BRAZE_TRACK_FLUSH_INTERVAL", parser=int, default="5")
+# Collect delayed alias operations in Redis by due minute and send each minute's
+# aliases with one scheduled job, 50 per request, instead of one job per alias.
+BRAZE_ALIAS_BATCHING = config("BRAZE_ALIAS_BATCHING", parser=bool, default="false")
+
+# Seconds between checks for newsletter changes made by other processes, within a request or
+# job, or a long-running loop like the FxA and maintenance queue processors.
+NEWSLETTER_REGISTRY_CHECK_INTERVAL = config("NEWSLETTER_REGISTRY_CHECK_INTERVAL", parser=int, default="30")
+
+# Seconds to keep contacts read from CTMS or Braze in the default cache. 0 disables
+# the contact cache. It must be shared by all processes (e.g. Redis) to be enabled,
+# so writes from any of them invalidate it.
+CONTACT_CACHE_TTL = config("CONTACT_CACHE_TTL", parser=int, default="0")
+# Whether lookups without a valid API key, which return masked data, may use the contact cache.
+CONTACT_CACHE_MASKED_READS = config("CONTACT_CACHE_MASKED_READS", parser=bool, default="false")
+
+# Total seconds a web request or a job may spend, and default per-attempt timeouts, for outbound calls.
+REQUEST_DEADLINE = config("REQUEST_DEADLINE", parser=float, default="25")
+TASK_DEADLINE = config("TASK_DEADLINE", parser=float, default="120")
+HTTP_CONNECT_TIMEOUT = config("HTTP_CONNECT_TIMEOUT", parser=float, default="3.05")
+HTTP_READ_TIMEOUT = config("HTTP_READ_TIMEOUT", parser=float, default="20")
+
+# Circuit breakers for the CTMS and Braze backends. A breaker opens when, within a window
+# with enough calls, the share of failed or slow calls reaches its limit. Calls then fail
+# fast until one probe call succeeds after the open period.
+CIRCUIT_BREAKER_ENABLED = config("CIRCUIT_BREAKER_ENABLED", parser=bool, default="true") and not UNITTEST
+CIRCUIT_BREAKER_WINDOW = config("CIRCUIT_BREAKER_WINDOW", parser=int, default="60")
+CIRCUIT_BREAKER_MIN_CALLS = config("CIRCUIT_BREAKER_MIN_CALLS", parser=int, default="20")
+CIRCUIT_BREAKER_ERROR_RATE = config("CIRCUIT_BREAKER_ERROR_RATE", parser=float, default="0.5")
+CIRCUIT_BREAKER_SLOW_CALL = config("CIRCUIT_BREAKER_SLOW_CALL", parser=float, default="10")
+CIRCUIT_BREAKER_SLOW_RATE = config("CIRCUIT_BREAKER_SLOW_RATE", parser=float, default="0.8")
+CIRCUIT_BREAKER_OPEN_SECONDS = config("CIRCUIT_BREAKER_OPEN_SECONDS", parser=int, default="30")
+
+# Rate limits for backends, shared by all processes through Redis. A call waits up to
+# RATE_LIMIT_MAX_WAIT seconds for its limit, and otherwise fails (a job is rescheduled).
+RATE_LIMIT_ENABLED = config("RATE_LIMIT_ENABLED", parser=bool, default="true") and not UNITTEST
+RATE_LIMIT_MAX_WAIT = config("RATE_LIMIT_MAX_WAIT", parser=float, default="2")
+# (calls, seconds) allowed per Braze endpoint, a little under Braze's default limits.
+# https://www.braze.com/docs/api/api_limits/
+BRAZE_RATE_LIMITS = {
+    "/users/track": (2900, 3),
+    "/users/export/ids": (240, 60),
+    "/users/alias/new": (19500, 60),
+    "/users/identify": (19500, 60),
+    "/users/delete": (19500, 60),
+    "/subscription/user/status": (4900, 60),
+    "/campaigns/trigger/send": (240000, 3600),
+}
+
+# Skip CTMS and Braze updates that wouldn't change anything, and trim unchanged fields from the rest.
+# A skipped CTMS update returns None instead of the updated contact.
+# Not done while the contact cache is enabled (CONTACT_CACHE_TTL), since the existing data may be stale.
+SUPPRESS_NOOP_WRITES = config("SUPPRESS_NOOP_WRITES", parser=bool, default="false")
 
 # Mozilla CTMS
 CTMS_ENV = config("CTMS_ENV", default="").lower()
@@ -242,6 +306,13 @@ else:
 CTMS_URL = config("CTMS_URL", default=default_url)
 CTMS_CLIENT_ID = config("CTMS_CLIENT_ID", default="") if not UNITTEST else "test"
 CTMS_CLIENT_SECRET = config("CTMS_CLIENT_SECRET", default="") if not UNITTEST else "test"
+# Look up all alternate IDs passed to `CTMS.get` at once instead of one after the other.
+CTMS_CONCURRENT_LOOKUPS = config("CTMS_CONCURRENT_LOOKUPS", parser=bool, default="false")
+CTMS_LOOKUP_MAX_WORKERS = config("CTMS_LOOKUP_MAX_WORKERS", parser=int, default="4")
+# Refresh the CTMS OAuth token this many seconds before it expires.
+CTMS_TOKEN_REFRESH_MARGIN = config("CTMS_TOKEN_REFRESH_MARGIN", parser=int, default="120")
+# Seconds to wait for another process to fetch a new CTMS token before fetching our own.
+CTMS_TOKEN_LOCK_WAIT = config("CTMS_TOKEN_LOCK_WAIT", parser=float, default="5")
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_HEADERS = (*default_headers, "x-api-key")
@@ -267,6 +338,22 @@ RQ_MAX_RETRIES = 0 if UNITTEST else config("RQ_MAX_RETRIES", parser=int, default
 RQ_EXCEPTION_HANDLERS = ["basket.base.rq.store_task_exception_handler"]
 RQ_IS_ASYNC = False if UNITTEST else config("RQ_IS_ASYNC", parser=bool, default="true")
 RQ_DEFAULT_QUEUE = "testqueue" if UNITTEST else config("RQ_DEFAULT_QUEUE", default="") or None
+# Relative weights for how often workers check each queue class first. The queues for
+# other classes than "default" are named "<RQ_DEFAULT_QUEUE>-<class>".
+RQ_QUEUE_WEIGHTS = {
+    queue_class: int(weight)
+    for queue_class, weight in (item.split(":") for item in config("RQ_QUEUE_WEIGHTS", parser=ListOf(str), default="interactive:6,default:3,bulk:1"))
+}
+# Jobs each `rqworker` runs at once, as workers forked from one warm process.
+RQ_WORKERS = config("RQ_WORKERS", parser=int, default="1")
+# Number of ordered partitions for tasks with a partition key, e.g. FxA events by uid.
+# 0 to send those tasks to their queue class like any other.
+RQ_PARTITIONS = config("RQ_PARTITIONS", parser=int, default="0")
+# How long a partition worker's lease lasts without a heartbeat. Must be more than the RQ worker TTL (420s).
+RQ_PARTITION_LEASE_TTL = config("RQ_PARTITION_LEASE_TTL", parser=int, default="600")
+# Longest a coalescing key is held for a job waiting in the queue, in seconds past its `enqueue_in` delay.
+# Later calls for the key enqueue a new job, so a lost job only holds up calls for this long.
+RQ_COALESCE_TTL = config("RQ_COALESCE_TTL", parser=int, default="600")
 
 SNITCH_ID = config("SNITCH_ID", default="")
 
@@ -433,6 +520,14 @@ else:
 # FIXME: MAINTENANCE_MODE is considered broken and needs to be fixed before use.
 MAINTENANCE_MODE = config("MAINTENANCE_MODE", parser=bool, default="false")
 QUEUE_BATCH_SIZE = config("QUEUE_BATCH_SIZE", parser=int, default="500")
+# Most queued tasks per second `process_maintenance_queue --drain` enqueues. 0 for no limit.
+QUEUE_DRAIN_RATE = config("QUEUE_DRAIN_RATE", parser=int, default="100")
+# Where tasks are captured in maintenance mode: "database" (QueuedTask) or "redis" (a Redis stream).
+MAINTENANCE_QUEUE_BACKEND = config(
+    "MAINTENANCE_QUEUE_BACKEND",
+    parser=ChoiceOf(str, ["database", "redis"]),
+    default="database",
+)
 # can we read user data in maintenance mode
 MAINTENANCE_READ_ONLY = config("MAINTENANCE_READ_ONLY", parser=bool, default="false")
 
@@ -445,6 +540,9 @@ FXA_EVENTS_SECRET_ACCESS_KEY = config("FXA_EVENTS_SECRET_ACCESS_KEY", default=""
 FXA_EVENTS_QUEUE_REGION = config("FXA_EVENTS_QUEUE_REGION", default="")
 FXA_EVENTS_QUEUE_URL = config("FXA_EVENTS_QUEUE_URL", default="")
 FXA_EVENTS_QUEUE_WAIT_TIME = config("FXA_EVENTS_QUEUE_WAIT_TIME", parser=int, default="10")
+# Number of SQS pollers `process_fxa_queue` runs at once. Only used with RQ_PARTITIONS, so
+# the events for one uid still apply in order whichever poller enqueues them.
+FXA_EVENTS_QUEUE_CONCURRENCY = config("FXA_EVENTS_QUEUE_CONCURRENCY", parser=int, default="1")
 FXA_EVENTS_SNITCH_ID = config("FXA_EVENTS_SNITCH_ID", default="")
 FXA_EVENTS_ENDPOINT_URL = config("FXA_EVENTS_ENDPOINT_URL", default="") or None
 